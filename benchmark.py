@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Benchmark suite: simulation throughput of every motion model and headless
+# render throughput along scripted camera paths, for 9 up to 1M bodies.
+# Results are compared against a stored baseline, the run fails when a metric
+# has regressed by more than the threshold.
+#
+#   python benchmark.py                    run the quick suite, compare
+#   python benchmark.py --suite full       9 .. 1M bodies
+#   python benchmark.py --save-baseline    store the results as the baseline
+# ---------------------------------------------------------------------------
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(DIRECTORY, "benchmark_baseline.json")
+# Relative change of a metric, for the worse, that counts as a regression
+DEFAULT_THRESHOLD = 0.15
+
+# Total body counts: the 9 bodies of the table plus asteroids
+SUITES = {
+    "quick": {"bodies": (9, 1_000, 10_000), "frames": 60, "size": (640, 480)},
+    "full": {"bodies": (9, 1_000, 10_000, 100_000, 1_000_000), "frames": 300, "size": (1280, 720)},
+}
+# Simulation models and the largest body count each of them is run with; the gravity engine is quadratic (direct) or
+# far slower per body than the closed form orbits, past these counts one step takes minutes
+SIMULATIONS = {"orbits": 1_000_000, "ephemeris": 1_000_000, "leapfrog-direct": 2_000, "leapfrog-barnes-hut": 100_000}
+CAMERAS = ("orbit", "flyby")
+# Bodies of the table, the rest of a body count are asteroids
+TABLE_BODIES = 9
+
+# Metrics and whether larger values are better
+METRICS = {"steps_per_s": True, "fps": True, "startup_s": False, "peak_memory_mb": False}
+# Absolute change of a metric a regression has to exceed as well: a startup is measured once per case and a fresh
+# process varies by tens of milliseconds, which is far more than 15% of a 0.1 s startup
+NOISE_FLOOR = {"steps_per_s": 0.0, "fps": 0.0, "startup_s": 0.25, "peak_memory_mb": 16.0}
+
+
+def _peakMemory():
+    # Peak resident set of this process in MiB (Linux reports KiB, macOS bytes)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _simulationCase(model, count, min_time, repeats, launched):
+    # Runs in a fresh process, so the peak memory is the case's own; launched - time the process was started at
+    # (seconds since the epoch), the startup includes the interpreter and the imports like the one of a render case
+    from solar_system import SolarSystem
+    from solar_system.clock import DEFAULT_WARP
+
+    asteroids = max(count - TABLE_BODIES, 0)
+    if model in ("orbits", "ephemeris"):
+        system = SolarSystem(asteroids=asteroids, ephemeris=model == "ephemeris", seed=0)
+    else:
+        system = SolarSystem(asteroids=asteroids, physics="leapfrog", gravity=model.split("-", 1)[1], seed=0)
+
+    def step():
+        # One step at the interactive speed at 60 FPS and the positions of a frame, as the render loop asks for them
+        system.step(DEFAULT_WARP / 60)
+        system.interpolate()
+
+    # The first step builds what is cached between steps (e.g. the first accelerations)
+    step()
+    startup = time.time() - launched
+
+    rates = []
+    for _ in range(repeats):
+        steps, begin = 0, time.perf_counter()
+        while True:
+            step()
+            steps += 1
+            elapsed = time.perf_counter() - begin
+            if elapsed >= min_time:
+                break
+        rates.append(steps / elapsed)
+    # Other processes only ever slow a measurement down, the fastest one is the least noisy
+    return {"steps_per_s": max(rates), "startup_s": startup, "peak_memory_mb": _peakMemory()}
+
+
+def _renderCase(camera, count, frames, size, platform_name, launched):
+    # The application renders offscreen in its own process and reports its numbers through --stats; its startup counts
+    # from the launch of that process, passed in the environment (launched, the start of this one, does not count).
+    # The texture cache is disabled, so every run decodes the maps and the startup does not depend on what earlier
+    # runs left behind.
+    with tempfile.TemporaryDirectory() as directory:
+        stats = os.path.join(directory, "stats.json")
+        command = [sys.executable, "-m", "solar_system", "--headless", platform_name, "--frames", str(frames),
+                   "--size", "%dx%d" % size, "--camera", camera, "--asteroids", str(max(count - TABLE_BODIES, 0)),
+                   "--output", "", "--texture-cache", "", "--stats", stats]
+        environment = dict(os.environ, SOLAR_SYSTEM_START_TIME=repr(time.time()))
+        result = subprocess.run(command, cwd=DIRECTORY, env=environment, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True)
+        if result.returncode:
+            raise RuntimeError("Render benchmark failed:\n%s" % result.stderr)
+        with open(stats) as report:
+            report = json.load(report)
+    return {"fps": report["fps"], "startup_s": report["startup_s"], "peak_memory_mb": report["peak_memory_mb"]}
+
+
+def runSuite(suite, cases=None, min_time=1.0, repeats=3, platform_name="egl", render=True, log=print, exact=False):
+    # Results of every case by name; cases - optional substrings (full names with exact), only matching cases are run
+    settings = SUITES[suite]
+    plan = []
+    for model, limit in SIMULATIONS.items():
+        plan += [("simulation/%s/%d" % (model, count), _simulationCase, (model, count, min_time, repeats))
+                 for count in settings["bodies"] if count <= limit]
+    if render:
+        plan += [("render/%s/%d" % (camera, count), _renderCase,
+                  (camera, count, settings["frames"], settings["size"], platform_name))
+                 for camera in CAMERAS for count in settings["bodies"]]
+    if cases:
+        plan = [entry for entry in plan if any(case == entry[0] if exact else case in entry[0] for case in cases)]
+
+    results = {}
+    # spawn: a forked child would inherit the parent's memory and imports
+    context = multiprocessing.get_context("spawn")
+    for name, function, arguments in plan:
+        log("%-40s" % name, end="", flush=True)
+        # Startups are measured from the launch of the process of the case
+        launched = time.time()
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(function, arguments + (launched,))
+        log("  ".join("%s %.4g" % item for item in results[name].items()))
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # (case, metric, baseline value, new value, relative change) of every metric that got worse by more than
+    # the threshold and by more than its noise floor; cases missing from either side are skipped
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old:
+                continue
+            change = (value - old) / old
+            worse = -change if METRICS[metric] else change
+            if worse > threshold and abs(value - old) > NOISE_FLOOR[metric]:
+                regressions.append((name, metric, old, value, change))
+    return regressions
+
+
+def machine():
+    return {"python": platform.python_version(), "system": platform.platform(), "processor": platform.processor(),
+            "cpus": os.cpu_count()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solar system benchmarks")
+    parser.add_argument("--suite", choices=tuple(SUITES), default="quick", help="body counts and render settings")
+    parser.add_argument("--case", action="append", metavar="TEXT",
+                        help="only run the cases whose name contains TEXT (repeatable)")
+    parser.add_argument("--no-render", action="store_true", help="skip the render cases")
+    parser.add_argument("--platform", choices=("egl", "osmesa"), default="egl", help="offscreen GL platform")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds every simulation measurement runs")
+    parser.add_argument("--repeats", type=int, default=3, help="measurements per simulation case, the fastest counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, metavar="FILE", help="stored baseline results")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change for the worse that fails the run (default: %(default)s)")
+    parser.add_argument("--output", metavar="FILE", help="also write the results as JSON to FILE")
+    args = parser.parse_args(argv)
+
+    results = runSuite(args.suite, args.case, args.min_time, args.repeats, args.platform, not args.no_render)
+    report = {"suite": args.suite, "machine": machine(), "results": results}
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.save_baseline:
+        # Cases that were not run keep their old baseline
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as stored:
+                report["results"] = {**json.load(stored)["results"], **results}
+        with open(args.baseline, "w") as output:
+            json.dump(report, output, indent=2)
+        print("Baseline saved to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at %s, run with --save-baseline to store one" % args.baseline)
+        return 0
+    with open(args.baseline) as stored:
+        baseline = json.load(stored)
+    if baseline["machine"] != report["machine"]:
+        print("Warning: the baseline was recorded on another machine: %s" % baseline["machine"])
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        # A regression has to show up in a second measurement of its case as well, one slow run is noise
+        names = sorted({regression[0] for regression in regressions})
+        print("Measuring %d case(s) again" % len(names))
+        again = runSuite(args.suite, names, args.min_time, args.repeats, args.platform, not args.no_render, exact=True)
+        for name in names:
+            results[name] = {metric: (max if METRICS[metric] else min)(value, again[name][metric])
+                             for metric, value in results[name].items()}
+        regressions = compare(results, baseline["results"], args.threshold)
+    for name, metric, old, value, change in regressions:
+        print("REGRESSION %s %s: %.4g -> %.4g (%+.1f%%)" % (name, metric, old, value, 100 * change))
+    if regressions:
+        return 1
+    print("No regressions beyond %.0f%%" % (100 * args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
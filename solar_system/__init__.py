@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Solar system simulation and OpenGL renderer.
+#
+# SolarSystem only needs NumPy. Renderer and main pull in OpenGL, pygame and
+# PIL, so they are imported on first access:
+#
+#   from solar_system import SolarSystem     # no GL, no display
+#   from solar_system import Renderer        # imports OpenGL now
+# ---------------------------------------------------------------------------
+
+from .simulation import SolarSystem
+
+__all__ = ["Renderer", "SolarSystem", "main"]
+
+
+def __getattr__(name):
+    if name == "Renderer":
+        from .renderer import Renderer
+        return Renderer
+    if name == "main":
+        from .app import main
+        return main
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# python -m solar_system [options], see app.py
+
+import sys
+
+from .app import main
+
+sys.exit(main())
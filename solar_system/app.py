@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Command line application: argument parsing, the interactive pygame window
+# and the headless batch render. OpenGL, pygame and PIL are only imported
+# once the arguments are parsed and a window or offscreen context is needed.
+# ---------------------------------------------------------------------------
+
+import argparse
+import os
+import time
+
+from .camera import Camera
+from .clock import DEFAULT_WARP, SECONDS_PER_YEAR, SimulationClock
+from .simulation import SolarSystem
+
+# Time the process was launched at (seconds since the epoch), set by main.py and by the benchmarks so the startup time
+# includes the interpreter and every import; without it (python -m solar_system) the startup counts from here
+START_VARIABLE = "SOLAR_SYSTEM_START_TIME"
+START_TIME = float(os.environ.get(START_VARIABLE, time.time()))
+
+FPS = 60
+# Window size of the interactive mode
+WINDOW_SIZE = (900, 800)
+# Camera speed in units per second, multiplied by WARP_SPEED per second of holding 2 (divided with 1)
+MOVEMENT_SPEED = 60
+# Time warp multiplier per second of holding 3 or 4
+WARP_SPEED = 4
+# Simulated seconds jumped by the seek keys: brackets by 30 days, page up/down by a year
+SEEK_DAYS = 30 * 86400
+
+
+def resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog="solar_system", description="Solar system - pyOpenGL & PyGame")
+    parser.add_argument("--asteroids", type=int, default=0, metavar="N",
+                        help="draw a main asteroid belt of N bodies (0 disables it)")
+    parser.add_argument("--moons", action="store_true", help="draw the moon systems listed in bodies.json")
+    parser.add_argument("--orbits", choices=("trails", "paths"), default="trails",
+                        help="draw the fading trail of the path every body took, or its precomputed orbit")
+    physics_group = parser.add_argument_group("gravity simulation")
+    physics_group.add_argument("--physics", choices=("leapfrog", "rk4"),
+                               help="move the bodies with an N-body gravity integrator instead of circular orbits")
+    physics_group.add_argument("--gravity", choices=("auto", "direct", "barnes-hut"), default="auto",
+                               help="force evaluation: direct O(N^2) sum or Barnes-Hut octree (auto picks by body "
+                                    "count)")
+    physics_group.add_argument("--theta", type=float, default=0.5, help="Barnes-Hut opening angle")
+    physics_group.add_argument("--workers", type=int, default=0, help="processes evaluating the Barnes-Hut forces")
+    texture_group = parser.add_argument_group("textures")
+    texture_group.add_argument("--texture-cache", metavar="DIR",
+                               help="directory of converted textures reused by later launches, empty disables it "
+                                    "(default: ~/.cache/solar_system/textures)")
+    texture_group.add_argument("--compress-textures", action="store_true",
+                               help="keep the planet maps S3TC compressed on the GPU and in the cache")
+    ephemeris_group = parser.add_argument_group("ephemeris")
+    ephemeris_group.add_argument("--ephemeris", action="store_true",
+                                 help="place the planets on their Keplerian orbits from the orbital elements")
+    ephemeris_group.add_argument("--epoch", default="2000-01-01T12:00", metavar="DATE",
+                                 help="start date, ISO 8601 (default: J2000)")
+    recording_group = parser.add_argument_group("recording")
+    recording_group.add_argument("--record", metavar="FILE",
+                                 help="stream the trajectory of the run into FILE (seeking is disabled meanwhile)")
+    recording_group.add_argument("--record-interval", type=float, metavar="SECONDS",
+                                 help="simulated seconds between recorded frames (default: one frame of --step or of "
+                                      "the interactive speed)")
+    recording_group.add_argument("--play", metavar="FILE",
+                                 help="replay a recording instead of simulating; the time warp sets the speed and the "
+                                      "seek keys scrub")
+    recording_group.add_argument("--loop", action="store_true", help="start the replay over at its end")
+    network_group = parser.add_argument_group("network")
+    network_group.add_argument("--serve", metavar="[HOST:]PORT",
+                               help="simulate without a window and broadcast the state to --connect viewers (the "
+                                    "host defaults to the loopback interface)")
+    network_group.add_argument("--connect", metavar="HOST:PORT",
+                               help="view the simulation of a --serve process instead of simulating")
+    network_group.add_argument("--snapshot-rate", type=float, metavar="HZ",
+                               help="snapshots per second a server sends (default: 30)")
+    network_group.add_argument("--warp", type=float, default=DEFAULT_WARP, metavar="SECONDS",
+                               help="simulated seconds per real second of a server (default: the interactive speed)")
+    profiling_group = parser.add_argument_group("profiling")
+    profiling_group.add_argument("--overlay", action="store_true",
+                                 help="start with the profiler overlay shown (F3 toggles it)")
+    profiling_group.add_argument("--trace", metavar="FILE",
+                                 help="record every profiled section and write a Chrome trace to FILE on exit")
+    headless_group = parser.add_argument_group("headless rendering")
+    headless_group.add_argument("--headless", choices=("egl", "osmesa"),
+                                help="render offscreen with the given platform instead of opening a window")
+    headless_group.add_argument("--frames", type=int, default=600, help="number of frames to render")
+    headless_group.add_argument("--size", type=resolution, default=(1920, 1080), metavar="WxH",
+                                help="frame resolution")
+    headless_group.add_argument("--step", type=float, default=DEFAULT_WARP / 60, metavar="SECONDS",
+                                help="simulated seconds advanced per frame (default: the interactive speed at 60 FPS)")
+    headless_group.add_argument("--camera", choices=("fixed", "orbit", "flyby"), default="fixed",
+                                help="scripted camera path over the frames (default: the start camera)")
+    headless_group.add_argument("--output", default="frames/frame_%05d.png", metavar="PATTERN",
+                                help="file pattern of the PNG sequence, empty discards the frames")
+    headless_group.add_argument("--pipe", metavar="COMMAND",
+                                help="pipe raw RGBA frames to this encoder command instead of writing PNG files")
+    headless_group.add_argument("--stats", metavar="FILE",
+                                help="write startup time, frame rate and peak memory of the render as JSON to FILE")
+    return parser
+
+
+def runHeadless(args, system, renderer, recorder=None):
+    # Offscreen batch render: every frame advances the simulation by --step, the camera follows --camera
+    from OpenGL.GL import glFinish
+
+    from .headless import EncoderPipe, PixelReader, PngSequence, cameraPath
+
+    profiler, overlay = renderer.profiler, renderer.overlay
+    sink = EncoderPipe(args.pipe) if args.pipe else PngSequence(args.output) if args.output else None
+    reader = PixelReader(renderer.width, renderer.height)
+    # Frames on disk should not show placeholders
+    renderer.textures.wait()
+    camera = Camera()
+    frames = 0
+    startup = None
+    render_start = time.perf_counter()
+    for frame in range(args.frames):
+        profiler.frame()
+        camera.lookAt(*cameraPath(args.camera, frame / max(args.frames - 1, 1), system.bodies.distance_earth))
+        renderer.draw(camera)
+        overlay.update(profiler.stats())
+        overlay.draw()
+        if startup is None:
+            # Startup ends with the first finished frame
+            glFinish()
+            startup = time.time() - START_TIME
+            render_start = time.perf_counter()
+        if recorder is None:
+            with profiler.section("simulation"):
+                system.step(args.step)
+        else:
+            with profiler.section("simulation + recording"):
+                recorder.step(args.step)
+        # The pixels of the previous frame come back while this one is still being rendered
+        with profiler.section("readback"):
+            pixels = reader.read()
+            if pixels is not None and sink is not None:
+                sink.write(frames, pixels)
+                frames += 1
+    for pixels in reader.flush():
+        if sink is not None:
+            sink.write(frames, pixels)
+            frames += 1
+    render_time = time.perf_counter() - render_start
+    if sink is not None:
+        sink.close()
+    reader.release()
+    if args.stats:
+        import json
+        import resource
+
+        p50, p95, p99 = profiler.percentiles()
+        # The first frame belongs to the startup
+        with open(args.stats, "w") as stats:
+            json.dump({"startup_s": startup, "frames": args.frames,
+                       "fps": (args.frames - 1) / render_time if args.frames > 1 and render_time > 0 else 0.0,
+                       "frame_ms": {"p50": p50, "p95": p95, "p99": p99},
+                       "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}, stats)
+
+
+def runInteractive(args, system, renderer, framebuffer, recorder=None):
+    # framebuffer - the float depth render target, presented in the window every frame
+    import pygame
+
+    from .controls import CameraController, EventQueue
+
+    bodies, profiler, overlay = system.bodies, renderer.profiler, renderer.overlay
+    sun = bodies.index("sun")
+    seek_keys = {pygame.K_LEFTBRACKET: -SEEK_DAYS, pygame.K_RIGHTBRACKET: SEEK_DAYS,
+                 pygame.K_PAGEDOWN: -SECONDS_PER_YEAR, pygame.K_PAGEUP: SECONDS_PER_YEAR}
+
+    # The camera starts 100 units in front of the sun, looking at it; the mouse is in relative mode while running
+    camera = Camera()
+    controller = CameraController(camera, MOVEMENT_SPEED)
+    controller.capture(True)
+    queue = EventQueue()
+
+    paused = False
+    run = True
+    clock = SimulationClock(FPS)
+
+    # Hotkey values are printed once when the key is released and shown on the overlay; printing them on every frame
+    # the key is held stalled the loop on stdout
+    hotkey_status = {
+        pygame.K_1: lambda: "Movement speed [units/s]: %g" % controller.speed,
+        pygame.K_3: lambda: "Time warp [s/s]: %g" % clock.warp,
+        pygame.K_5: lambda: "Distance (earth to sun) [mln km]: %g" % bodies.distance_earth,
+        pygame.K_7: lambda: "Earth radius [mln km]: %g" % bodies.radius_earth,
+        pygame.K_9: lambda: "Sun radius [mln km]: %g" % bodies.radius[sun],
+    }
+    hotkey_status.update({pygame.K_2: hotkey_status[pygame.K_1], pygame.K_4: hotkey_status[pygame.K_3],
+                          pygame.K_6: hotkey_status[pygame.K_5], pygame.K_8: hotkey_status[pygame.K_7],
+                          pygame.K_0: hotkey_status[pygame.K_9]})
+    status = ""
+
+    def handleEvents():
+        nonlocal run, paused, status
+        queue.pump()
+        for event in queue.events():
+            if event.type == pygame.QUIT:
+                run = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE or event.key == pygame.K_RETURN:
+                    run = False
+                if event.key == pygame.K_PAUSE or event.key == pygame.K_p:
+                    paused = not paused
+                    # The cursor is free while paused
+                    controller.capture(not paused)
+                    controller.stop()
+                # A recording is one continuous timeline
+                if event.key in seek_keys and recorder is None:
+                    system.seek(seek_keys[event.key])
+                    renderer.invalidate("trails")
+                if event.key == pygame.K_F3:
+                    overlay.toggle()
+            if event.type == pygame.KEYUP and event.key in hotkey_status:
+                status = hotkey_status[event.key]()
+                print(status)
+            # Relative motion of all events is summed and applied once per frame
+            if event.type == pygame.MOUSEMOTION and not paused:
+                controller.look(*event.rel)
+
+    while run:
+        profiler.frame()
+        with profiler.section("events"):
+            handleEvents()
+
+        clock.paused = paused
+        steps = clock.update()
+
+        if not paused:
+            with profiler.section("events"):
+                # get keys
+                keypress = pygame.key.get_pressed()
+
+                # apply speed changes
+                if keypress[pygame.K_1]:
+                    controller.speed /= WARP_SPEED ** clock.elapsed
+                if keypress[pygame.K_2]:
+                    controller.speed *= WARP_SPEED ** clock.elapsed
+                if keypress[pygame.K_3]:
+                    clock.setWarp(clock.warp / WARP_SPEED ** clock.elapsed)
+                if keypress[pygame.K_4]:
+                    clock.setWarp(clock.warp * WARP_SPEED ** clock.elapsed)
+                if keypress[pygame.K_5]:
+                    # Planets distance from sun
+                    bodies.setDistance(bodies.distance_earth - 1)
+                    renderer.invalidate("orbit")
+                if keypress[pygame.K_6]:
+                    # Planets distance from sun
+                    bodies.setDistance(bodies.distance_earth + 1)
+                    renderer.invalidate("orbit")
+                if keypress[pygame.K_7]:
+                    # Sun and planets radius
+                    bodies.setRadius(bodies.radius_earth - 0.001)
+                    renderer.invalidate("ring")
+                if keypress[pygame.K_8]:
+                    # Sun and planets radius
+                    bodies.setRadius(bodies.radius_earth + 0.001)
+                    renderer.invalidate("ring")
+                if keypress[pygame.K_9]:
+                    bodies.setRadiusRatio(sun, bodies.radius_ratio[sun] - 1)
+                if keypress[pygame.K_0]:
+                    bodies.setRadiusRatio(sun, bodies.radius_ratio[sun] + 1)
+
+            with profiler.section("textures"):
+                renderer.textures.poll()
+            if recorder is None:
+                with profiler.section("simulation"):
+                    system.step(clock.dt, steps)
+            else:
+                with profiler.section("simulation + recording"):
+                    recorder.step(clock.dt, steps)
+
+        with profiler.section("camera"):
+            # Pumped again right before drawing, so the mouse motion that arrived during the simulation is in this
+            # frame already and the look does not lag by the frame time
+            handleEvents()
+            if not paused:
+                controller.update(pygame.key.get_pressed(), clock.elapsed)
+
+        if not paused:
+            renderer.draw(camera, clock.alpha)
+            overlay.update(profiler.stats() + [status])
+            overlay.draw()
+
+            with profiler.section("flip"):
+                framebuffer.present()
+                pygame.display.flip()
+
+        clock.wait()
+
+
+def runServer(args, system, recorder=None):
+    # Simulation without rendering, broadcast to the viewers until interrupted
+    import asyncio
+
+    from .network import SnapshotServer, parseAddress
+
+    host, port = parseAddress(args.serve)
+    server = SnapshotServer(system, host, port, rate=args.snapshot_rate, warp=args.warp, recorder=recorder)
+    print("Serving %d bodies and %d small bodies on %s:%d, %g snapshots/s"
+          % (len(system.bodies), sum(len(group) for group in system.small_bodies), host, port, args.snapshot_rate))
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = buildParser()
+    args = parser.parse_args(argv)
+    if args.ephemeris and args.physics:
+        parser.error("--ephemeris and --physics are exclusive")
+    if args.play and (args.record or args.physics or args.ephemeris):
+        parser.error("--play replays a recording, it takes no --record, --physics or --ephemeris")
+    if args.serve and (args.connect or args.headless):
+        parser.error("--serve only simulates, it takes no --connect or --headless")
+    if args.connect and (args.play or args.record or args.physics or args.ephemeris or args.asteroids or args.moons):
+        parser.error("--connect shows the simulation of the server, it takes no --play, --record, --physics, "
+                     "--ephemeris, --asteroids or --moons")
+
+    if args.serve and args.snapshot_rate is None:
+        from .network import SNAPSHOT_RATE
+
+        args.snapshot_rate = SNAPSHOT_RATE
+
+    if args.connect:
+        from .network import RemoteSystem, parseAddress
+
+        system = RemoteSystem(*parseAddress(args.connect))
+    elif args.play:
+        from .recording import Playback
+
+        system = Playback(args.play, loop=args.loop)
+    else:
+        system = SolarSystem(asteroids=args.asteroids, moons=args.moons, physics=args.physics, gravity=args.gravity,
+                             theta=args.theta, workers=args.workers, ephemeris=args.ephemeris, epoch=args.epoch)
+    recorder = None
+    if args.record:
+        from .recording import Recorder
+
+        if args.headless:
+            interval = args.record_interval or args.step
+        else:
+            interval = args.record_interval or (args.warp / args.snapshot_rate if args.serve else DEFAULT_WARP / FPS)
+        recorder = Recorder(args.record, system, interval)
+
+    if args.serve:
+        runServer(args, system, recorder)
+        if recorder is not None:
+            recorder.close()
+        system.close()
+        return 0
+
+    if args.headless:
+        # PyOpenGL picks its platform on the first import, so this has to happen before any OpenGL import
+        os.environ["PYOPENGL_PLATFORM"] = args.headless
+        from .headless import OffscreenContext
+
+        display = args.size
+        context = OffscreenContext(args.headless, *display)
+    else:
+        import pygame
+
+        from .headless import CONTEXT_VERSION, Framebuffer
+
+        pygame.init()
+        display = WINDOW_SIZE
+        # A core profile context; depth comes from the float buffer of the framebuffer, the window only gets the colour
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, CONTEXT_VERSION[0])
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, CONTEXT_VERSION[1])
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, pygame.GL_CONTEXT_PROFILE_CORE)
+        pygame.display.gl_set_attribute(pygame.GL_CONTEXT_FLAGS, pygame.GL_CONTEXT_FORWARD_COMPATIBLE_FLAG)
+        pygame.display.gl_set_attribute(pygame.GL_DEPTH_SIZE, 0)
+        pygame.display.set_mode(display, pygame.DOUBLEBUF | pygame.OPENGL)
+        framebuffer = Framebuffer(*display)
+
+    from .renderer import Renderer
+    from .textures import DEFAULT_CACHE
+
+    renderer = Renderer(system, *display,
+                        texture_cache=DEFAULT_CACHE if args.texture_cache is None else args.texture_cache,
+                        compress_textures=args.compress_textures, trace=args.trace is not None,
+                        overlay=args.overlay, orbits=args.orbits)
+    if args.headless:
+        runHeadless(args, system, renderer, recorder)
+    else:
+        runInteractive(args, system, renderer, framebuffer, recorder)
+
+    if args.trace:
+        renderer.profiler.exportTrace(args.trace)
+    if recorder is not None:
+        recorder.close()
+    renderer.release()
+    system.close()
+    if args.headless:
+        context.release()
+    else:
+        framebuffer.release()
+        pygame.quit()
+    return 0
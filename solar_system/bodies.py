@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Body table: every celestial body is one row of a set of NumPy columns, so the
+# whole system advances with a couple of array operations per frame.
+# ---------------------------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+
+from .clock import SECONDS_PER_YEAR
+
+# Config shipped with the package, its maps lie next to it
+DEFAULT_BODIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bodies.json")
+# Self rotation of the earth relative to its orbital speed (days in a year)
+DAYS_PER_YEAR = 365
+
+
+class BodyTable:
+    """Array backed table of celestial bodies.
+
+    Base ratios (orbital period and day length in earth years/days, radius and distance relative to the earth) come
+    from the config file and never change. The derived columns - rates, distance and radius - are the ratios times
+    one of three scale values, and each hotkey rescales just the column it affects. Rates are in degrees per simulated
+    second, the clock decides how many simulated seconds pass.
+    """
+
+    def __init__(self, name, texture, orbital_period, day_length, radius_ratio, distance_ratio, ring, star,
+                 moons=None, mass=None, eccentricity=None, inclination=None, perihelion=None, node=None,
+                 mean_longitude=None, rotation_main_earth=360 / SECONDS_PER_YEAR, distance_earth=149.0,
+                 radius_earth=0.01276):
+        self.name = list(name)
+        self.texture = list(texture)
+        self.orbital_period = np.asarray(orbital_period, dtype=np.float64)
+        self.day_length = np.asarray(day_length, dtype=np.float64)
+        self.radius_ratio = np.asarray(radius_ratio, dtype=np.float64)
+        self.distance_ratio = np.asarray(distance_ratio, dtype=np.float64)
+        self.ring = np.asarray(ring, dtype=bool)
+        self.star = np.asarray(star, dtype=bool)
+        # Number of moons drawn around each body when the moon systems are enabled
+        self.moons = np.zeros(len(self.name), dtype=int) if moons is None else np.asarray(moons, dtype=int)
+        # Mass in earth masses, used by the gravity engine
+        self.mass = np.zeros(len(self.name)) if mass is None else np.asarray(mass, dtype=np.float64)
+        # Keplerian elements at J2000 in degrees (longitudes of perihelion and ascending node, mean longitude), used
+        # by the ephemeris mode; the semi-major axis is the distance ratio
+        self.eccentricity, self.inclination, self.perihelion, self.node, self.mean_longitude = (
+            np.zeros(len(self.name)) if column is None else np.asarray(column, dtype=np.float64)
+            for column in (eccentricity, inclination, perihelion, node, mean_longitude))
+
+        # Row 0 holds the angle around the sun, row 1 the self-rotation angle; rates uses the same layout
+        self.angles = np.zeros((2, len(self.name)))
+        self.rates = np.zeros((2, len(self.name)))
+        self.distance = np.zeros(len(self.name))
+        self.radius = np.zeros(len(self.name))
+        self.last_dt = 0.0
+        # Config file the table was read from, if any
+        self.config = None
+
+        self.setRotation(rotation_main_earth)
+        self.setDistance(distance_earth)
+        self.setRadius(radius_earth)
+
+    @classmethod
+    def fromFile(cls, path=DEFAULT_BODIES):
+        with open(path) as config:
+            data = json.load(config)
+        columns = dict(zip(data["columns"], zip(*data["bodies"])))
+        # Texture paths are relative to the config file
+        columns["texture"] = [os.path.join(os.path.dirname(os.path.abspath(path)), texture)
+                              for texture in columns["texture"]]
+        table = cls(**columns, **data.get("scale", {}))
+        table.config = os.path.abspath(path)
+        return table
+
+    def __len__(self):
+        return len(self.name)
+
+    def index(self, name):
+        return self.name.index(name)
+
+    @property
+    def angle(self):
+        return self.angles[0]
+
+    @property
+    def angle_self(self):
+        return self.angles[1]
+
+    @property
+    def orbiting(self):
+        return self.orbital_period > 0
+
+    def positions(self, angle=None):
+        # Orbits lie in the XY plane and are rotated around the Z axis, just like the glRotatef/glTranslatef pair
+        angle = np.radians(self.angle if angle is None else angle)
+        return np.stack((self.distance * np.cos(angle), self.distance * np.sin(angle), np.zeros(len(self))), axis=-1)
+
+    def setRotation(self, rotation_main_earth):
+        self.rotation_main_earth = rotation_main_earth
+        # Bodies without an orbital period (the sun) stay in place
+        period = np.where(self.orbiting, self.orbital_period, np.inf)
+        np.divide(rotation_main_earth, period, out=self.rates[0])
+        np.divide(rotation_main_earth * DAYS_PER_YEAR, self.day_length, out=self.rates[1])
+
+    def setDistance(self, distance_earth):
+        self.distance_earth = distance_earth
+        np.multiply(self.distance_ratio, distance_earth, out=self.distance)
+
+    def setRadius(self, radius_earth):
+        self.radius_earth = radius_earth
+        np.multiply(self.radius_ratio, radius_earth, out=self.radius)
+
+    def setRadiusRatio(self, index, ratio):
+        self.radius_ratio[index] = ratio
+        self.radius[index] = self.radius_ratio[index] * self.radius_earth
+
+    def step(self, dt):
+        # Advance every orbital and self-rotation angle at once
+        self.angles += self.rates * dt
+        np.mod(self.angles, 360, out=self.angles)
+        self.last_dt = dt
+
+    def interpolate(self, alpha):
+        # Angles between the previous and the current step; the motion is linear, so going back along the rates is
+        # exact and does not care about wrapping at 360
+        return np.mod(self.angles + self.rates * (self.last_dt * (alpha - 1.0)), 360)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Camera: position in double precision and orientation as a unit quaternion,
+# both kept on the CPU. The renderer draws everything relative to the camera,
+# so the float32 numbers on the GPU stay small and close-ups of the outer
+# planets are as steady as close-ups of the earth.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+
+# Start camera of the interactive mode and of the fixed render: 100 units in front of the sun, looking at it
+START_EYE = (0.0, -100.0, 0.0)
+
+
+def quaternion(axis, angle):
+    # Unit quaternion (w, x, y, z) of a rotation by angle (degrees) around axis
+    axis = np.asarray(axis, dtype=np.float64)
+    half = np.radians(angle) / 2
+    return np.concatenate(([np.cos(half)], np.sin(half) * axis / np.linalg.norm(axis)))
+
+
+def multiply(a, b):
+    # Hamilton product: the rotation b followed by a
+    aw, ax, ay, az = a
+    bw, bx, by, bz = b
+    return np.array([aw * bw - ax * bx - ay * by - az * bz,
+                     aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw])
+
+
+def rotationMatrix(q):
+    # 3x3 matrix of a unit quaternion, for column vectors
+    w, x, y, z = q
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                     [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                     [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
+
+
+def matrixQuaternion(m):
+    # Unit quaternion of a rotation matrix, from its largest diagonal term so the division stays well conditioned
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    if trace > 0:
+        s = 2 * np.sqrt(trace + 1)
+        q = (s / 4, (m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s)
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = ((m[2, 1] - m[1, 2]) / s, s / 4, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s)
+    elif m[1, 1] > m[2, 2]:
+        s = 2 * np.sqrt(1 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = ((m[0, 2] - m[2, 0]) / s, (m[0, 1] + m[1, 0]) / s, s / 4, (m[1, 2] + m[2, 1]) / s)
+    else:
+        s = 2 * np.sqrt(1 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = ((m[1, 0] - m[0, 1]) / s, (m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, s / 4)
+    q = np.array(q)
+    return q / np.linalg.norm(q)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float64)
+    return vector / np.linalg.norm(vector)
+
+
+class Camera:
+    """Eye of the scene: position in scene units and orientation, both in double precision.
+
+    The orientation is a unit quaternion turning camera axes into world axes; as in OpenGL the camera looks along its
+    -Z axis with +Y up. turn() yaws around the world up axis of the last lookAt() and pitches around the camera's own
+    right axis, so the horizon never rolls; move() goes along the right axis, the up axis and the level forward
+    direction. Nothing is ever read back from the GL: view() builds the matrix for any origin, the renderer passes the
+    camera position itself, which leaves only the rotation.
+    """
+
+    def __init__(self, eye=START_EYE, target=(0.0, 0.0, 0.0), up=(0.0, 0.0, 1.0)):
+        self.lookAt(eye, target, up)
+
+    def lookAt(self, eye, target, up):
+        # Same arguments as gluLookAt
+        self.position = np.array(eye, dtype=np.float64)
+        self.up = _unit(up)
+        back = _unit(self.position - np.asarray(target, dtype=np.float64))
+        right = _unit(np.cross(self.up, back))
+        self.orientation = matrixQuaternion(np.column_stack((right, np.cross(back, right), back)))
+
+    def rotation(self):
+        # Camera to world rotation; the columns are the right, up and back axes of the camera
+        return rotationMatrix(self.orientation)
+
+    def turn(self, yaw, pitch):
+        # Degrees: positive yaw turns right, positive pitch looks up
+        orientation = multiply(multiply(quaternion(self.up, -yaw), self.orientation), quaternion((1, 0, 0), pitch))
+        # Normalised every time, so rounding does not build up over a long session
+        self.orientation = orientation / np.linalg.norm(orientation)
+
+    def move(self, right, up, forward):
+        # Scene units along the right axis, the world up axis and forward on the level of the camera
+        axis = self.rotation()[:, 0]
+        self.position += right * axis + up * self.up + forward * np.cross(self.up, axis)
+
+    def view(self, origin=None):
+        # World to eye matrix for coordinates relative to origin (the world origin by default), in the layout OpenGL
+        # reads back (row vectors: eye = point . view)
+        rotation = self.rotation()
+        offset = self.position if origin is None else self.position - np.asarray(origin, dtype=np.float64)
+        matrix = np.identity(4)
+        matrix[:3, :3] = rotation
+        matrix[3, :3] = -offset @ rotation
+        return matrix
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Simulation clock: frame pacing, a fixed-step accumulator decoupled from the
+# render rate and the time-warp multiplier (simulated seconds per real second).
+# ---------------------------------------------------------------------------
+
+import time
+
+SECONDS_PER_YEAR = 365.25 * 86400
+
+# The old loop advanced the earth by 0.01 degree per frame at 60 FPS, one orbit every 10 minutes
+DEFAULT_WARP = 0.01 * 60 / 360 * SECONDS_PER_YEAR
+MIN_WARP = 1.0
+MAX_WARP = 10 * SECONDS_PER_YEAR
+
+
+class SimulationClock:
+    """Fixed-step simulation clock.
+
+    Real time is accumulated in integer nanoseconds, so nothing drifts however long the session runs. update() returns
+    how many fixed steps are due; the caller advances the simulation by steps * dt simulated seconds and renders with
+    alpha, the fraction of the next step that has already elapsed. wait() sleeps whatever is left of the frame budget
+    after rendering.
+    """
+
+    def __init__(self, fps=60, step=1 / 120, warp=DEFAULT_WARP):
+        self.frame_ns = int(1e9 / fps) if fps else 0
+        self.step_ns = int(round(step * 1e9))
+        self.warp = warp
+        self.time = 0.0  # simulated seconds since start
+        self.alpha = 1.0
+        self.elapsed = 0.0  # real seconds between the last two updates
+        self.paused = False
+        self.accumulator = 0
+        self.last = self.frame_start = time.perf_counter_ns()
+
+    @property
+    def step(self):
+        # Real seconds per fixed step
+        return self.step_ns / 1e9
+
+    @property
+    def dt(self):
+        # Simulated seconds per fixed step at the current warp
+        return self.step * self.warp
+
+    def setWarp(self, warp):
+        self.warp = min(max(warp, MIN_WARP), MAX_WARP)
+
+    def update(self):
+        now = time.perf_counter_ns()
+        elapsed, self.last = now - self.last, now
+        self.elapsed = elapsed / 1e9
+        if self.paused:
+            return 0
+        self.accumulator += elapsed
+        steps, self.accumulator = divmod(self.accumulator, self.step_ns)
+        self.alpha = self.accumulator / self.step_ns
+        self.time += steps * self.dt
+        return steps
+
+    def wait(self):
+        # Render time is already spent, only sleep for the rest of the frame budget
+        remaining = self.frame_start + self.frame_ns - time.perf_counter_ns()
+        if remaining > 0:
+            time.sleep(remaining / 1e9)
+        # Keep the frame grid unless we fell behind by more than a frame, then start a new one
+        self.frame_start = max(self.frame_start + self.frame_ns, time.perf_counter_ns() - self.frame_ns)
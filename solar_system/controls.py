@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Camera controls of the interactive mode. Window events go into a queue as
+# soon as they are pumped; the controller sums the relative mouse motion and
+# applies it, with the keyboard flight, once per frame, right before the frame
+# is drawn. Neither the look nor the flight speed depends on the frame time.
+# ---------------------------------------------------------------------------
+
+import collections
+import math
+
+import numpy as np
+import pygame
+
+# Degrees of camera turn per pixel of mouse motion
+LOOK_SENSITIVITY = 0.1
+# Time constant of the keyboard flight in seconds: the velocity settles to the keys held within about this long
+FLIGHT_SMOOTHING = 0.08
+
+
+class EventQueue:
+    """Window events in arrival order.
+
+    pump() moves whatever SDL has collected into a deque, events() hands them out; appending and popping at the two
+    ends of a deque are atomic, so the pump and the consumer never wait for each other. SDL only pumps events on the
+    thread that owns the window, so the loop pumps several times per frame instead: at its start and again right before
+    the camera is updated, which gets the input that arrived during the simulation into the same frame.
+    """
+
+    def __init__(self):
+        self.queue = collections.deque()
+
+    def pump(self):
+        self.queue.extend(pygame.event.get())
+
+    def events(self):
+        while self.queue:
+            yield self.queue.popleft()
+
+
+class CameraController:
+    """Moves a Camera from the input of a frame.
+
+    look() adds relative mouse motion, which update() applies in one turn. The movement keys held (W/S forward and
+    back, A/D sideways, Z/X up and down) set the target velocity of the flight, speed in units per second; the velocity
+    follows it with the time constant FLIGHT_SMOOTHING and moves the camera by velocity * elapsed seconds.
+    capture() switches the mouse to relative mode: the cursor is hidden and grabbed, and motion events report deltas
+    that are not stopped by the window border, so the cursor never has to be warped back to the center.
+    """
+
+    def __init__(self, camera, speed):
+        self.camera = camera
+        self.speed = speed
+        self.look_x = 0.0
+        self.look_y = 0.0
+        self.velocity = np.zeros(3)  # right, up, forward
+
+    def capture(self, enabled):
+        pygame.mouse.set_visible(not enabled)
+        pygame.event.set_grab(enabled)
+        # Motion from before the switch belongs to the free cursor
+        self.look_x = self.look_y = 0.0
+
+    def look(self, dx, dy):
+        self.look_x += dx
+        self.look_y += dy
+
+    def update(self, keys, elapsed):
+        # keys - pygame.key.get_pressed(), elapsed - seconds since the last update
+        camera = self.camera
+        if self.look_x or self.look_y:
+            camera.turn(self.look_x * LOOK_SENSITIVITY, -self.look_y * LOOK_SENSITIVITY)
+            self.look_x = self.look_y = 0.0
+
+        target = self.speed * np.array([keys[pygame.K_d] - keys[pygame.K_a], keys[pygame.K_z] - keys[pygame.K_x],
+                                        keys[pygame.K_w] - keys[pygame.K_s]], dtype=np.float64)
+        self.velocity += (target - self.velocity) * (1.0 - math.exp(-elapsed / FLIGHT_SMOOTHING))
+        if self.velocity.any():
+            camera.move(*(self.velocity * elapsed))
+
+    def stop(self):
+        self.velocity[:] = 0.0
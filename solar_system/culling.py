@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# View-frustum culling: frustum planes from the projection and view matrices,
+# bounding sphere tests for the bodies and orbit arcs, and a bounding volume
+# hierarchy over the small bodies that is refitted every frame and only
+# rebuilt when the motion has made it loose.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+
+from .nbody import mortonKeys
+
+# Items per leaf of the hierarchy
+LEAF_SIZE = 64
+# The hierarchy is rebuilt once its leaves have grown by this factor since the last build
+REBUILD_GROWTH = 2.0
+
+
+class Frustum:
+    """The six clip planes (a, b, c, d with ax + by + cz + d >= 0 inside) in world coordinates."""
+
+    def __init__(self, planes):
+        self.planes = planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+    @classmethod
+    def fromMatrices(cls, projection, view):
+        # Matrices as read from OpenGL, i.e. for row vectors: clip = world . view . projection. Every plane is the
+        # w column plus or minus one of the x, y, z columns (Gribb and Hartmann)
+        view = np.asarray(view, dtype=np.float64).reshape(4, 4)
+        matrix = view @ np.asarray(projection, dtype=np.float64).reshape(4, 4)
+        w = matrix[:, 3]
+        return cls(np.stack([w + matrix[:, axis] for axis in range(3)] + [w - matrix[:, axis] for axis in range(3)]))
+
+    def distances(self, centers):
+        return centers @ self.planes[:, :3].T + self.planes[:, 3]
+
+    def spheres(self, centers, radii):
+        # True for every sphere at least partly inside
+        return (self.distances(centers) >= -np.asarray(radii)[..., None]).all(axis=-1)
+
+    def boxes(self, low, high):
+        # -1 outside, 0 crossing a plane, 1 completely inside, for every axis aligned box
+        distance = self.distances((low + high) / 2)
+        reach = ((high - low) / 2) @ np.abs(self.planes[:, :3]).T
+        outside = (distance < -reach).any(axis=-1)
+        inside = (distance >= reach).all(axis=-1)
+        return np.where(outside, -1, inside.astype(int))
+
+
+class BoundingVolumeHierarchy:
+    """Binary hierarchy of axis aligned boxes over bounding spheres.
+
+    Items are sorted along a Z-order curve and cut into leaves of LEAF_SIZE; the tree over the leaves is implicit (node
+    i has the children 2i and 2i + 1, the root is 1), so a refit is a handful of vectorized reductions. update() refits
+    the boxes to the moved spheres and only sorts again when the leaves have grown too loose. query() walks the tree one
+    level at a time, accepts whole subtrees inside the frustum and tests single items only in crossed leaves.
+    """
+
+    def __init__(self):
+        self.order = None
+        self.built_size = None
+
+    def _build(self, centers):
+        low, high = centers.min(axis=0), centers.max(axis=0)
+        self.order = np.argsort(mortonKeys(centers, (low + high) / 2, max((high - low).max() / 2, 1e-12) * 1.001))
+        self.count = len(centers)
+        self.leaves = 1 << max(int(np.ceil(np.log2(max(-(-self.count // LEAF_SIZE), 1)))), 0)
+        self.starts = np.arange(0, self.count, LEAF_SIZE)
+        self.built_size = None
+
+    def update(self, centers, radii):
+        centers = np.asarray(centers, dtype=np.float64)
+        if self.order is None or len(centers) != self.count:
+            self._build(centers)
+        self.centers, self.radii = centers[self.order], np.asarray(radii, dtype=np.float64)[self.order]
+
+        low = np.full((2 * self.leaves, 3), np.inf)
+        high = np.full((2 * self.leaves, 3), -np.inf)
+        used = self.leaves + np.arange(len(self.starts))
+        low[used] = np.minimum.reduceat(self.centers - self.radii[:, None], self.starts)
+        high[used] = np.maximum.reduceat(self.centers + self.radii[:, None], self.starts)
+        level = self.leaves // 2
+        while level:
+            low[level:2 * level] = np.minimum(low[2 * level:4 * level:2], low[2 * level + 1:4 * level:2])
+            high[level:2 * level] = np.maximum(high[2 * level:4 * level:2], high[2 * level + 1:4 * level:2])
+            level //= 2
+        self.low, self.high = low, high
+
+        # Refitting keeps the tree valid but not tight: items of one leaf drift apart as they move on their orbits
+        size = np.linalg.norm(high[used] - low[used], axis=1).sum()
+        if self.built_size is None:
+            self.built_size = size
+        elif size > REBUILD_GROWTH * self.built_size:
+            self.order = None
+            self.update(centers, radii)
+
+    def query(self, frustum):
+        # Indices of the items whose spheres are at least partly inside the frustum
+        accepted, crossed = [], []
+        nodes, level = np.ones(1, dtype=int), 1
+        while nodes.size:
+            # Padding leaves past the last item have empty boxes
+            nodes = nodes[(self.low[nodes, 0] <= self.high[nodes, 0])]
+            state = frustum.boxes(self.low[nodes], self.high[nodes])
+            # Nodes cover consecutive leaves, leaves consecutive items
+            span = self.leaves // level
+            first = (nodes - level) * span * LEAF_SIZE
+            inside = first[state == 1]
+            accepted.append(_expand(inside, np.minimum(inside + span * LEAF_SIZE, self.count)))
+            partial = nodes[state == 0]
+            if level == self.leaves:
+                crossed = partial - level
+                break
+            nodes, level = np.stack((2 * partial, 2 * partial + 1), axis=-1).ravel(), 2 * level
+
+        items = (np.asarray(crossed, dtype=int)[:, None] * LEAF_SIZE + np.arange(LEAF_SIZE)).ravel()
+        items = items[items < self.count]
+        accepted.append(items[frustum.spheres(self.centers[items], self.radii[items])])
+        return self.order[np.concatenate(accepted)]
+
+
+def _expand(starts, ends):
+    # Concatenated aranges of the ranges [start, end)
+    counts = ends - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+def visibleRanges(frustum, arcs, scale=1.0):
+    # Index ranges (first, count) of the arcs of a mesh that are inside the frustum, neighbours merged into one
+    centers, radii, first, count = arcs
+    visible = frustum.spheres(centers * scale, radii * scale)
+    first, end = first[visible], first[visible] + count[visible]
+    if not first.size:
+        return first, first
+    new = np.ones(first.size, dtype=bool)
+    new[1:] = first[1:] > end[:-1]
+    starts = np.flatnonzero(new)
+    return first[starts], np.maximum.reduceat(end, starts) - first[starts]
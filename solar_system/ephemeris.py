@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Analytic Keplerian ephemeris: heliocentric positions straight from the
+# orbital elements at any epoch, without replaying the frames in between.
+# Times are simulated seconds since J2000, positions are in AU.
+# ---------------------------------------------------------------------------
+
+import math
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from .clock import SECONDS_PER_YEAR
+
+J2000 = datetime(2000, 1, 1, 12, tzinfo=timezone.utc)
+SECONDS_PER_DAY = 86400.0
+
+
+def secondsSinceJ2000(date):
+    # date - datetime or ISO 8601 string ("2024-03-20" or "2024-03-20T12:00")
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return (date - J2000).total_seconds()
+
+
+def solveKepler(mean_anomaly, eccentricity, tolerance=1e-12, iterations=32):
+    """Eccentric anomaly E of M = E - e sin E, Newton's method for all orbits and epochs at once (radians)."""
+    mean_anomaly = np.remainder(np.asarray(mean_anomaly, dtype=np.float64) + math.pi, 2 * math.pi) - math.pi
+    eccentricity = np.broadcast_to(eccentricity, mean_anomaly.shape)
+    # Starting at pi (-pi for negative mean anomalies, on the same side of the flat part around 0) converges for any
+    # eccentricity, the series start is closer for the usual near-circular orbits
+    anomaly = np.where(eccentricity < 0.8, mean_anomaly + eccentricity * np.sin(mean_anomaly),
+                       np.copysign(math.pi, mean_anomaly))
+    for _ in range(iterations):
+        delta = (anomaly - eccentricity * np.sin(anomaly) - mean_anomaly) / (1 - eccentricity * np.cos(anomaly))
+        anomaly -= delta
+        if np.abs(delta).max(initial=0.0) < tolerance:
+            break
+    return anomaly
+
+
+class Ephemeris:
+    """Keplerian orbits of the bodies of a table; bodies without an orbital period stay at the origin."""
+
+    def __init__(self, bodies):
+        orbiting = bodies.orbiting
+        self.semi_major = np.where(orbiting, bodies.distance_ratio, 0.0)
+        self.eccentricity = bodies.eccentricity.copy()
+        # Mean motion in radians per year from the orbital period of the table
+        self.mean_motion = np.where(orbiting, 2 * math.pi / np.where(orbiting, bodies.orbital_period, 1.0), 0.0)
+        self.mean_anomaly = np.radians(bodies.mean_longitude - bodies.perihelion)
+
+        # Perifocal basis in ecliptic coordinates: P points to the perihelion, Q 90 degrees ahead in the orbit
+        node = np.radians(bodies.node)
+        argument = np.radians(bodies.perihelion - bodies.node)
+        inclination = np.radians(bodies.inclination)
+        cos_o, sin_o = np.cos(node), np.sin(node)
+        cos_w, sin_w = np.cos(argument), np.sin(argument)
+        cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+        self.p = np.stack((cos_w * cos_o - sin_w * sin_o * cos_i, cos_w * sin_o + sin_w * cos_o * cos_i,
+                           sin_w * sin_i), axis=-1)
+        self.q = np.stack((-sin_w * cos_o - cos_w * sin_o * cos_i, -sin_w * sin_o + cos_w * cos_o * cos_i,
+                           cos_w * sin_i), axis=-1)
+
+    def __len__(self):
+        return self.semi_major.size
+
+    def state(self, seconds):
+        """Positions (AU) and velocities (AU/year) at one epoch or an array of epochs: (..., bodies, 3)."""
+        years = np.asarray(seconds, dtype=np.float64)[..., None] / SECONDS_PER_YEAR
+        anomaly = solveKepler(self.mean_anomaly + self.mean_motion * years, self.eccentricity)
+        cos_e, sin_e = np.cos(anomaly), np.sin(anomaly)
+        minor = self.semi_major * np.sqrt(1 - self.eccentricity ** 2)
+        rate = self.mean_motion / (1 - self.eccentricity * cos_e)  # dE/dt
+        x, y = self.semi_major * (cos_e - self.eccentricity), minor * sin_e
+        vx, vy = -self.semi_major * sin_e * rate, minor * cos_e * rate
+        positions = x[..., None] * self.p + y[..., None] * self.q
+        velocities = vx[..., None] * self.p + vy[..., None] * self.q
+        return positions, velocities
+
+    def positions(self, seconds):
+        return self.state(seconds)[0]
+
+    def orbitPath(self, index, samples=256):
+        # Closed ellipse of one body in AU, evenly spaced in eccentric anomaly
+        anomaly = np.linspace(0.0, 2 * math.pi, samples, endpoint=False)[:, None]
+        e, a = self.eccentricity[index], self.semi_major[index]
+        return a * ((np.cos(anomaly) - e) * self.p[index] + math.sqrt(1 - e ** 2) * np.sin(anomaly) * self.q[index])
+
+
+class EphemerisCache:
+    """Precomputed positions on a regular time grid, in LRU-cached blocks.
+
+    A lookup finds its block and the two samples around the epoch in O(1) and joins them with a cubic Hermite spline
+    (positions and velocities at both ends), so seeking anywhere costs the same as the next frame. A block that is not
+    cached yet is computed with one vectorized Kepler solve.
+    """
+
+    def __init__(self, ephemeris, resolution=SECONDS_PER_DAY, block=512, blocks=256):
+        self.ephemeris = ephemeris
+        self.resolution = resolution
+        self.block = block
+        self._table = lru_cache(maxsize=blocks)(self._computeBlock)
+
+    def _computeBlock(self, index):
+        # One sample more than the block, so the last interval of the block is inside it
+        times = (index * self.block + np.arange(self.block + 1)) * self.resolution
+        return self.ephemeris.state(times)
+
+    def positions(self, seconds):
+        sample = seconds / self.resolution
+        whole = math.floor(sample)
+        fraction = sample - whole
+        index, offset = divmod(whole, self.block)
+        positions, velocities = self._table(index)
+        p0, p1 = positions[offset], positions[offset + 1]
+        # Velocities are per year, the spline runs over one sample interval
+        scale = self.resolution / SECONDS_PER_YEAR
+        m0, m1 = velocities[offset] * scale, velocities[offset + 1] * scale
+        t, t2, t3 = fraction, fraction ** 2, fraction ** 3
+        return ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0 +
+                (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1)
+
+    def clear(self):
+        self._table.cache_clear()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Geometry cache: spheres, orbits and rings are tessellated once on the CPU,
+# uploaded to vertex buffer objects and afterwards only drawn with a transform.
+# Every mesh has its own vertex array object, binding it is all a draw needs.
+# ---------------------------------------------------------------------------
+
+import ctypes
+import math
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from .shaders import splitPrecision
+
+# Interleaved vertex layout: position (3), normal (3), texture coordinates (2)
+VERTEX_STRIDE = 8 * 4
+NORMAL_OFFSET = ctypes.c_void_p(3 * 4)
+TEXCOORD_OFFSET = ctypes.c_void_p(6 * 4)
+# Attribute locations of the vertex layout, the shaders declare the same ones
+POSITION_LOCATION = 0
+NORMAL_LOCATION = 1
+TEXCOORD_LOCATION = 2
+# Low float parts of the positions of meshes in world coordinates, in a buffer of their own (see Mesh)
+POSITION_LOW_LOCATION = 4
+# Orbits are cut into this many arcs with their own bounding spheres, so the parts out of view can be skipped
+ORBIT_ARCS = 16
+
+
+def sphereMesh(slices, stacks):
+    # Same vertex order, normals and texture coordinates as gluSphere, so the planet maps stay where they were
+    rho = np.linspace(0.0, math.pi, stacks + 1)
+    theta = np.linspace(0.0, 2.0 * math.pi, slices + 1)
+    theta[-1] = 0.0  # close the seam exactly like GLU does
+    rho, theta = np.meshgrid(rho, theta, indexing="ij")
+
+    normals = np.stack((-np.sin(theta) * np.sin(rho), np.cos(theta) * np.sin(rho), np.cos(rho)), axis=-1)
+    s, t = np.meshgrid(np.linspace(0.0, 1.0, slices + 1), np.linspace(1.0, 0.0, stacks + 1))
+    vertices = np.concatenate((normals, normals, np.stack((s, t), axis=-1)), axis=-1)
+
+    ring = np.arange(stacks)[:, None] * (slices + 1) + np.arange(slices)[None, :]
+    quads = np.stack((ring, ring + slices + 1, ring + 1, ring + 1, ring + slices + 1, ring + slices + 2), axis=-1)
+    return vertices.reshape(-1, 8), quads.reshape(-1)
+
+
+def torusMesh(inner_radius, outer_radius, sides, rings, wire=False):
+    # Same parametrisation as glutSolidTorus / glutWireTorus: the torus lies in the XY plane around the Z axis
+    psi = np.linspace(0.0, 2.0 * math.pi, rings, endpoint=False)
+    phi = np.linspace(0.0, 2.0 * math.pi, sides, endpoint=False)
+    psi, phi = np.meshgrid(psi, phi, indexing="ij")
+
+    normals = np.stack((np.cos(psi) * np.cos(phi), np.sin(psi) * np.cos(phi), np.sin(phi)), axis=-1)
+    positions = np.stack((np.cos(psi) * outer_radius, np.sin(psi) * outer_radius, np.zeros_like(psi)), axis=-1)
+    positions += normals * inner_radius
+    texcoords = np.stack((psi / (2.0 * math.pi), phi / (2.0 * math.pi)), axis=-1)
+    vertices = np.concatenate((positions, normals, texcoords), axis=-1)
+
+    index = np.arange(rings * sides).reshape(rings, sides)
+    next_ring = np.roll(index, -1, axis=0)
+    next_side = np.roll(index, -1, axis=1)
+    if wire:
+        lines = np.stack((index, next_ring, index, next_side), axis=-1)
+        return vertices.reshape(-1, 8), lines.reshape(-1)
+    next_both = np.roll(next_ring, -1, axis=1)
+    quads = np.stack((index, next_ring, next_side, next_side, next_ring, next_both), axis=-1)
+    return vertices.reshape(-1, 8), quads.reshape(-1)
+
+
+def quadMesh(low=-1.0, high=1.0):
+    # Square from low to high in the XY plane facing +Z, texture coordinates over the whole map
+    corners = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.float64)
+    vertices = np.zeros((4, 8))
+    vertices[:, :2] = low + corners * (high - low)
+    vertices[:, 5] = 1.0
+    vertices[:, 6:] = corners
+    return vertices, [0, 1, 2, 0, 2, 3]
+
+
+def pathMesh(points):
+    # Closed line through the given points, drawn as GL_LINE_STRIP that repeats the first point at the end, so any
+    # run of segments can be drawn on its own; normals point up out of the ecliptic
+    vertices = np.zeros((len(points) + 1, 8))
+    vertices[:-1, :3] = points
+    vertices[:-1, 5] = 1.0
+    vertices[:-1, 6] = np.linspace(0.0, 1.0, len(points), endpoint=False)
+    vertices[-1] = vertices[0]
+    return vertices, np.arange(len(vertices))
+
+
+def arcBounds(points, indices_per_segment, overlap=0, margin=0.0, arcs=ORBIT_ARCS):
+    """Bounding spheres and index ranges of the arcs of a closed curve.
+
+    points - the curve with the first point repeated at the end, one segment between neighbours
+    indices_per_segment - indices the mesh spends per segment, overlap - extra indices at the end of every range
+    (1 for a line strip, which needs the end vertex of the last segment), margin - added to every radius
+    Returns (centers, radii, first, count).
+    """
+    boundaries = np.linspace(0, len(points) - 1, arcs + 1).astype(int)
+    centers, radii = [], []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        arc = points[start:end + 1]
+        center = (arc.min(axis=0) + arc.max(axis=0)) / 2
+        centers.append(center)
+        radii.append(np.linalg.norm(arc - center, axis=1).max() + margin)
+    first = boundaries[:-1] * indices_per_segment
+    count = np.diff(boundaries) * indices_per_segment + overlap
+    return np.array(centers), np.array(radii), first, count
+
+
+class Mesh:
+    """Vertex and index buffer pair living on the GPU, with the vertex array object that reads them.
+
+    precise - also upload the float32 remainders of the positions, for meshes the size of an orbit that the shader
+    moves to the camera in two parts (origin_high and origin_low of the object block)
+    """
+
+    def __init__(self, vertices, indices, mode=GL_TRIANGLES, precise=False):
+        vertices = np.asarray(vertices, dtype=np.float64)
+        low = splitPrecision(vertices[:, :3])[1] if precise else None
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        self.mode = mode
+        self.count = indices.size
+        # Optional arcs (see arcBounds) for drawing only parts of the mesh
+        self.arcs = None
+        self.vao = glGenVertexArrays(1)
+        self.vbo, self.ibo = glGenBuffers(2)
+        self.low_vbo = None
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        for location, size, offset in ((POSITION_LOCATION, 3, ctypes.c_void_p(0)), (NORMAL_LOCATION, 3, NORMAL_OFFSET),
+                                       (TEXCOORD_LOCATION, 2, TEXCOORD_OFFSET)):
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, VERTEX_STRIDE, offset)
+        if low is not None:
+            # Without this array the shader reads the default attribute value, zero
+            self.low_vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.low_vbo)
+            glBufferData(GL_ARRAY_BUFFER, low.nbytes, np.ascontiguousarray(low), GL_STATIC_DRAW)
+            glEnableVertexAttribArray(POSITION_LOW_LOCATION)
+            glVertexAttribPointer(POSITION_LOW_LOCATION, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def bind(self):
+        glBindVertexArray(self.vao)
+
+    def unbind(self):
+        glBindVertexArray(0)
+
+    def drawBound(self, first=None, count=None):
+        # With the vertex array already bound, e.g. by a batch of draws of this mesh: all indices or only the given
+        # runs of them
+        if first is None:
+            glDrawElements(self.mode, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+            return
+        for start, size in zip(first, count):
+            glDrawElements(self.mode, int(size), GL_UNSIGNED_INT, ctypes.c_void_p(int(start) * 4))
+
+    def draw(self):
+        self.bind()
+        self.drawBound()
+        self.unbind()
+
+    def drawRanges(self, first, count):
+        # Only the given runs of indices
+        self.bind()
+        self.drawBound(first, count)
+        self.unbind()
+
+    def drawInstanced(self, instances):
+        # Per-instance attributes have to be set up by the caller between bind() and this call
+        glDrawElementsInstanced(self.mode, self.count, GL_UNSIGNED_INT, ctypes.c_void_p(0), instances)
+
+    def delete(self):
+        glDeleteVertexArrays(1, [self.vao])
+        glDeleteBuffers(2, [self.vbo, self.ibo])
+        if self.low_vbo is not None:
+            glDeleteBuffers(1, [self.low_vbo])
+        self.vao = self.vbo = self.ibo = 0
+        self.low_vbo = None
+
+
+class GeometryCache:
+    """Meshes keyed by (kind, parameters).
+
+    The unit sphere never changes and is scaled per body. Orbits and rings depend on a distance or radius, so the
+    hotkeys that change those call invalidate() for the affected kind and the next lookup rebuilds it.
+    """
+
+    def __init__(self):
+        self._meshes = {}
+
+    def _get(self, key, build):
+        mesh = self._meshes.get(key)
+        if mesh is None:
+            mesh = self._meshes[key] = build()
+        return mesh
+
+    def sphere(self, slices=32, stacks=16):
+        return self._get(("sphere", slices, stacks), lambda: Mesh(*sphereMesh(slices, stacks)))
+
+    def orbit(self, distance, sides=5, rings=90):
+        def build():
+            mesh = Mesh(*torusMesh(0.0005, distance, sides, rings), precise=True)
+            # Ring i of the torus owns the 6 * sides indices of the quads to ring i + 1
+            angle = np.linspace(0.0, 2.0 * math.pi, rings + 1)
+            circle = np.stack((np.cos(angle), np.sin(angle), np.zeros_like(angle)), axis=-1) * distance
+            mesh.arcs = arcBounds(circle, 6 * sides, margin=0.0005)
+            return mesh
+
+        return self._get(("orbit", distance, sides, rings), build)
+
+    def ring(self, radius, sides=100, rings=50):
+        return self._get(("ring", radius, sides, rings),
+                         lambda: Mesh(*torusMesh(0.10, radius + 1, sides, rings, wire=True), mode=GL_LINES))
+
+    def path(self, name, build):
+        # Arbitrary closed curve, e.g. an elliptical orbit; build returns its points and only runs on a cache miss
+        def buildPath():
+            vertices, indices = pathMesh(build())
+            mesh = Mesh(vertices, indices, mode=GL_LINE_STRIP, precise=True)
+            mesh.arcs = arcBounds(vertices[:, :3], 1, overlap=1)
+            return mesh
+
+        return self._get(("path", name), buildPath)
+
+    def quad(self):
+        # Camera facing billboards, e.g. the sun
+        return self._get(("quad",), lambda: Mesh(*quadMesh()))
+
+    def point(self):
+        # A single vertex at the origin, for bodies drawn as point sprites
+        return self._get(("point",), lambda: Mesh(np.zeros((1, 8)), [0], mode=GL_POINTS))
+
+    def invalidate(self, kind):
+        for key in [key for key in self._meshes if key[0] == kind]:
+            self._meshes.pop(key).delete()
+
+    def release(self):
+        for mesh in self._meshes.values():
+            mesh.delete()
+        self._meshes.clear()
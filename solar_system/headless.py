@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Headless rendering: an offscreen OpenGL core profile context (EGL or
+# OSMesa software rendering), a framebuffer object of any size, asynchronous
+# read back of the frames through pixel buffer objects and scripted camera
+# paths.
+#
+# PYOPENGL_PLATFORM has to be set to "egl" or "osmesa" before OpenGL is
+# imported for the first time, app.py does that for --headless.
+# ---------------------------------------------------------------------------
+
+import ctypes
+import math
+import os
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from .camera import START_EYE
+
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+# Version of the core profile contexts, the one the shaders are written for
+CONTEXT_VERSION = (3, 3)
+
+# Scripted cameras of the offline renders and benchmarks, see cameraPath
+CAMERA_PATHS = ("fixed", "orbit", "flyby")
+# The flyby starts beyond the orbit of Neptune (in earth distances)
+FLYBY_START = 40.0
+
+
+def cameraPath(name, progress, distance_earth):
+    # Eye, target and up vector (gluLookAt arguments) of a path at progress 0..1 through the render.
+    # fixed - the start camera, orbit - once around the sun at the start distance, slightly above the plane,
+    # flyby - from beyond the outer planets straight in to the start distance, at a constant angle to the plane
+    if name == "fixed":
+        eye = START_EYE
+    elif name == "orbit":
+        angle = 2 * math.pi * progress
+        eye = (100.0 * math.sin(angle), -100.0 * math.cos(angle), 20.0)
+    elif name == "flyby":
+        # Distance shrinks geometrically, so the inner planets get as many frames as the outer ones
+        far = FLYBY_START * distance_earth
+        distance = far * (100.0 / far) ** progress
+        eye = (0.0, -distance * math.cos(math.radians(20)), distance * math.sin(math.radians(20)))
+    else:
+        raise ValueError("Unknown camera path: %s" % name)
+    return eye, (0.0, 0.0, 0.0), (0.0, 0.0, 1.0)
+
+
+class Framebuffer:
+    """Framebuffer object with an RGBA8 colour and a 32-bit float depth renderbuffer, bound as the render target.
+
+    Both the offscreen contexts and the window render into one: the float depth is what the reversed-Z projection of
+    the renderer needs, and a window cannot be asked for it. present() copies the frame into the window.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fbo = glGenFramebuffers(1)
+        self.renderbuffers = glGenRenderbuffers(2)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        for renderbuffer, storage, attachment in zip(self.renderbuffers, (GL_RGBA8, GL_DEPTH_COMPONENT32F),
+                                                     (GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT)):
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, storage, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, renderbuffer)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Framebuffer is incomplete")
+        glViewport(0, 0, width, height)
+
+    def present(self):
+        # Copy the colour into the default framebuffer (the window) and keep rendering here
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT,
+                          GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+    def release(self):
+        glDeleteRenderbuffers(2, self.renderbuffers)
+        glDeleteFramebuffers(1, [self.fbo])
+
+
+class OffscreenContext:
+    """Offscreen GL context with a framebuffer object of the requested size bound as the render target."""
+
+    def __init__(self, platform, width, height):
+        self.platform = platform
+        self.width = width
+        self.height = height
+        if platform == "egl":
+            self._createEGL()
+        elif platform == "osmesa":
+            self._createOSMesa()
+        else:
+            raise ValueError("Unknown offscreen platform: %s" % platform)
+
+        # Render into our own framebuffer, so the size does not depend on what the platform gives us
+        self.framebuffer = Framebuffer(width, height)
+
+    def _createEGL(self):
+        from OpenGL import EGL
+
+        # Surfaceless Mesa works without any display server or GPU, fall back to the default display otherwise
+        display = EGL.EGL_NO_DISPLAY
+        try:
+            display = EGL.eglGetPlatformDisplay(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+        except (AttributeError, EGL.EGLError):
+            pass
+        if display == EGL.EGL_NO_DISPLAY:
+            display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor))
+
+        attributes = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                      EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config, count = EGL.EGLConfig(), EGL.EGLint()
+        EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count))
+        if not count.value:
+            raise RuntimeError("No EGL config with desktop OpenGL support")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, CONTEXT_VERSION[0],
+                                              EGL.EGL_CONTEXT_MINOR_VERSION, CONTEXT_VERSION[1],
+                                              EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                                              EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("No OpenGL %d.%d core profile context" % CONTEXT_VERSION)
+        EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+        self.display = display
+
+    def _createOSMesa(self):
+        from OpenGL import arrays, osmesa
+
+        attributes = arrays.GLintArray.asArray([osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA, osmesa.OSMESA_DEPTH_BITS, 24,
+                                                osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+                                                osmesa.OSMESA_CONTEXT_MAJOR_VERSION, CONTEXT_VERSION[0],
+                                                osmesa.OSMESA_CONTEXT_MINOR_VERSION, CONTEXT_VERSION[1], 0])
+        self.context = osmesa.OSMesaCreateContextAttribs(attributes, None)
+        if not self.context:
+            raise RuntimeError("No OpenGL %d.%d core profile context" % CONTEXT_VERSION)
+        # OSMesa always needs a client side buffer, even though we draw into the framebuffer object
+        self.buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise RuntimeError("OSMesaMakeCurrent failed")
+
+    def release(self):
+        self.framebuffer.release()
+        if self.platform == "egl":
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+
+
+class PixelReader:
+    """Reads frames back through a ring of pixel buffer objects.
+
+    read() only queues the copy of the current frame into a PBO and returns the oldest frame that was queued before,
+    so the GPU copies frame N while frame N + 1 is being rendered. flush() returns whatever is still in flight.
+    """
+
+    def __init__(self, width, height, buffers=2):
+        self.width = width
+        self.height = height
+        self.nbytes = width * height * 4
+        self.pbos = list(np.atleast_1d(glGenBuffers(buffers)))
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.nbytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.index = 0
+        self.pending = 0
+
+    def read(self):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.index = (self.index + 1) % len(self.pbos)
+        self.pending += 1
+        if self.pending < len(self.pbos):
+            return None
+        return self._collect()
+
+    def flush(self):
+        while self.pending:
+            yield self._collect()
+
+    def _collect(self):
+        pbo = self.pbos[(self.index - self.pending) % len(self.pbos)]
+        self.pending -= 1
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        address = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.nbytes).from_address(address)).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        # OpenGL rows go bottom up, images top down
+        return pixels.reshape(self.height, self.width, 4)[::-1]
+
+    def release(self):
+        glDeleteBuffers(len(self.pbos), self.pbos)
+
+
+class PngSequence:
+    """Writes frames as numbered PNG files, compressing them on worker threads."""
+
+    def __init__(self, pattern, workers=None):
+        self.pattern = pattern
+        directory = os.path.dirname(pattern)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.workers = workers or os.cpu_count()
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.queue = []
+
+    def write(self, index, frame):
+        self.queue.append(self.executor.submit(self._save, index, frame))
+        # Do not let unsaved frames pile up in memory when compressing is slower than rendering
+        while len(self.queue) > 2 * self.workers:
+            self.queue.pop(0).result()
+
+    def _save(self, index, frame):
+        # PIL is only needed for PNG files, frames piped to an encoder go without it
+        from PIL import Image
+
+        Image.fromarray(frame, "RGBA").save(self.pattern % index)
+
+    def close(self):
+        for future in self.queue:
+            future.result()
+        self.executor.shutdown()
+
+
+class EncoderPipe:
+    """Streams raw RGBA frames to the standard input of an encoder, e.g.
+
+        ffmpeg -f rawvideo -pix_fmt rgba -s 1920x1080 -r 60 -i - flyover.mp4
+    """
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+
+    def write(self, index, frame):
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait():
+            raise RuntimeError("Encoder exited with code %d" % self.process.returncode)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Instanced rendering of small bodies (asteroid belt, moon systems). The
+# instances of a group, advanced with NumPy in smallbodies.py, are uploaded in
+# one buffer update and drawn with a single instanced draw call, so the Python
+# cost does not grow with the number of objects.
+# ---------------------------------------------------------------------------
+
+import ctypes
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from .geometry import Mesh, sphereMesh
+from .shaders import CAMERA_BLOCK, linkProgram
+
+# Attribute location of the instance data, after the ones of the vertex layout
+INSTANCE_LOCATION = 3
+
+VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec3 normal;
+layout(location = 3) in vec4 instance;  // xyz - position, w - radius
+""" + CAMERA_BLOCK + """
+out vec3 view_position;
+out vec3 view_normal;
+
+void main() {
+    vec4 eye = view * vec4(position * instance.w + instance.xyz, 1.0);
+    view_position = eye.xyz;
+    view_normal = mat3(view) * normal;
+    gl_Position = projection * eye;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+""" + CAMERA_BLOCK + """
+uniform vec3 albedo;
+in vec3 view_position;
+in vec3 view_normal;
+out vec4 color;
+
+void main() {
+    float diffuse = max(dot(normalize(view_normal), normalize(sun.xyz - view_position)), 0.0);
+    color = vec4(albedo * light.rgb * (light.a + (1.0 - light.a) * diffuse), 1.0);
+}
+"""
+
+
+class InstancedSpheres:
+    """GPU side of one small body group: shader, low poly sphere and instance buffer, created on the first draw."""
+
+    def __init__(self, group):
+        self.group = group
+        self.program = None
+        self.mesh = None
+        self.buffer = None
+        # The instances of a frame relative to the camera, as uploaded, and the visible ones before the subtraction
+        self.relative = np.empty(group.instances.shape, dtype=np.float32)
+        self.chosen = np.empty(group.instances.shape, dtype=np.float64)
+
+    def upload(self, instances):
+        if self.buffer is None:
+            self.program = linkProgram(VERTEX_SHADER, FRAGMENT_SHADER)
+            self.mesh = Mesh(*sphereMesh(8, 4))
+            self.buffer = glGenBuffers(1)
+            # The instance attribute is part of the vertex array of the mesh from now on
+            self.mesh.bind()
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glEnableVertexAttribArray(INSTANCE_LOCATION)
+            glVertexAttribPointer(INSTANCE_LOCATION, 4, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+            glVertexAttribDivisor(INSTANCE_LOCATION, 1)
+            self.mesh.unbind()
+        # Orphan the old storage so the driver does not have to wait for the previous frame to finish with it
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.relative.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, visible=None, origin=(0.0, 0.0, 0.0)):
+        # visible - indices of the instances to draw (e.g. the ones inside the view frustum), all by default; origin -
+        # camera position, the instances are uploaded relative to it
+        count = len(self.group) if visible is None else len(visible)
+        instances = self.relative[:count]
+        if not count:
+            return
+        chosen = self.group.instances
+        if visible is not None:
+            chosen = np.take(chosen, visible, axis=0, out=self.chosen[:count])
+        # Subtracted in double precision: only the offset from the camera is rounded to float32, so instances close
+        # to it keep their place however far from the sun the camera is
+        np.subtract(chosen[:, :3], origin, out=instances[:, :3], casting="same_kind")
+        instances[:, 3] = chosen[:, 3]
+        self.upload(instances)
+        glUseProgram(self.program)
+        glUniform3f(glGetUniformLocation(self.program, "albedo"), *self.group.color)
+        self.mesh.bind()
+        self.mesh.drawInstanced(len(instances))
+        self.mesh.unbind()
+        glUseProgram(0)
+
+    def release(self):
+        if self.buffer is not None:
+            glDeleteBuffers(1, [self.buffer])
+            glDeleteProgram(self.program)
+            self.mesh.delete()
+            self.buffer = None
+
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Level of detail: sphere, ring and orbit tessellations are picked per body
+# from their projected size on screen, with hysteresis so a body hovering
+# around a threshold does not pop between two meshes every frame.
+# ---------------------------------------------------------------------------
+
+import math
+
+import numpy as np
+
+# Largest gap between a tessellated outline and the true circle, in pixels
+TOLERANCE = 0.5
+# Bodies with a smaller projected radius (pixels) are drawn as point sprites
+POINT_RADIUS = 0.5
+# A level is kept until the size leaves its range by this fraction
+HYSTERESIS = 0.2
+
+# Tessellations from coarse to fine: (slices, stacks) of the sphere, (sides, rings) of the ring, orbit segments
+SPHERE_LEVELS = ((8, 4), (16, 8), (32, 16), (64, 32), (128, 64))
+RING_LEVELS = ((25, 12), (50, 25), (100, 50), (200, 100))
+ORBIT_LEVELS = (32, 64, 128, 256, 512)
+
+
+def segmentsRadius(segments):
+    # Largest projected radius (pixels) a circle of that many segments can have within the tolerance: one segment
+    # cuts r (1 - cos(pi / n)) ~ r pi^2 / (2 n^2) off the outline
+    return 2 * TOLERANCE * (segments / math.pi) ** 2
+
+
+class DetailLevels:
+    """Discrete level per item from a continuous size.
+
+    Level k is picked once the size reaches thresholds[k - 1]; an item only changes its level when the size leaves the
+    range of the current one by more than the hysteresis fraction.
+    """
+
+    def __init__(self, count, thresholds, hysteresis=HYSTERESIS):
+        self.bounds = np.concatenate(([-np.inf], thresholds, [np.inf]))
+        self.hysteresis = hysteresis
+        self.level = np.full(count, -1)
+
+    def select(self, size):
+        target = np.searchsorted(self.bounds[1:-1], size, side="right")
+        lower = self.bounds[self.level] * (1 - self.hysteresis)
+        upper = self.bounds[self.level + 1] * (1 + self.hysteresis)
+        keep = (self.level >= 0) & (size >= lower) & (size < upper)
+        self.level = np.where(keep, self.level, target)
+        return self.level
+
+
+class LevelOfDetail:
+    """Tessellation of every body for the current camera.
+
+    The projection is the gluPerspective one: a unit at distance d from the eye covers height / (2 tan(fov / 2)) / d
+    pixels. update() takes the view matrix as read from OpenGL (row vectors), the positions of the bodies and their
+    sphere, ring and orbit radii; afterwards sphere(i), ring(i) and orbit(i) name the tessellation to draw, sphere(i)
+    is None for a body that is smaller than a pixel.
+    """
+
+    def __init__(self, count, height, fov=45.0):
+        self.pixels_per_unit = height / (2 * math.tan(math.radians(fov) / 2))
+        self.spheres = DetailLevels(count, [POINT_RADIUS] + [segmentsRadius(slices)
+                                                             for slices, _ in SPHERE_LEVELS[:-1]])
+        self.rings = DetailLevels(count, [segmentsRadius(rings) for _, rings in RING_LEVELS[:-1]])
+        self.orbits = DetailLevels(count, [segmentsRadius(segments) for segments in ORBIT_LEVELS[:-1]])
+
+    def update(self, view, positions, radius, ring_radius, orbit_radius):
+        view = np.asarray(view, dtype=np.float64).reshape(4, 4)
+        rotation, translation = view[:3, :3], view[3, :3]
+        # Pitching the camera does not change distances, so the view matrix alone is enough
+        distance = np.maximum(np.linalg.norm(positions @ rotation + translation, axis=-1), 1e-9)
+        self.spheres.select(radius * self.pixels_per_unit / distance)
+        self.rings.select(ring_radius * self.pixels_per_unit / distance)
+
+        # Orbits are circles around the origin in the XY plane, what counts is the part closest to the camera
+        eye = -rotation @ translation
+        gap = np.hypot(np.hypot(eye[0], eye[1]) - orbit_radius, eye[2])
+        self.orbits.select(orbit_radius * self.pixels_per_unit / np.maximum(gap, 1e-9))
+
+    def sphere(self, index):
+        level = self.spheres.level[index]
+        return SPHERE_LEVELS[level - 1] if level > 0 else None
+
+    def ring(self, index):
+        return RING_LEVELS[self.rings.level[index]]
+
+    def orbit(self, index):
+        return ORBIT_LEVELS[self.orbits.level[index]]
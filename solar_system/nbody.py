@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# N-body gravity engine. Units are astronomical units, years and solar
+# masses, so G = 4 pi^2. Forces come either from direct O(N^2) summation or
+# from a Barnes-Hut octree (O(N log N)); positions are advanced with a
+# symplectic leapfrog (kick-drift-kick) or a classic RK4 integrator.
+# ---------------------------------------------------------------------------
+
+import math
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .clock import SECONDS_PER_YEAR
+from .ephemeris import Ephemeris
+
+G = 4 * math.pi ** 2
+EARTH_MASSES_PER_SUN = 332946.0
+
+INTEGRATORS = ("leapfrog", "rk4")
+METHODS = ("auto", "direct", "barnes-hut")
+# Above this many particles "auto" switches from direct summation to Barnes-Hut
+AUTO_TREE_PARTICLES = 2000
+# Octree depth, 3 * 21 bits of Morton key fit into 64 bits
+MAX_DEPTH = 21
+# Number of leaves walked through the tree at once, bounds the memory of the traversal
+GROUP_CHUNK = 256
+# The shared block of the tree arrays is this much larger than needed, so trees of about the same size reuse it
+SHARED_SLACK = 1.5
+
+Octree = namedtuple("Octree", "positions masses order com mass size first_child children start end")
+
+
+def _spreadBits(value):
+    # Insert two zero bits between each of the lowest 21 bits
+    value = value & 0x1fffff
+    value = (value | value << 32) & 0x1f00000000ffff
+    value = (value | value << 16) & 0x1f0000ff0000ff
+    value = (value | value << 8) & 0x100f00f00f00f00f
+    value = (value | value << 4) & 0x10c30c30c30c30c3
+    value = (value | value << 2) & 0x1249249249249249
+    return value
+
+
+def mortonKeys(positions, center, half):
+    # Z-order key of every position in the cube of the given center and half size, MAX_DEPTH bits per axis
+    cells = np.clip(((positions - center + half) / (2 * half) * (1 << MAX_DEPTH)).astype(np.uint64),
+                    0, (1 << MAX_DEPTH) - 1)
+    return _spreadBits(cells[:, 0]) | _spreadBits(cells[:, 1]) << np.uint64(1) | _spreadBits(cells[:, 2]) << np.uint64(2)
+
+
+def buildOctree(positions, masses, leaf_size=8):
+    """Barnes-Hut octree built level by level from sorted Morton keys.
+
+    Particles are sorted along a Z-order curve, so every node is a contiguous range of the sorted arrays and a whole
+    level of the tree is found with one pass over the keys. Nodes with at most leaf_size particles are not split.
+    """
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    center = (low + high) / 2
+    half = max((high - low).max() / 2, 1e-12) * (1 + 1e-9)
+    keys = mortonKeys(positions, center, half)
+    order = np.argsort(keys)
+    keys, positions, masses = keys[order], positions[order], masses[order]
+    weighted = positions * masses[:, None]
+    count = len(keys)
+
+    com, mass, size, start, end, parent = [], [], [], [], [], []
+    # Level 0 is the root; the particles of split nodes stay active for the next level
+    active = np.ones(count, dtype=bool)
+    offset = 0
+    parents_start = parents_offset = None
+    for level in range(MAX_DEPTH + 1):
+        prefix = keys >> np.uint64(3 * (MAX_DEPTH - level))
+        boundaries = np.flatnonzero(np.diff(prefix)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [count]))
+        # Segments partition the whole array, so reduceat sums exactly what belongs to each one
+        node_mass = np.add.reduceat(masses, starts)
+        node_weighted = np.add.reduceat(weighted, starts, axis=0)
+        selected = active[starts]
+        if not selected.any():
+            break
+        starts, ends = starts[selected], ends[selected]
+        node_mass, node_weighted = node_mass[selected], node_weighted[selected]
+
+        node_com = np.divide(node_weighted, node_mass[:, None], out=np.empty_like(node_weighted),
+                             where=node_mass[:, None] > 0)
+        # Massless nodes fall back to the center of their particles
+        for i in np.flatnonzero(node_mass <= 0):
+            node_com[i] = positions[starts[i]:ends[i]].mean(axis=0)
+
+        parent.append(np.full(starts.size, -1) if parents_start is None else
+                      np.searchsorted(parents_start, starts, side="right") - 1 + parents_offset)
+        com.append(node_com)
+        mass.append(node_mass)
+        size.append(np.full(starts.size, 2 * half / (1 << level)))
+        start.append(starts)
+        end.append(ends)
+
+        split = (ends - starts > leaf_size) & (level < MAX_DEPTH)
+        marks = np.zeros(count + 1, dtype=int)
+        marks[starts[split]] += 1
+        marks[ends[split]] -= 1
+        active = np.cumsum(marks[:-1]) > 0
+        parents_start, parents_offset = starts, offset
+        offset += starts.size
+
+    com, mass, size = np.concatenate(com), np.concatenate(mass), np.concatenate(size)
+    start, end, parent = np.concatenate(start), np.concatenate(end), np.concatenate(parent)
+    # Children of a node are stored next to each other, one level further down
+    children = np.bincount(parent[parent >= 0], minlength=mass.size)
+    first_child = np.full(mass.size, -1)
+    child_nodes = np.flatnonzero(parent >= 0)
+    first_child[parent[child_nodes][::-1]] = child_nodes[::-1]
+    return Octree(positions, masses, order, com, mass, size, first_child, children, start, end)
+
+
+def _ranges(counts):
+    # 0..n-1 for every n in counts, concatenated
+    counts = np.asarray(counts)
+    if not counts.size:
+        return np.zeros(0, dtype=int)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(counts.sum()) - offsets
+
+
+def treeAccelerations(tree, theta=0.5, softening=1e-4, groups=None):
+    """Accelerations of the particles of the tree, in the order they were given to buildOctree.
+
+    The walk is done per leaf: a leaf and its particles open a node only when the node is too close to any particle
+    of the leaf, which keeps the frontier of (leaf, node) pairs a leaf size smaller than a walk per particle.
+    groups limits the walk to a range of leaves (used to split the work between processes).
+    """
+    leaves = np.flatnonzero(tree.first_child < 0)
+    # Leaves in particle order, so any range of them covers a contiguous range of particles
+    leaves = leaves[np.argsort(tree.start[leaves])]
+    if groups is not None:
+        leaves = leaves[groups]
+    first, last = tree.start[leaves[0]], tree.end[leaves[-1]]
+    acc = np.zeros((last - first, 3))
+    for chunk in range(0, leaves.size, GROUP_CHUNK):
+        _walk(tree, leaves[chunk:chunk + GROUP_CHUNK], theta, softening ** 2, acc, first)
+    if groups is not None:
+        return acc
+    result = np.empty_like(acc)
+    result[tree.order] = acc
+    return result
+
+
+def _walk(tree, leaves, theta, eps2, acc, offset):
+    # Bounding sphere of the particles of every leaf
+    counts = tree.end[leaves] - tree.start[leaves]
+    particles = np.repeat(tree.start[leaves], counts) + _ranges(counts)
+    center = np.add.reduceat(tree.positions[particles], np.cumsum(counts) - counts) / counts[:, None]
+    spread = tree.positions[particles] - np.repeat(center, counts, axis=0)
+    radius = np.maximum.reduceat(np.sqrt(np.einsum("ij,ij->i", spread, spread)), np.cumsum(counts) - counts)
+
+    # Frontier of (leaf, node) pairs that still have to be resolved, every leaf starts at the root
+    group = np.arange(leaves.size)
+    node = np.zeros(leaves.size, dtype=int)
+    first = tree.start[leaves]
+    far_group, far_node, near_group, near_node = [], [], [], []
+    while group.size:
+        delta = tree.com.take(node, axis=0) - center.take(group, axis=0)
+        distance = np.sqrt(np.einsum("ij,ij->i", delta, delta)) - radius[group]
+        # The ancestors of a leaf are always opened: above theta = 1 / sqrt(3) the center of mass of a node can be far
+        # enough from a leaf in its corner to pass, and the leaf would pull itself
+        ancestor = (tree.start[node] <= first[group]) & (first[group] < tree.end[node])
+        far = (tree.size[node] < theta * distance) & ~ancestor
+        leaf = tree.first_child[node] < 0
+        near = ~far & leaf
+        opened = ~far & ~leaf
+        far_group.append(group[far])
+        far_node.append(node[far])
+        near_group.append(group[near])
+        near_node.append(node[near])
+        children = tree.children[node[opened]]
+        group = np.repeat(group[opened], children)
+        node = np.repeat(tree.first_child[node[opened]], children) + _ranges(children)
+
+    # Far nodes act as one mass in their center of mass. Their pull is evaluated once at the center of the leaf and
+    # carried to its particles with the tidal tensor (first order expansion), instead of once per particle
+    group, node = np.concatenate(far_group), np.concatenate(far_node)
+    delta = tree.com.take(node, axis=0) - center.take(group, axis=0)
+    r2 = np.einsum("ij,ij->i", delta, delta) + eps2
+    strength = G * tree.mass[node] / (r2 * np.sqrt(r2))
+    pull = np.empty((leaves.size, 3))
+    tidal = np.empty((leaves.size, 3, 3))
+    for i in range(3):
+        pull[:, i] = np.bincount(group, weights=delta[:, i] * strength, minlength=leaves.size)
+        for j in range(i, 3):
+            weights = strength * (3 * delta[:, i] * delta[:, j] / r2 - (i == j))
+            tidal[:, i, j] = tidal[:, j, i] = np.bincount(group, weights=weights, minlength=leaves.size)
+    owner = np.repeat(np.arange(leaves.size), counts)
+    local = tree.positions[particles] - center[owner]
+    acc[particles - offset] += pull[owner] + np.einsum("nij,nj->ni", tidal[owner], local)
+
+    # Near leaves are summed particle by particle
+    group, node = np.concatenate(near_group), np.concatenate(near_node)
+    target = np.repeat(tree.start[leaves[group]], counts[group]) + _ranges(counts[group])
+    node = np.repeat(node, counts[group])
+    sources = tree.end[node] - tree.start[node]
+    target = np.repeat(target, sources)
+    source = np.repeat(tree.start[node], sources) + _ranges(sources)
+    delta = tree.positions.take(source, axis=0) - tree.positions.take(target, axis=0)
+    _accumulate(acc, target - offset, delta, eps2, tree.masses[source])
+
+
+def _accumulate(acc, target, delta, eps2, mass):
+    # G m d / |d|^3, a particle does not pull itself (r2 == 0 only without softening)
+    r2 = np.einsum("ij,ij->i", delta, delta) + eps2
+    strength = np.divide(G * mass, r2 * np.sqrt(r2), out=np.zeros_like(r2), where=r2 > 0)
+    for axis in range(3):
+        acc[:, axis] += np.bincount(target, weights=delta[:, axis] * strength, minlength=len(acc))
+
+
+def directAccelerations(positions, masses, softening=1e-4):
+    # Pairwise O(N^2) sum, fine for the planets and a few thousand particles
+    delta = positions[None, :, :] - positions[:, None, :]
+    r2 = np.einsum("ijk,ijk->ij", delta, delta) + softening ** 2
+    strength = np.divide(G * masses[None, :], r2 * np.sqrt(r2), out=np.zeros_like(r2), where=r2 > 0)
+    np.fill_diagonal(strength, 0.0)
+    return np.einsum("ij,ijk->ik", strength, delta)
+
+
+# Shared block of the tree in a worker process, attached on first use and kept until the pool moves to another one
+_shared_tree = None
+
+
+def _treeChunk(name, layout, groups, theta, softening):
+    # The tree arrays are views into the shared block, only its name and their layout are sent with every task
+    global _shared_tree
+    if _shared_tree is None or _shared_tree.name != name:
+        if _shared_tree is not None:
+            _shared_tree.close()
+        _shared_tree = SharedMemory(name)
+    tree = Octree(*(np.ndarray(shape, dtype, _shared_tree.buf, offset) for offset, dtype, shape in layout))
+    return treeAccelerations(tree, theta, softening, groups)
+
+
+class GravitySystem:
+    """Point masses integrated under their mutual gravity.
+
+    advance() takes simulated seconds and splits them into steps of at most max_step years, so a time-warp jump stays
+    as accurate as many small frames. The state before the last advance() is kept for interpolating between steps.
+    """
+
+    def __init__(self, positions, velocities, masses, integrator="leapfrog", method="auto", theta=0.5,
+                 softening=1e-4, max_step=1 / 365.25, workers=0):
+        if integrator not in INTEGRATORS:
+            raise ValueError("Unknown integrator: %s" % integrator)
+        if method not in METHODS:
+            raise ValueError("Unknown force method: %s" % method)
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        self.velocities = np.array(velocities, dtype=np.float64).reshape(-1, 3)
+        self.masses = np.array(masses, dtype=np.float64).reshape(-1)
+        self.previous = self.positions.copy()
+        self.integrator = integrator
+        self.method = method
+        self.theta = theta
+        self.softening = softening
+        self.max_step = max_step
+        self.time = 0.0  # years
+        self._acc = None
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.shared = None
+
+    @classmethod
+    def fromBodies(cls, bodies, epoch=None, **options):
+        # Circular orbits in the XY plane at the current angles, the same start the kinematic mode has; with epoch
+        # (seconds since J2000) the Keplerian orbits of the orbital elements at that date instead, with the mean
+        # motion the mass of the sun gives them, so the start is an orbit of this gravity and not of the table periods
+        masses = bodies.mass / EARTH_MASSES_PER_SUN
+        sun = masses[bodies.star].sum()
+        if epoch is None:
+            angle = np.radians(bodies.angle)
+            radius = bodies.distance_ratio
+            speed = np.sqrt(G * sun / np.where(radius > 0, radius, np.inf))
+            positions = np.stack((radius * np.cos(angle), radius * np.sin(angle), np.zeros(len(bodies))), axis=-1)
+            velocities = np.stack((-speed * np.sin(angle), speed * np.cos(angle), np.zeros(len(bodies))), axis=-1)
+        else:
+            ephemeris = Ephemeris(bodies)
+            semi_major = ephemeris.semi_major
+            ephemeris.mean_motion = np.sqrt(G * sun / np.where(semi_major > 0, semi_major, np.inf) ** 3)
+            positions, velocities = ephemeris.state(epoch)
+        system = cls(positions, velocities, masses, **options)
+        system.moveToBarycenter()
+        return system
+
+    def __len__(self):
+        return len(self.masses)
+
+    def addParticles(self, positions, velocities, masses):
+        # Returns the slice of the new particles in the state arrays
+        first = len(self)
+        self.positions = np.concatenate((self.positions, positions))
+        self.velocities = np.concatenate((self.velocities, velocities))
+        self.masses = np.concatenate((self.masses, np.broadcast_to(masses, len(positions))))
+        self.previous = self.positions.copy()
+        self._acc = None
+        return slice(first, len(self))
+
+    def moveToBarycenter(self):
+        total = self.masses.sum()
+        self.positions -= (self.masses[:, None] * self.positions).sum(axis=0) / total
+        self.velocities -= (self.masses[:, None] * self.velocities).sum(axis=0) / total
+
+    def accelerations(self, positions):
+        if self.method == "direct" or (self.method == "auto" and len(positions) <= AUTO_TREE_PARTICLES):
+            return directAccelerations(positions, self.masses, self.softening)
+        tree = buildOctree(positions, self.masses)
+        if self.pool is None:
+            return treeAccelerations(tree, self.theta, self.softening)
+        # Every worker walks the same tree, written once into shared memory, for its own range of the leaves
+        layout = self._shareTree(tree)
+        leaves = np.count_nonzero(tree.first_child < 0)
+        chunks = [slice(chunk[0], chunk[-1] + 1) for chunk in np.array_split(np.arange(leaves), self.workers)
+                  if chunk.size]
+        count = len(chunks)
+        acc = np.empty_like(positions)
+        acc[tree.order] = np.concatenate(list(self.pool.map(_treeChunk, [self.shared.name] * count, [layout] * count,
+                                                            chunks, [self.theta] * count, [self.softening] * count)))
+        return acc
+
+    def _shareTree(self, tree):
+        # Copies the tree arrays into the shared block, a larger one replaces it when they do not fit; returns the
+        # (offset, dtype, shape) of every array
+        layout, size = [], 0
+        for array in tree:
+            layout.append((size, array.dtype.str, array.shape))
+            size += -(-array.nbytes // 64) * 64
+        if self.shared is None or self.shared.size < size:
+            self._releaseShared()
+            self.shared = SharedMemory(create=True, size=int(size * SHARED_SLACK))
+        for array, (offset, dtype, shape) in zip(tree, layout):
+            np.ndarray(shape, dtype, self.shared.buf, offset)[...] = array
+        return layout
+
+    def _releaseShared(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def step(self, dt):
+        # One integrator step of dt years
+        if self.integrator == "leapfrog":
+            if self._acc is None:
+                self._acc = self.accelerations(self.positions)
+            self.velocities += self._acc * (dt / 2)
+            self.positions += self.velocities * dt
+            self._acc = self.accelerations(self.positions)
+            self.velocities += self._acc * (dt / 2)
+        else:
+            x, v = self.positions, self.velocities
+            k1x, k1v = v, self.accelerations(x)
+            k2x, k2v = v + k1v * (dt / 2), self.accelerations(x + k1x * (dt / 2))
+            k3x, k3v = v + k2v * (dt / 2), self.accelerations(x + k2x * (dt / 2))
+            k4x, k4v = v + k3v * dt, self.accelerations(x + k3x * dt)
+            self.positions = x + (k1x + 2 * k2x + 2 * k3x + k4x) * (dt / 6)
+            self.velocities = v + (k1v + 2 * k2v + 2 * k3v + k4v) * (dt / 6)
+        self.time += dt
+
+    def advance(self, seconds):
+        self.previous = self.positions.copy()
+        years = seconds / SECONDS_PER_YEAR
+        steps = max(int(math.ceil(years / self.max_step)), 1)
+        for _ in range(steps):
+            self.step(years / steps)
+
+    def interpolate(self, alpha):
+        return self.previous + (self.positions - self.previous) * alpha
+
+    def energy(self):
+        # Total energy, its drift shows how well the integrator conserves it
+        kinetic = 0.5 * (self.masses * np.einsum("ij,ij->i", self.velocities, self.velocities)).sum()
+        potential = 0.0
+        for first in range(0, len(self), 1024):
+            delta = self.positions[first:first + 1024, None, :] - self.positions[None, :, :]
+            r = np.sqrt(np.einsum("ijk,ijk->ij", delta, delta) + self.softening ** 2)
+            pairs = self.masses[first:first + 1024, None] * self.masses[None, :] / r
+            rows = np.arange(pairs.shape[0])
+            pairs[rows, rows + first] = 0.0
+            potential -= 0.5 * G * pairs.sum()
+        return kinetic + potential
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self._releaseShared()
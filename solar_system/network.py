@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Networked viewing: one process simulates and broadcasts snapshots of the
+# state over TCP, any number of render clients interpolate between them,
+# each with its own camera. A snapshot is the float32 frame of a recording,
+# sent as the XOR with its linear prediction from the two before it, split
+# into byte planes and zlib compressed: the bits the prediction got right
+# cost next to nothing, and the client rebuilds every frame exactly.
+# ---------------------------------------------------------------------------
+
+import asyncio
+import collections
+import json
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .clock import DEFAULT_WARP, SimulationClock
+from .recording import captureFrame, describeSystem, frameLayout, interpolateFrames, restoreSystem
+
+DEFAULT_PORT = 7720
+PROTOCOL_VERSION = 1
+# Message: kind, server clock and simulated time of the snapshot in seconds, payload bytes
+MESSAGE = struct.Struct("<BddI")
+# A keyframe is the frame itself, a delta the XOR with the previous frame, a predicted one the XOR with the previous
+# frame plus the motion since the one before
+HELLO, KEYFRAME, DELTA, PREDICTED = range(4)
+# Snapshots per second the server sends
+SNAPSHOT_RATE = 30
+# zlib level of the snapshots: the fastest, the byte planes do the rest
+COMPRESSION_LEVEL = 1
+# Bytes waiting in the socket of a client above which it skips snapshots and starts over with a keyframe
+MAX_BACKLOG = 1 << 20
+# Clients show the server state this many snapshot intervals late, so a late snapshot does not stall the motion
+INTERPOLATION_DELAY = 2.5
+# Seconds a client waits for the description of the system and the first snapshot
+CONNECT_TIMEOUT = 10.0
+
+
+def parseAddress(value):
+    # "[HOST:]PORT" -> (host, port), the host defaults to the loopback interface
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _reference(kind, previous, before, times):
+    # Bits a snapshot of kind is the XOR with, from the two frames before it; times - simulated times of before,
+    # previous and the snapshot. The motion is scaled to the interval, the snapshots follow the wall clock and are
+    # not evenly spaced in simulated time. Everything is computed the same way from the same numbers on the server
+    # and on every client, so the bits match.
+    if kind == DELTA:
+        return previous.view(np.uint32)
+    span = times[1] - times[0]
+    ratio = np.float32((times[2] - times[1]) / span if span else 0.0)
+    return (previous + (previous - before) * ratio).view(np.uint32)
+
+
+def _pack(bits):
+    # uint32 words -> compressed byte planes: the lowest bytes of all words, then the next ones; the high bytes of the
+    # deltas are mostly zero and compress to almost nothing
+    return zlib.compress(bits.view(np.uint8).reshape(-1, 4).T.tobytes(), COMPRESSION_LEVEL)
+
+
+def _unpack(payload, words):
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(4, words)
+    return np.ascontiguousarray(planes.T).view(np.uint32).ravel()
+
+
+class SnapshotServer:
+    """Broadcasts the state of a SolarSystem (or a Playback) to render clients.
+
+    run() advances the system in real time, warp simulated seconds per second on the fixed step of a SimulationClock,
+    and takes rate snapshots per second. The step runs on a worker thread, so clients connect while a heavy gravity
+    step is computed. A snapshot is encoded once and the same bytes go to every client: a viewer costs one socket
+    write per snapshot however large the system is. A client that joins, or falls so far behind that MAX_BACKLOG
+    bytes wait in its socket, skips the deltas and gets the next snapshot as a keyframe.
+    """
+
+    def __init__(self, system, host="127.0.0.1", port=DEFAULT_PORT, rate=SNAPSHOT_RATE, warp=DEFAULT_WARP,
+                 recorder=None):
+        if rate <= 0:
+            raise ValueError("The snapshot rate must be positive")
+        self.system = system
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.clock = SimulationClock(rate, warp=warp)
+        self.recorder = recorder
+        self.offsets = frameLayout(len(system.bodies), [len(group) for group in system.small_bodies])
+        self.frame = np.zeros(self.offsets[-1], dtype=np.float32)
+        self.previous = np.zeros_like(self.frame)
+        self.before = np.zeros_like(self.frame)
+        self.times = [0.0, 0.0]  # simulated times of before and previous
+        self.hello = json.dumps(dict(describeSystem(system), version=PROTOCOL_VERSION, rate=rate)).encode()
+        # Writer of every client -> how many of the last frames it holds (0 to 2), which sets the kind of its next one
+        self.clients = {}
+        self.handlers = set()
+        self.start = time.perf_counter()
+        self.snapshots = 0
+        self.bytes_sent = 0
+
+    async def _connected(self, reader, writer):
+        writer.write(MESSAGE.pack(HELLO, time.perf_counter() - self.start, self.system.time, len(self.hello)))
+        writer.write(self.hello)
+        self.clients[writer] = 0
+        self.handlers.add(asyncio.current_task())
+        try:
+            # Clients send nothing, reading only notices that they are gone
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            del self.clients[writer]
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def _broadcast(self, clock_time, sim_time):
+        bits = self.frame.view(np.uint32)
+        times = self.times + [sim_time]
+        messages = {}
+        for writer, held in self.clients.items():
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                # Too slow for the stream: the snapshots it misses meanwhile leave it needing a keyframe
+                self.clients[writer] = 0
+                continue
+            kind = (KEYFRAME, DELTA, PREDICTED)[held]
+            if kind not in messages:
+                delta = bits if kind == KEYFRAME else bits ^ _reference(kind, self.previous, self.before, times)
+                payload = _pack(delta)
+                messages[kind] = MESSAGE.pack(kind, clock_time, sim_time, len(payload)) + payload
+            writer.write(messages[kind])
+            self.bytes_sent += len(messages[kind])
+            self.clients[writer] = min(held + 1, 2)
+        self.before[:] = self.previous
+        self.previous[:] = self.frame
+        self.times = [self.times[1], sim_time]
+        self.snapshots += 1
+
+    async def run(self, duration=None):
+        # Serves until cancelled, or for duration seconds
+        server = await asyncio.start_server(self._connected, self.host, self.port)
+        loop = asyncio.get_running_loop()
+        system, clock = self.system, self.clock
+        interval = 1.0 / self.rate
+        deadline = None if duration is None else loop.time() + duration
+        next_snapshot = loop.time()
+        try:
+            while deadline is None or loop.time() < deadline:
+                steps = clock.update()
+                if steps:
+                    advance = system.step if self.recorder is None else self.recorder.step
+                    await loop.run_in_executor(None, advance, clock.dt, steps)
+                captureFrame(system, clock.alpha, self.frame, self.offsets)
+                self._broadcast(time.perf_counter() - self.start,
+                                system.time + system.bodies.last_dt * (clock.alpha - 1.0))
+                # A step slower than the interval delays the next snapshot instead of bunching the ones after it
+                next_snapshot = max(next_snapshot + interval, loop.time())
+                await asyncio.sleep(next_snapshot - loop.time())
+        finally:
+            # Closing the sockets ends the handlers, which are awaited so none is cancelled halfway
+            server.close()
+            for writer in list(self.clients):
+                writer.close()
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await server.wait_closed()
+
+
+class SnapshotClient:
+    """Receives the snapshots of a SnapshotServer on a background thread.
+
+    The constructor connects and returns once the server has described its system (header, the describeSystem()
+    dictionary). An asyncio loop on a daemon thread then reads the snapshots, undoes the deltas and appends
+    (arrival time, server clock, simulated time, frame) tuples to the deque snapshots, which the render loop drains
+    without locking. closed turns true once the server is gone.
+    """
+
+    def __init__(self, host, port, timeout=CONNECT_TIMEOUT):
+        self.snapshots = collections.deque()
+        self.header = None
+        self.error = None
+        self.closed = False
+        self.loop = None
+        self.task = None
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(host, port, ready), daemon=True)
+        self.thread.start()
+        if not ready.wait(timeout):
+            raise ConnectionError("No answer from %s:%d" % (host, port))
+        if self.error is not None:
+            raise self.error
+
+    def _run(self, host, port, ready):
+        try:
+            asyncio.run(self._receive(host, port, ready))
+        except asyncio.CancelledError:
+            pass
+        self.closed = True
+
+    async def _receive(self, host, port, ready):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            kind, _, _, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+            header = json.loads(await reader.readexactly(length)) if kind == HELLO else {}
+            if header.get("version") != PROTOCOL_VERSION:
+                raise ConnectionError("%s:%d is not a snapshot server of this version" % (host, port))
+        except (OSError, asyncio.IncompleteReadError, ValueError) as error:
+            self.error = error if isinstance(error, OSError) else ConnectionError(str(error))
+            ready.set()
+            return
+        self.header = header
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        ready.set()
+
+        words = header["frame_floats"]
+        # The server starts every client with a keyframe and a delta, so the frames a snapshot refers to are here
+        previous = before = None
+        times = [0.0, 0.0]
+        try:
+            while True:
+                kind, clock_time, sim_time, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+                payload = await reader.readexactly(length)
+                arrival = time.perf_counter()
+                bits = _unpack(payload, words)
+                if kind != KEYFRAME:
+                    bits ^= _reference(kind, previous, before, times + [sim_time])
+                before, previous = previous, bits.view(np.float32)
+                times = [times[1], sim_time]
+                self.snapshots.append((arrival, clock_time, sim_time, previous))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.task is not None and not self.closed:
+            self.loop.call_soon_threadsafe(self.task.cancel)
+            self.thread.join(1.0)
+
+
+class RemoteSystem:
+    """The state of a SnapshotServer in place of a SolarSystem: the renderer and the application loops use it the
+    same way.
+
+    interpolate() shows the server state of delay seconds ago (INTERPOLATION_DELAY snapshot intervals by default),
+    linear between the two snapshots around it on the clock of the server, so the motion stays smooth however the
+    network spaced the snapshots. The server clock is mapped to the local one by the smallest difference of arrival
+    and send time seen so far, the snapshot with the least latency. step() and seek() do nothing, the timeline belongs
+    to the server; the body table is rebuilt from its description like the one of a playback.
+    """
+
+    def __init__(self, host, port, delay=None, timeout=CONNECT_TIMEOUT):
+        self.client = SnapshotClient(host, port, timeout)
+        header = self.client.header
+        self.bodies, self.small_bodies = restoreSystem(header)
+        self.gravity = None
+        self.ephemeris = None
+        self.offsets = frameLayout(len(self.bodies), [group["count"] for group in header["groups"]])
+        self.delay = INTERPOLATION_DELAY / header["rate"] if delay is None else delay
+        # (server clock, simulated time, frame) of the snapshots still needed, oldest first
+        self.snapshots = collections.deque()
+        self.offset = None
+        self.time = 0.0
+
+        # The keyframe follows the description right away
+        deadline = time.perf_counter() + timeout
+        while not self.client.snapshots:
+            if self.client.closed or time.perf_counter() > deadline:
+                self.client.close()
+                raise ConnectionError("No snapshot from %s:%d" % (host, port))
+            time.sleep(0.001)
+        self._receive()
+        self.time = self.snapshots[0][1]
+
+    def _receive(self):
+        queue = self.client.snapshots
+        while queue:
+            arrival, clock_time, sim_time, frame = queue.popleft()
+            offset = arrival - clock_time
+            self.offset = offset if self.offset is None else min(self.offset, offset)
+            self.snapshots.append((clock_time, sim_time, frame))
+
+    def step(self, dt, steps=1):
+        pass
+
+    def seek(self, seconds):
+        pass
+
+    def interpolate(self, alpha=1.0):
+        # alpha is ignored, the server clock says where between two snapshots the frame lies
+        self._receive()
+        snapshots = self.snapshots
+        target = time.perf_counter() - self.offset - self.delay
+        while len(snapshots) > 2 and snapshots[1][0] <= target:
+            snapshots.popleft()
+        before = snapshots[0]
+        after = snapshots[1] if len(snapshots) > 1 else before
+        span = after[0] - before[0]
+        fraction = min(max((target - before[0]) / span, 0.0), 1.0) if span > 0 else 0.0
+        self.time = before[1] + (after[1] - before[1]) * fraction
+        return interpolateFrames(before[2], after[2], fraction, self.offsets,
+                                 [group.instances for group in self.small_bodies])
+
+    def positionsAt(self, seconds):
+        # No history on the client, the trails grow from the first frame
+        return None
+
+    def energy(self):
+        return np.nan
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Frame profiler: CPU timers and GPU timestamp queries per named section,
+# rolling frame time percentiles, an on-screen overlay and export of the
+# recorded sections as a Chrome trace (chrome://tracing, Perfetto).
+# ---------------------------------------------------------------------------
+
+import ctypes
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from OpenGL.GL import *
+# The wrapped 64 bit getters do not know the GLuint64 type
+from OpenGL.raw.GL.VERSION.GL_3_2 import glGetInteger64v as readInteger64
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as readQuery64
+
+from .geometry import Mesh, quadMesh
+from .shaders import linkProgram
+
+# Frames of per-section times and frame times kept for the statistics
+HISTORY = 600
+# Frames a GPU timestamp may stay in flight before the profiler waits for it
+MAX_PENDING_FRAMES = 4
+# Upper bound of the events kept for the trace, the oldest are dropped first
+MAX_TRACE_EVENTS = 1_000_000
+# The overlay text is rendered again at most this often (seconds)
+OVERLAY_REFRESH = 0.25
+
+OVERLAY_VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec3 position;
+layout(location = 2) in vec2 texcoord;
+uniform vec4 rect;  // x, y, width, height in pixels
+uniform vec2 screen;
+out vec2 uv;
+
+void main() {
+    uv = texcoord;
+    gl_Position = vec4((rect.xy + position.xy * rect.zw) / screen * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+OVERLAY_FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D text;
+in vec2 uv;
+out vec4 color;
+
+void main() {
+    color = texture(text, uv);
+}
+"""
+
+
+def _gpuTimer():
+    # Timestamp queries are core since OpenGL 3.3, older contexts only get the CPU timers
+    try:
+        return bool(glQueryCounter) and glGetIntegerv(GL_MAJOR_VERSION) * 10 + glGetIntegerv(GL_MINOR_VERSION) >= 33
+    except GLError:
+        return False
+
+
+class _Section:
+    __slots__ = ("profiler", "name", "start", "query")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.gpu:
+            self.query = profiler._timestamp()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        profiler = self.profiler
+        profiler._cpu[self.name] = profiler._cpu.get(self.name, 0) + end - self.start
+        if profiler.trace is not None:
+            profiler.trace.append((self.name, "cpu", self.start, end - self.start))
+        if profiler.gpu:
+            profiler._gpu_queries.append((self.name, self.query, profiler._timestamp()))
+        return False
+
+
+class Profiler:
+    """Section timers of the render loop.
+
+    Wrap a piece of the frame in `with profiler.section("name"):` and call frame() once at the top of every frame.
+    CPU time is summed per section and frame; with a GL 3.3 context every section also records two GPU timestamps,
+    read back a few frames later so the CPU never waits for the GPU. stats() gives the averages of the last frames and
+    the p50/p95/p99 frame times, exportTrace() writes every recorded section as a Chrome trace.
+    """
+
+    def __init__(self, history=HISTORY, trace=False, gpu=True):
+        self.history = history
+        self.frame_times = deque(maxlen=history)
+        self.cpu = {}
+        self.gpu_times = {}
+        self.trace = deque(maxlen=MAX_TRACE_EVENTS) if trace else None
+        self.gpu = gpu and _gpuTimer()
+        self._cpu = {}
+        self._gpu_queries = []
+        self._pending = deque()
+        self._free = []
+        self._last = None
+        if self.gpu:
+            # Offset of the GPU clock against perf_counter, to put both on one timeline in the trace
+            timestamp = ctypes.c_int64()
+            readInteger64(GL_TIMESTAMP, ctypes.byref(timestamp))
+            self.gpu_offset = time.perf_counter_ns() - timestamp.value
+
+    def section(self, name):
+        return _Section(self, name)
+
+    def _timestamp(self):
+        query = self._free.pop() if self._free else int(glGenQueries(1)[0])
+        glQueryCounter(query, GL_TIMESTAMP)
+        return query
+
+    def frame(self):
+        # Close the previous frame: store its section times and collect the GPU results that have arrived
+        now = time.perf_counter_ns()
+        if self._last is not None:
+            self.frame_times.append((now - self._last) / 1e6)
+        self._last = now
+        for name in self.cpu.keys() | self._cpu.keys():
+            self.cpu.setdefault(name, deque(maxlen=self.history)).append(self._cpu.get(name, 0) / 1e6)
+        self._cpu = {}
+        if self.gpu:
+            if self._gpu_queries:
+                self._pending.append(self._gpu_queries)
+                self._gpu_queries = []
+            self._collect()
+
+    def _collect(self):
+        while self._pending:
+            queries = self._pending[0]
+            # The last timestamp of a frame is the last to arrive
+            if (len(self._pending) <= MAX_PENDING_FRAMES and
+                    not glGetQueryObjectiv(queries[-1][2], GL_QUERY_RESULT_AVAILABLE)):
+                return
+            self._pending.popleft()
+            totals = {}
+            start, end = ctypes.c_uint64(), ctypes.c_uint64()
+            for name, first, last in queries:
+                readQuery64(first, GL_QUERY_RESULT, ctypes.byref(start))
+                readQuery64(last, GL_QUERY_RESULT, ctypes.byref(end))
+                totals[name] = totals.get(name, 0) + end.value - start.value
+                if self.trace is not None:
+                    self.trace.append((name, "gpu", start.value + self.gpu_offset, end.value - start.value))
+                self._free += (first, last)
+            for name in self.gpu_times.keys() | totals.keys():
+                self.gpu_times.setdefault(name, deque(maxlen=self.history)).append(totals.get(name, 0) / 1e6)
+
+    def percentiles(self, q=(50, 95, 99)):
+        if not self.frame_times:
+            return [0.0] * len(q)
+        return list(np.percentile(self.frame_times, q))
+
+    def stats(self):
+        # Lines of text: frame time percentiles, then the mean CPU and GPU milliseconds of every section
+        p50, p95, p99 = self.percentiles()
+        fps = 1e3 / p50 if p50 else 0.0
+        lines = ["frame  p50 %6.2f  p95 %6.2f  p99 %6.2f ms  (%5.1f fps)" % (p50, p95, p99, fps),
+                 "%-22s %8s %8s" % ("section", "cpu ms", "gpu ms" if self.gpu else "")]
+        for name, times in self.cpu.items():
+            gpu = self.gpu_times.get(name)
+            lines.append("%-22s %8.3f %8s" % (name, np.mean(times), "%.3f" % np.mean(gpu) if gpu else ""))
+        return lines
+
+    def exportTrace(self, path):
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                  for tid, name in ((1, "CPU"), (2, "GPU"))]
+        events += [{"name": name, "cat": clock, "ph": "X", "pid": 1, "tid": 1 if clock == "cpu" else 2,
+                    "ts": start / 1e3, "dur": duration / 1e3}
+                   for name, clock, start, duration in self.trace or ()]
+        with open(path, "w") as trace:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace)
+
+    def release(self):
+        frames = list(self._pending) + [self._gpu_queries]
+        queries = self._free + [query for frame in frames for _, first, last in frame for query in (first, last)]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self._free, self._pending, self._gpu_queries = [], deque(), []
+
+
+class Overlay:
+    """Text in the top left corner of the screen, drawn over the scene as one textured quad.
+
+    The text is rendered with pygame.font into a texture, at most every OVERLAY_REFRESH seconds, so the overlay costs
+    one draw call per frame. pygame is only loaded once the overlay is shown.
+    """
+
+    def __init__(self, width, height, size=16):
+        self.font_size = size
+        self.font = None
+        self.width = width
+        self.height = height
+        self.visible = False
+        self.texture = None
+        self.mesh = None
+        self.program = None
+        self.size = (0, 0)
+        self.updated = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def update(self, lines):
+        now = time.perf_counter()
+        if not self.visible or now - self.updated < OVERLAY_REFRESH:
+            return
+        self.updated = now
+        import pygame
+
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, self.font_size)
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        surface = pygame.Surface((max(line.get_width() for line in rendered) + 8,
+                                  sum(line.get_height() for line in rendered) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = 4
+        for line in rendered:
+            surface.blit(line, (4, y))
+            y += line.get_height()
+        self.size = surface.get_size()
+
+        if self.texture is None:
+            self.texture = glGenTextures(1)
+            # Unit quad, placed and scaled to the text size by the shader
+            self.mesh = Mesh(*quadMesh(0.0, 1.0))
+            self.program = linkProgram(OVERLAY_VERTEX_SHADER, OVERLAY_FRAGMENT_SHADER)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, *self.size, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     pygame.image.tostring(surface, "RGBA", True))
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+
+    def draw(self):
+        if not self.visible or self.texture is None:
+            return
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        # The alpha of the frame stays opaque under the overlay
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ZERO, GL_ONE)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glUseProgram(self.program)
+        # Pixel rectangle with the origin in the bottom left corner
+        glUniform4f(glGetUniformLocation(self.program, "rect"), 8, self.height - 8 - self.size[1], *self.size)
+        glUniform2f(glGetUniformLocation(self.program, "screen"), self.width, self.height)
+        self.mesh.draw()
+        glUseProgram(0)
+        glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+
+    def release(self):
+        if self.texture is not None:
+            glDeleteTextures(1, [self.texture])
+            glDeleteProgram(self.program)
+            self.mesh.delete()
+            self.texture = None
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Trajectory recording and playback. A recording samples the system on a
+# uniform grid of simulated time into an append-only file of fixed size
+# float32 frames, written in chunks; playback memory-maps the file, so
+# seeking anywhere is one multiplication and a multi-gigabyte run never has
+# to fit into memory.
+# ---------------------------------------------------------------------------
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .bodies import DEFAULT_BODIES, BodyTable
+
+MAGIC = b"SSTRAJ\0\0"
+RECORDING_VERSION = 1
+# Magic, then the length of a JSON header; the frames follow it aligned to a page
+HEADER = struct.Struct("<8sQ")
+ALIGNMENT = 4096
+# Bytes of frames collected before they are written out
+CHUNK_BYTES = 8 << 20
+
+
+def frameLayout(bodies, counts):
+    # Offsets (in floats) of the parts of a frame: positions (bodies x 3), spin angles (bodies), then the instances
+    # (x, y, z, radius) of every small body group
+    offsets = [0, 3 * bodies, 4 * bodies]
+    for count in counts:
+        offsets.append(offsets[-1] + 4 * count)
+    return offsets
+
+
+def describeSystem(system):
+    # What a reader of the frames needs to rebuild the body table and the small body groups: config file, the scale
+    # values of the moment and the layout of a frame
+    bodies = system.bodies
+    counts = [len(group) for group in system.small_bodies]
+    return {
+        "frame_floats": frameLayout(len(bodies), counts)[-1], "bodies": len(bodies),
+        "groups": [{"count": count, "color": list(group.color)} for count, group in zip(counts, system.small_bodies)],
+        "config": bodies.config or DEFAULT_BODIES,
+        "rotation_main_earth": bodies.rotation_main_earth, "distance_earth": bodies.distance_earth,
+        "radius_earth": bodies.radius_earth, "radius_ratio": bodies.radius_ratio.tolist(),
+    }
+
+
+def restoreSystem(header):
+    # Body table and small body groups of a describeSystem() header; a config file that is gone is replaced by the
+    # default one
+    config = header["config"] if os.path.exists(header["config"]) else DEFAULT_BODIES
+    bodies = BodyTable.fromFile(config)
+    bodies.radius_ratio[:] = header["radius_ratio"]
+    bodies.setRotation(header["rotation_main_earth"])
+    bodies.setDistance(header["distance_earth"])
+    bodies.setRadius(header["radius_earth"])
+    return bodies, [_RecordedGroup(group["count"], group["color"]) for group in header["groups"]]
+
+
+def captureFrame(system, alpha, frame, offsets):
+    # Writes the state of a system alpha of the way into its last step into a float32 frame
+    positions, spin = system.interpolate(alpha)
+    frame[offsets[0]:offsets[1]] = positions.ravel()
+    frame[offsets[1]:offsets[2]] = spin
+    for group, first, end in zip(system.small_bodies, offsets[2:], offsets[3:]):
+        frame[first:end] = group.instances.ravel()
+
+
+def splitFrame(frame, offsets):
+    # Positions, spin angles and the instance arrays of every group of a frame, as views
+    return (frame[offsets[0]:offsets[1]].reshape(-1, 3), frame[offsets[1]:offsets[2]],
+            [frame[first:end].reshape(-1, 4) for first, end in zip(offsets[2:], offsets[3:])])
+
+
+def interpolateFrames(before, after, fraction, offsets, instances):
+    # State fraction of the way from frame before to frame after: positions and spin angles in double precision, the
+    # instances of the groups written into the arrays of instances
+    positions, spin, groups = splitFrame(before, offsets)
+    if fraction == 0.0:
+        for target, group in zip(instances, groups):
+            target[:] = group
+        return positions.astype(np.float64), spin.astype(np.float64)
+    positions_after, spin_after, groups_after = splitFrame(after, offsets)
+    positions = positions + (positions_after - positions) * fraction
+    # Spin angles take the short way around
+    spin = spin.astype(np.float64)
+    spin += (np.mod(spin_after - spin + 180, 360) - 180) * fraction
+    for target, group, group_after in zip(instances, groups, groups_after):
+        np.subtract(group_after, group, out=target)
+        target *= fraction
+        target += group
+    return positions.astype(np.float64), spin
+
+
+class Recorder:
+    """Streams the state of a SolarSystem into a trajectory file.
+
+    Advance the system with step() (or call capture() after every single step, it raises otherwise): it writes a
+    frame for every multiple of interval seconds the step has passed, interpolated inside the step, so the frames lie
+    on a uniform time grid whatever the step sizes were.
+    Frames are float32 body positions and spin angles plus the small body instances in scene units, collected into
+    chunks of CHUNK_BYTES before they are written. The file only ever grows; a recording cut off by a crash loses
+    at most the chunk in memory, a partial frame at the end is ignored on playback. The system must not seek while
+    it is recorded, the frames are one continuous timeline.
+    """
+
+    def __init__(self, path, system, interval):
+        if interval <= 0:
+            raise ValueError("The recording interval must be positive")
+        bodies = system.bodies
+        self.system = system
+        self.interval = interval
+        self.start = system.time
+        self.frames = 0
+        self.offsets = frameLayout(len(bodies), [len(group) for group in system.small_bodies])
+
+        # Enough to rebuild the body table the playback draws: config file and the scale values of the start
+        header = json.dumps(dict(describeSystem(system), version=RECORDING_VERSION, start=self.start,
+                                 interval=interval)).encode()
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, len(header)) + header)
+        self.file.seek(-(-(HEADER.size + len(header)) // ALIGNMENT) * ALIGNMENT)
+        self.chunk = np.empty((max(CHUNK_BYTES // (4 * self.offsets[-1]), 1), self.offsets[-1]), dtype=np.float32)
+        self.pending = 0
+        self.capture()
+
+    def step(self, dt, steps=1):
+        # One step at a time instead of a batched catch-up step: the motion of the gravity engine is only close to
+        # linear inside a single step, interpolating across several would cut the curve of the orbits
+        for _ in range(steps):
+            self.system.step(dt)
+            self.capture()
+
+    def capture(self):
+        system = self.system
+        last_dt = system.bodies.last_dt
+        # Only the last step can be interpolated: a frame from before it (a batched step, or capture() not called
+        # after every step) has no state to take
+        if system.time - (self.start + self.frames * self.interval) > last_dt > 0:
+            raise RuntimeError("Frames from before the last step of %g s, advance the recorded system with "
+                               "Recorder.step() or capture() after every single step" % last_dt)
+        while self.start + self.frames * self.interval <= system.time:
+            behind = system.time - (self.start + self.frames * self.interval)
+            alpha = min(max(1.0 - behind / last_dt, 0.0), 1.0) if last_dt > 0 else 1.0
+            captureFrame(system, alpha, self.chunk[self.pending], self.offsets)
+            self.pending += 1
+            self.frames += 1
+            if self.pending == len(self.chunk):
+                self.flush()
+
+    def flush(self):
+        self.file.write(self.chunk[:self.pending].data)
+        self.file.flush()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class Trajectory:
+    """Read-only view of a recording: the frames are one memory-mapped float32 array, nothing is read before it is
+    used. refresh() maps the frames that a recorder has appended since."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as recording:
+            magic, length = HEADER.unpack(recording.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("Not a trajectory recording: %s" % path)
+            self.header = json.loads(recording.read(length))
+        if self.header["version"] != RECORDING_VERSION:
+            raise ValueError("Unsupported recording version %s: %s" % (self.header["version"], path))
+        self.data_start = -(-(HEADER.size + length) // ALIGNMENT) * ALIGNMENT
+        self.start = self.header["start"]
+        self.interval = self.header["interval"]
+        self.offsets = frameLayout(self.header["bodies"], [group["count"] for group in self.header["groups"]])
+        self.frames = None
+        self.refresh()
+
+    def refresh(self):
+        frame_bytes = 4 * self.offsets[-1]
+        count = max(os.path.getsize(self.path) - self.data_start, 0) // frame_bytes
+        if self.frames is not None and count == len(self.frames):
+            return
+        if count:
+            self.frames = np.memmap(self.path, dtype=np.float32, mode="r", offset=self.data_start,
+                                    shape=(count, self.offsets[-1]))
+        else:
+            self.frames = np.empty((0, self.offsets[-1]), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def end(self):
+        return self.start + max(len(self) - 1, 0) * self.interval
+
+    def frame(self, index):
+        # Positions, spin angles and the instance arrays of every group of one frame, views into the map
+        return splitFrame(self.frames[index], self.offsets)
+
+    def sample(self, seconds, instances=None):
+        # State at any time, linear between the two frames around it and held at the ends; instances - optional
+        # arrays the small bodies are written to instead of new ones
+        if not len(self):
+            raise ValueError("The recording has no frames: %s" % self.path)
+        position = min(max((seconds - self.start) / self.interval, 0.0), len(self) - 1)
+        index = min(int(position), len(self) - 1)
+        fraction = position - index
+        if instances is None:
+            instances = [np.empty((group["count"], 4), dtype=np.float32) for group in self.header["groups"]]
+        after = self.frames[min(index + 1, len(self) - 1)]
+        positions, spin = interpolateFrames(self.frames[index], after, fraction, self.offsets, instances)
+        return positions, spin, instances
+
+    def positions(self, seconds):
+        # Body positions (times, bodies, 3) at an array of times, linear between frames like sample()
+        seconds = np.asarray(seconds, dtype=np.float64)
+        position = np.clip((seconds - self.start) / self.interval, 0.0, len(self) - 1)
+        index = np.minimum(position.astype(int), max(len(self) - 2, 0))
+        fraction = (position - index)[:, None]
+        columns = slice(self.offsets[0], self.offsets[1])
+        before = self.frames[index, columns].astype(np.float64)
+        after = self.frames[np.minimum(index + 1, len(self) - 1), columns]
+        return (before + (after - before) * fraction).reshape(len(seconds), -1, 3)
+
+
+class _RecordedGroup:
+    # The parts of a small body group the renderer uses
+    def __init__(self, count, color):
+        self.instances = np.zeros((count, 4), dtype=np.float64)
+        self.color = tuple(color)
+
+    def __len__(self):
+        return len(self.instances)
+
+
+class Playback:
+    """A recording in place of a SolarSystem: the renderer and the application loops use it the same way.
+
+    step() moves the playback time, so the time warp sets the playback speed and seek() scrubs; both stop at the
+    ends of the recording, or wrap around with loop=True. The body table is rebuilt from the config and the scale
+    values the recording started with.
+    """
+
+    def __init__(self, path, loop=False):
+        self.trajectory = Trajectory(path)
+        self.bodies, self.small_bodies = restoreSystem(self.trajectory.header)
+        self.gravity = None
+        self.ephemeris = None
+        self.loop = loop
+        self.time = self.trajectory.start
+
+    def _move(self, seconds):
+        trajectory = self.trajectory
+        trajectory.refresh()
+        self.time += seconds
+        length = trajectory.end - trajectory.start
+        if self.loop and length > 0:
+            self.time = trajectory.start + (self.time - trajectory.start) % length
+        else:
+            self.time = min(max(self.time, trajectory.start), trajectory.end)
+
+    def step(self, dt, steps=1):
+        if steps > 0:
+            self._move(dt * steps)
+            self.bodies.last_dt = dt
+
+    def seek(self, seconds):
+        self._move(seconds)
+        self.bodies.last_dt = 0.0
+
+    def interpolate(self, alpha=1.0):
+        positions, spin, _ = self.trajectory.sample(self.time + self.bodies.last_dt * (alpha - 1.0),
+                                                    [group.instances for group in self.small_bodies])
+        return positions, spin
+
+    def positionsAt(self, seconds):
+        return self.trajectory.positions(seconds)
+
+    def energy(self):
+        return np.nan
+
+    def close(self):
+        self.trajectory.frames = None
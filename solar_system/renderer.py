@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Renderer: draws a SolarSystem into the current OpenGL context with the
+# shader pipeline - textures, cached meshes, level of detail, culling,
+# instanced small bodies, orbit trails and the profiler overlay - as seen from
+# a Camera. Everything is drawn relative to the camera, with a reversed-Z
+# depth buffer where the GL supports it.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+
+from OpenGL.GL import *
+from OpenGL.GL.ARB.clip_control import glInitClipControlARB
+
+from .culling import BoundingVolumeHierarchy, Frustum, visibleRanges
+from .geometry import GeometryCache
+from .instancing import InstancedSpheres
+from .lod import LevelOfDetail
+from .profiler import Overlay, Profiler
+from .shaders import (BODY_FRAGMENT_SHADER, BODY_VERTEX_SHADER, CAMERA_BINDING, CAMERA_FLOATS, OBJECT_BINDING,
+                      OBJECT_FLOATS, SUN_FRAGMENT_SHADER, SUN_VERTEX_SHADER, UniformBuffer, linkProgram, perspective,
+                      reversedPerspective, splitPrecision)
+from .textures import DEFAULT_CACHE, TextureLoader
+from .trails import OrbitTrails
+
+# Pixels covered by a body smaller than a pixel, so it stays visible as a dot
+POINT_SIZE = 2.0
+FIELD_OF_VIEW = 45
+# The reversed-Z projection has no far plane, FAR only limits culling and the conventional projection
+NEAR, FAR = 0.01, 50000.0
+# Fraction of the light the night side of a body still gets
+AMBIENT = 0.2
+# Brightness of the sun surface, strength of its halo and how far the halo reaches (sun radii)
+SUN_EMISSION = 1.3
+HALO_STRENGTH = 0.6
+HALO_RADIUS = 4.0
+
+# Materials of the object block: emission, texture level bias, halo strength, halo radius
+LIT = (0.0, 0.0, 0.0, 0.0)
+UNLIT = (1.0, 0.0, 0.0, 0.0)
+# Smaller than a pixel: the average colour of the map
+POINT = (1.0, 16.0, 0.0, 0.0)
+SUN = (SUN_EMISSION, 0.0, HALO_STRENGTH, HALO_RADIUS)
+
+
+def modelMatrix(position, angle=0.0, scale=1.0):
+    # Translation, rotation by angle (degrees) around Z and scaling (one factor or one per axis), as the column major
+    # floats of the object block
+    cos, sin = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    sx, sy, sz = np.broadcast_to(scale, 3)
+    # Rows of the transposed matrix are the columns of the model matrix
+    return np.array([cos * sx, sin * sx, 0.0, 0.0,
+                     -sin * sy, cos * sy, 0.0, 0.0,
+                     0.0, 0.0, sz, 0.0,
+                     position[0], position[1], position[2], 1.0])
+
+
+class Renderer:
+    """OpenGL view of a SolarSystem.
+
+    Builds the shader programs and the projection for a width x height target, requests the planet maps and builds
+    meshes on first use. draw(camera, alpha) renders one frame of the system alpha of the way into its last step: the
+    camera and light go into one uniform buffer, the transforms of every object into another, both uploaded once per
+    frame, and the draws are submitted sorted by mesh and texture. release() frees every GL object, the context itself
+    belongs to the caller. orbits="trails" draws the path every body actually took, "paths" the precomputed circle or
+    ellipse of its orbit.
+
+    Culling and level of detail work in double precision world coordinates; what goes to the GPU is relative to the
+    camera, so float32 only ever holds the small numbers around it. With glClipControl (OpenGL 4.5) the projection is
+    reversed-Z with an infinite far plane, which needs a float depth buffer (see headless.Framebuffer) to pay off;
+    without it the conventional NEAR - FAR projection is used.
+    """
+
+    def __init__(self, system, width, height, texture_cache=DEFAULT_CACHE, compress_textures=False, trace=False,
+                 overlay=False, orbits="trails"):
+        if orbits not in ("trails", "paths"):
+            raise ValueError("Unknown orbit style: %s" % orbits)
+        self.system = system
+        self.width = width
+        self.height = height
+        bodies = system.bodies
+        # Planets first, the sun goes last because it is blended over the scene
+        self.draw_order = sorted(range(len(bodies)), key=lambda i: bodies.star[i])
+
+        glEnable(GL_DEPTH_TEST)
+        # Opaque black background: exported frames carry the alpha channel, the blended passes leave it at 1
+        glClearColor(0.0, 0.0, 0.0, 1.0)
+        # Bodies smaller than a pixel are points of POINT_SIZE, set by the shader
+        glEnable(GL_PROGRAM_POINT_SIZE)
+        self.reversed_z = bool(glInitClipControlARB())
+        if self.reversed_z:
+            # Depth 1 at the near plane, 0 at infinity
+            glClipControl(GL_LOWER_LEFT, GL_ZERO_TO_ONE)
+            glDepthFunc(GL_GREATER)
+            glClearDepth(0.0)
+            self.projection = reversedPerspective(FIELD_OF_VIEW, width / height, NEAR)
+        else:
+            self.projection = perspective(FIELD_OF_VIEW, width / height, NEAR, FAR)
+        # Culling needs a far plane either way
+        self.culling_projection = perspective(FIELD_OF_VIEW, width / height, NEAR, FAR)
+
+        # Sphere, orbit and ring meshes are built lazily on first use and then reused every frame
+        self.geometry = GeometryCache()
+        self.body_program = linkProgram(BODY_VERTEX_SHADER, BODY_FRAGMENT_SHADER)
+        self.sun_program = linkProgram(SUN_VERTEX_SHADER, SUN_FRAGMENT_SHADER)
+        self.camera_block = UniformBuffer(CAMERA_BINDING, CAMERA_FLOATS)
+        self.object_blocks = UniformBuffer(OBJECT_BINDING, OBJECT_FLOATS)
+
+        # Tessellations follow the projected size of every body
+        self.lod = LevelOfDetail(len(bodies), height, fov=FIELD_OF_VIEW)
+        # Small bodies are culled through a bounding volume hierarchy per group
+        self.small_body_index = [BoundingVolumeHierarchy() for _ in system.small_bodies]
+        self.small_body_draws = [InstancedSpheres(group) for group in system.small_bodies]
+        self.trails = OrbitTrails(bodies) if orbits == "trails" else None
+
+        # Section timers of the frame, shown on the overlay
+        self.profiler = Profiler(trace=trace)
+        self.overlay = Overlay(width, height)
+        self.overlay.visible = overlay
+
+        # Maps are decoded in the background, every body is drawn with a placeholder until its map is uploaded
+        self.textures = TextureLoader(cache=texture_cache, compress=compress_textures)
+        self.body_textures = [self.textures.request(texture) for texture in bodies.texture]
+
+    def _objects(self, positions, spin, visible, frustum, origin):
+        # Draws of the frame as (program, mesh, texture, index ranges or None) and the object block of each; positions
+        # are relative to origin already, the orbits are moved by -origin in the shader
+        system, bodies, lod, geometry = self.system, self.system.bodies, self.lod, self.geometry
+        draws, blocks = [], []
+
+        def add(program, mesh, texture, matrix, material, ranges=None, camera=(0.0, 0.0, 0.0)):
+            # camera - origin in the units of a mesh in world coordinates, subtracted before the model matrix
+            high, low = splitPrecision(camera)
+            draws.append((program, mesh, texture, ranges))
+            blocks.append(np.concatenate((matrix, material, high, (0.0,), low, (0.0,))))
+
+        for i in self.draw_order:
+            radius, texture, position, angle = bodies.radius[i], self.body_textures[i], positions[i], spin[i]
+            if visible[i]:
+                detail = lod.sphere(i)
+                if detail is None:
+                    add(self.body_program, geometry.point(), texture, modelMatrix(position), POINT)
+                elif bodies.star[i]:
+                    add(self.sun_program, geometry.quad(), texture, modelMatrix(position, angle, radius), SUN)
+                else:
+                    add(self.body_program, geometry.sphere(*detail), texture, modelMatrix(position, angle, radius),
+                        LIT)
+                    if bodies.ring[i]:
+                        add(self.body_program, geometry.ring(radius, *lod.ring(i)), texture,
+                            modelMatrix(position, angle, (1.1, 1.0, 1.0)), LIT)
+            if bodies.star[i] or self.trails is not None:
+                continue
+
+            # Orbits are culled per arc, most of a large one is usually out of view. They are tinted by the map of
+            # their planet
+            if system.ephemeris is not None:
+                # Elliptical orbit in AU, scaled like the positions
+                segments = lod.orbit(i)
+                orbit = geometry.path((bodies.name[i], segments), lambda: system.ephemeris.orbitPath(i, segments))
+                add(self.body_program, orbit, texture, modelMatrix((0.0, 0.0, 0.0), scale=bodies.distance_earth),
+                    UNLIT, visibleRanges(frustum, orbit.arcs, bodies.distance_earth), origin / bodies.distance_earth)
+            else:
+                orbit = geometry.orbit(bodies.distance[i], rings=lod.orbit(i))
+                add(self.body_program, orbit, texture, modelMatrix((0.0, 0.0, 0.0)), UNLIT,
+                    visibleRanges(frustum, orbit.arcs), origin)
+        return draws, blocks
+
+    def _submit(self, draws, program):
+        # The draws of one program, sorted so that every mesh and texture is bound once
+        order = sorted((index for index, draw in enumerate(draws) if draw[0] == program),
+                       key=lambda index: (id(draws[index][1]), draws[index][2]))
+        if not order:
+            return
+        glUseProgram(program)
+        mesh = texture = None
+        for index in order:
+            _, draw_mesh, draw_texture, ranges = draws[index]
+            if draw_mesh is not mesh:
+                mesh = draw_mesh
+                mesh.bind()
+            if draw_texture != texture:
+                texture = draw_texture
+                glBindTexture(GL_TEXTURE_2D, texture)
+            self.object_blocks.select(index)
+            if ranges is None:
+                mesh.drawBound()
+            else:
+                mesh.drawBound(*ranges)
+        mesh.unbind()
+        glUseProgram(0)
+
+    def draw(self, camera, alpha=1.0):
+        # camera - Camera to draw from; alpha - how far into the last simulation step the frame is, see SimulationClock
+        system, bodies, profiler, lod = self.system, self.system.bodies, self.profiler, self.lod
+        positions, spin = system.interpolate(alpha)
+        origin = camera.position
+
+        with profiler.section("culling"):
+            # Only what intersects the view frustum is submitted
+            view = camera.view()
+            frustum = Frustum.fromMatrices(self.culling_projection, view)
+            # The ring is a torus of radius + 1 with a 0.1 tube, stretched by 1.1; the sun reaches as far as its halo
+            ring_radius = (bodies.radius + 1.1) * 1.1
+            bounds = np.where(bodies.ring, np.maximum(bodies.radius, ring_radius), bodies.radius)
+            visible = frustum.spheres(positions, np.where(bodies.star, bodies.radius * HALO_RADIUS, bounds))
+            lod.update(view, positions, bodies.radius, ring_radius, bodies.distance)
+
+        trails = self.trails
+        if trails is not None:
+            with profiler.section("orbits"):
+                trails.update(system, system.time + bodies.last_dt * (alpha - 1.0), positions)
+                visible_trails = trails.visible(frustum)
+
+        with profiler.section("uniforms"):
+            # Positions relative to the camera are taken in double precision, the view matrix is a rotation then
+            relative = positions - origin
+            view = camera.view(origin)
+            # The light sits in the first star, wherever the simulation has moved it
+            stars = np.flatnonzero(bodies.star)
+            sun = np.append(relative[stars[0]] if len(stars) else -origin, 1.0) @ view
+            self.camera_block.upload(np.concatenate((view.ravel(), self.projection.ravel(), sun,
+                                                     (1.0, 1.0, 1.0, AMBIENT),
+                                                     (self.width, self.height, POINT_SIZE, float(self.reversed_z)))))
+            draws, blocks = self._objects(relative, spin, visible, frustum, origin)
+            self.object_blocks.upload(blocks)
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        with profiler.section("bodies"):
+            self._submit(draws, self.body_program)
+
+        with profiler.section("small bodies"):
+            for group, index, draw in zip(system.small_bodies, self.small_body_index, self.small_body_draws):
+                index.update(group.instances[:, :3], group.instances[:, 3])
+                draw.draw(index.query(frustum), origin)
+
+        if trails is not None:
+            with profiler.section("orbits"):
+                trails.draw(visible_trails, self.body_textures, origin)
+
+        with profiler.section("sun"):
+            # Surface and halo in one draw: the surface covers what is behind it, the halo (alpha 0) adds to it
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+            self._submit(draws, self.sun_program)
+            glDisable(GL_BLEND)
+
+    def invalidate(self, kind):
+        # Meshes sized by a scale value that was changed, e.g. "orbit" after the distance hotkeys, or "trails" after
+        # a jump in time
+        if kind == "trails":
+            if self.trails is not None:
+                self.trails.reset()
+        else:
+            self.geometry.invalidate(kind)
+
+    def release(self):
+        self.profiler.release()
+        self.overlay.release()
+        self.geometry.release()
+        if self.trails is not None:
+            self.trails.release()
+        self.camera_block.release()
+        self.object_blocks.release()
+        glDeleteProgram(self.body_program)
+        glDeleteProgram(self.sun_program)
+        self.textures.release(self.body_textures)
+        for draw in self.small_body_draws:
+            draw.release()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Shader pipeline: GLSL 3.30 core programs for the bodies and the sun, the
+# uniform blocks shared by every program (camera and light once per frame,
+# per-object transforms in one buffer) and the helpers to build them.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+
+from OpenGL.GL import *
+from OpenGL.GL.shaders import compileShader
+
+# Binding points of the uniform blocks
+CAMERA_BINDING = 0
+OBJECT_BINDING = 1
+
+# Camera and light of the frame, std140: view, projection, sun position in view space, light colour with the
+# ambient fraction in w, viewport width and height with the point size of bodies smaller than a pixel in z and the
+# depth range of the clip space in w (1 for 0..1 with the reversed-Z projection, 0 for OpenGL's -1..1)
+CAMERA_BLOCK = """
+layout(std140) uniform Camera {
+    mat4 view;
+    mat4 projection;
+    vec4 sun;
+    vec4 light;
+    vec4 viewport;
+};
+"""
+CAMERA_FLOATS = 16 + 16 + 4 + 4 + 4
+
+# One drawn object, std140: model matrix, material - emission (0 lit, 1 unlit, above 1 glowing), bias of the
+# texture level (large values give the average colour of the map), halo strength and halo radius in body radii - and
+# the camera position in model units split into a high and a low float part (zero for meshes placed by the model
+# matrix, see splitPrecision)
+OBJECT_BLOCK = """
+layout(std140) uniform Object {
+    mat4 model;
+    vec4 material;
+    vec4 origin_high;
+    vec4 origin_low;
+};
+"""
+OBJECT_FLOATS = 16 + 4 + 4 + 4
+
+BODY_VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec3 normal;
+layout(location = 2) in vec2 texcoord;
+layout(location = 4) in vec3 position_low;  // zero unless the mesh has the low parts of its positions
+""" + CAMERA_BLOCK + OBJECT_BLOCK + """
+out vec3 view_position;
+out vec3 view_normal;
+out vec2 uv;
+
+void main() {
+    // Meshes in world coordinates (orbits) are moved to the camera part by part: the high parts cancel exactly
+    // close to the camera, the low parts keep what float32 would have rounded away
+    vec3 relative = (position - origin_high.xyz) + (position_low - origin_low.xyz);
+    mat4 model_view = view * model;
+    vec4 eye = model_view * vec4(relative, 1.0);
+    view_position = eye.xyz;
+    // Rings are stretched along one axis, their normals need the inverse transpose
+    view_normal = transpose(inverse(mat3(model_view))) * normal;
+    uv = texcoord;
+    gl_Position = projection * eye;
+    gl_PointSize = viewport.z;
+}
+"""
+
+BODY_FRAGMENT_SHADER = """
+#version 330
+""" + CAMERA_BLOCK + OBJECT_BLOCK + """
+uniform sampler2D map;
+in vec3 view_position;
+in vec3 view_normal;
+in vec2 uv;
+out vec4 color;
+
+void main() {
+    vec3 albedo = texture(map, uv, material.y).rgb;
+    vec3 shade = vec3(1.0);
+    if (material.x < 1.0) {
+        // Lambert from the position of the sun, the night side keeps the ambient fraction
+        float diffuse = max(dot(normalize(view_normal), normalize(sun.xyz - view_position)), 0.0);
+        shade = mix(light.rgb * (light.a + (1.0 - light.a) * diffuse), vec3(1.0), material.x);
+    }
+    color = vec4(albedo * shade, 1.0);
+}
+"""
+
+# The sun is ray traced on a camera facing quad: where the ray hits the sphere it shows the emissive surface with
+# its own depth, around it the halo, so surface and bloom come from one draw without a post-processing pass
+SUN_VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec3 position;
+""" + CAMERA_BLOCK + OBJECT_BLOCK + """
+out vec3 view_position;
+flat out vec4 sphere;
+
+void main() {
+    vec3 center = (view * model[3]).xyz;
+    float radius = length(model[0].xyz);
+    float distance = length(center);
+    vec3 forward = center / distance;
+    vec3 right = normalize(cross(forward, abs(forward.y) < 0.99 ? vec3(0.0, 1.0, 0.0) : vec3(1.0, 0.0, 0.0)));
+    vec3 up = cross(right, forward);
+    // The silhouette of the sphere on the plane through its center, grown to the halo
+    float size = material.w * radius * distance / sqrt(max(distance * distance - radius * radius, 1e-6));
+    view_position = center + (right * position.x + up * position.y) * size;
+    sphere = vec4(center, radius);
+    gl_Position = projection * vec4(view_position, 1.0);
+}
+"""
+
+SUN_FRAGMENT_SHADER = """
+#version 330
+""" + CAMERA_BLOCK + OBJECT_BLOCK + """
+uniform sampler2D map;
+in vec3 view_position;
+flat in vec4 sphere;
+out vec4 color;
+
+const float PI = 3.14159265358979;
+
+void main() {
+    vec3 ray = normalize(view_position);
+    float along = dot(ray, sphere.xyz);
+    float miss = dot(sphere.xyz, sphere.xyz) - along * along;  // squared distance of the ray from the center
+    float radius2 = sphere.w * sphere.w;
+    vec3 hit = ray * (along - sqrt(max(radius2 - miss, 0.0)));
+
+    // Texture coordinates of the hit in the same layout as sphereMesh; the derivatives are taken from whichever of
+    // two seams is further away, so the mipmap level does not jump along the seam
+    vec3 normal = normalize(transpose(mat3(view * model)) * (hit - sphere.xyz));
+    float longitude = atan(-normal.x, normal.y) / (2.0 * PI);
+    vec2 uv = vec2(fract(longitude), 1.0 - acos(clamp(normal.z, -1.0, 1.0)) / PI);
+    float shifted = fract(longitude + 0.5);
+    vec2 dx = dFdx(uv), dy = dFdy(uv);
+    float dx_shifted = dFdx(shifted), dy_shifted = dFdy(shifted);
+    dx.x = abs(dx_shifted) < abs(dx.x) ? dx_shifted : dx.x;
+    dy.x = abs(dy_shifted) < abs(dy.x) ? dy_shifted : dy.x;
+
+    vec3 point;
+    if (miss < radius2) {
+        point = hit;
+        color = vec4(textureGrad(map, uv, dx, dy).rgb * material.x, 1.0);
+    } else {
+        // Halo: falls off with the distance from the center and reaches zero at the edge of the quad; alpha 0 adds
+        // it to what is behind (the blend function is ONE, ONE_MINUS_SRC_ALPHA)
+        point = view_position;
+        float x = sqrt(miss) / sphere.w;
+        float fade = 1.0 - smoothstep(1.0, material.w, x);
+        color = vec4(texture(map, vec2(0.5), 16.0).rgb * material.z * fade * fade / (x * x), 0.0);
+    }
+    vec4 clip = projection * vec4(point, 1.0);
+    float depth = clip.z / clip.w;
+    gl_FragDepth = gl_DepthRange.diff * mix((depth + 1.0) / 2.0, depth, viewport.w) + gl_DepthRange.near;
+}
+"""
+
+
+def splitPrecision(values):
+    # Double precision values as a float32 high part and the float32 remainder; on the GPU (high - high') +
+    # (low - low') recovers the difference of two such values to about double precision
+    values = np.asarray(values, dtype=np.float64)
+    high = values.astype(np.float32)
+    return high, (values - high).astype(np.float32)
+
+
+def linkProgram(vertex_shader, fragment_shader):
+    # Uniform blocks the program uses are attached to their binding points
+    program = glCreateProgram()
+    for source, kind in ((vertex_shader, GL_VERTEX_SHADER), (fragment_shader, GL_FRAGMENT_SHADER)):
+        glAttachShader(program, compileShader(source, kind))
+    glLinkProgram(program)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+        raise RuntimeError(glGetProgramInfoLog(program).decode())
+    for name, binding in (("Camera", CAMERA_BINDING), ("Object", OBJECT_BINDING)):
+        index = glGetUniformBlockIndex(program, name)
+        if index != GL_INVALID_INDEX:
+            glUniformBlockBinding(program, index, binding)
+    return program
+
+
+class UniformBuffer:
+    """Uniform buffer behind one binding point, holding an array of blocks of the given number of floats.
+
+    upload() replaces the contents with one buffer update per frame; select(i) binds block i, each block starts at
+    the offset alignment the GL requires. With a single block the whole buffer is bound on upload.
+    """
+
+    def __init__(self, binding, floats):
+        self.binding = binding
+        self.floats = floats
+        alignment = int(glGetIntegerv(GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT)) // 4
+        self.stride = -(-floats // alignment) * alignment
+        self.buffer = glGenBuffers(1)
+        self.blocks = np.zeros((0, self.stride), dtype=np.float32)
+
+    def upload(self, blocks):
+        # blocks - (count, floats) array, padded to the stride here
+        blocks = np.asarray(blocks, dtype=np.float32).reshape(-1, self.floats)
+        if len(self.blocks) != len(blocks):
+            self.blocks = np.zeros((len(blocks), self.stride), dtype=np.float32)
+        self.blocks[:, :self.floats] = blocks
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        # Orphan the storage of the previous frame instead of waiting for it
+        glBufferData(GL_UNIFORM_BUFFER, self.blocks.nbytes, self.blocks, GL_STREAM_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        if len(blocks) == 1:
+            glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.buffer)
+
+    def select(self, index):
+        glBindBufferRange(GL_UNIFORM_BUFFER, self.binding, self.buffer, index * self.stride * 4, self.floats * 4)
+
+    def release(self):
+        if self.buffer is not None:
+            glDeleteBuffers(1, [self.buffer])
+            self.buffer = None
+
+
+def perspective(fov, aspect, near, far):
+    # The gluPerspective matrix, in the layout OpenGL reads back (row vectors)
+    f = 1.0 / np.tan(np.radians(fov) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), -1],
+                     [0, 0, 2 * far * near / (near - far), 0]], dtype=np.float32)
+
+
+def reversedPerspective(fov, aspect, near):
+    # Perspective with an infinite far plane that maps near to depth 1 and infinity to 0, for a 0..1 clip space
+    # (glClipControl). The exponent of a float depth buffer then follows the distance, so the precision is relative
+    # everywhere instead of all spent right in front of the near plane
+    f = 1.0 / np.tan(np.radians(fov) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, 0, -1],
+                     [0, 0, near, 0]], dtype=np.float32)
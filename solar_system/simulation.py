@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# The simulation without any rendering: body table, small body groups and
+# the optional gravity engine or ephemeris, advanced in simulated seconds.
+# Only NumPy is needed, so batch jobs and worker processes import this
+# without paying for OpenGL, pygame or PIL.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+
+from .bodies import DEFAULT_BODIES, BodyTable
+from .smallbodies import ASTEROID_MASS, asteroidBelt, moonSystems
+
+
+class SolarSystem:
+    """Everything that moves.
+
+    The bodies of the table follow circular orbits by default, their Keplerian orbits with ephemeris=True (positions
+    looked up by date) or their mutual gravity with physics="leapfrog" / "rk4" (the asteroid belt then joins the
+    gravity engine, which starts from circular orbits in one plane, or from the orbital elements at epoch with
+    elements=True). step() advances the simulated time, interpolate() gives the positions of a frame between the last
+    two steps and moves the small bodies there. Positions are in scene units (bodies.distance_earth per AU).
+    """
+
+    def __init__(self, bodies=DEFAULT_BODIES, asteroids=0, moons=False, physics=None, gravity="auto", theta=0.5,
+                 workers=0, ephemeris=False, epoch="2000-01-01T12:00", seed=None, elements=False):
+        # bodies - BodyTable or path of a config file
+        if ephemeris and physics:
+            raise ValueError("The ephemeris and the gravity engine are exclusive")
+        self.bodies = bodies if isinstance(bodies, BodyTable) else BodyTable.fromFile(bodies)
+
+        # Small bodies are drawn with one instanced draw call per group
+        self.belt = asteroidBelt(asteroids, seed)
+        self.small_bodies = [group for group in (self.belt, moonSystems(self.bodies, seed) if moons else None)
+                             if group is not None and len(group)]
+
+        # Optional gravity engine: the planets and the asteroid belt move under their mutual gravity, positions come
+        # from it instead of the orbital angles; moons keep circling their (now moving) planets
+        self.gravity = None
+        if physics:
+            from .ephemeris import secondsSinceJ2000
+            from .nbody import GravitySystem
+
+            self.gravity = GravitySystem.fromBodies(self.bodies, epoch=secondsSinceJ2000(epoch) if elements else None,
+                                                    integrator=physics, method=gravity, theta=theta, workers=workers)
+            self.belt_particles = self.gravity.addParticles(*self.belt.heliocentricState(), ASTEROID_MASS)
+
+        # Optional ephemeris: positions are looked up by date, seeking to another date costs the same as the next
+        # frame. The time counts simulated seconds since J2000.
+        self.ephemeris = None
+        self.time = 0.0
+        if ephemeris:
+            from .ephemeris import Ephemeris, EphemerisCache, secondsSinceJ2000
+
+            self.ephemeris = Ephemeris(self.bodies)
+            self.ephemeris_positions = EphemerisCache(self.ephemeris)
+            self.time = secondsSinceJ2000(epoch)
+
+    def advance(self, dt):
+        self.time += dt
+        self.bodies.step(dt)
+        for group in self.small_bodies:
+            group.step(self.bodies, dt)
+        if self.gravity is not None:
+            self.gravity.advance(dt)
+
+    def step(self, dt, steps=1):
+        # Orbits and spins are linear in time, so a backlog of steps is caught up in one batched step instead of
+        # being dropped (the gravity engine splits it into its own sub-steps); the last step is kept separate for the
+        # interpolation
+        if steps > 1:
+            self.advance(dt * (steps - 1))
+        if steps > 0:
+            self.advance(dt)
+
+    def seek(self, seconds):
+        # Jump in time without replaying the frames in between: orbits and spins are linear in time and the ephemeris
+        # is looked up by date. The zero step that follows keeps the frame from interpolating across the jump.
+        # The gravity engine cannot jump, it is left alone.
+        if self.gravity is not None:
+            return
+        self.advance(seconds)
+        self.advance(0.0)
+
+    def interpolate(self, alpha=1.0):
+        # Positions and spin angles (degrees around Z) of the bodies alpha of the way into the last step, see
+        # SimulationClock; the small body instances are moved to the same moment
+        bodies = self.bodies
+        angles = bodies.interpolate(alpha)
+        particles = None
+        if self.ephemeris is not None:
+            positions = self.ephemeris_positions.positions(self.time + bodies.last_dt * (alpha - 1.0))
+            positions = positions * bodies.distance_earth
+        elif self.gravity is None:
+            positions = bodies.positions(angles[0])
+        else:
+            particles = self.gravity.interpolate(alpha) * bodies.distance_earth
+            positions = particles[:len(bodies)]
+
+        for group in self.small_bodies:
+            if particles is not None and group is self.belt:
+                group.place(bodies, particles[self.belt_particles])
+            else:
+                group.update(bodies, positions, alpha)
+        # Turning with the orbit is the same as the old glRotatef(angle) before the translation
+        return positions, angles[0] + angles[1]
+
+    def positionsAt(self, seconds):
+        # Positions (times, bodies, 3) at an array of simulated times, e.g. to draw the trail a body left behind;
+        # None with the gravity engine, whose past is not kept
+        seconds = np.asarray(seconds, dtype=np.float64)
+        bodies = self.bodies
+        if self.gravity is not None:
+            return None
+        if self.ephemeris is not None:
+            return self.ephemeris.positions(seconds) * bodies.distance_earth
+        angle = np.radians(bodies.angle + bodies.rates[0] * (seconds[:, None] - self.time))
+        return np.stack((bodies.distance * np.cos(angle), bodies.distance * np.sin(angle), np.zeros_like(angle)),
+                        axis=-1)
+
+    def energy(self):
+        # Total energy of the gravity engine, NaN without one
+        return self.gravity.energy() if self.gravity is not None else np.nan
+
+    def close(self):
+        if self.gravity is not None:
+            self.gravity.close()
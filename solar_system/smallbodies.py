@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Small bodies (asteroid belt, moon systems): thousands up to millions of
+# instances on circular orbits, all advanced with a few NumPy operations.
+# Drawing them is left to instancing.py, this module needs no OpenGL.
+# ---------------------------------------------------------------------------
+
+import math
+
+import numpy as np
+
+# Main belt between the orbits of Mars and Jupiter, in earth distances (AU)
+BELT_INNER = 2.1
+BELT_OUTER = 3.3
+# Mass of one asteroid in solar masses when the belt joins the gravity engine
+ASTEROID_MASS = 1e-12
+# The moon of the earth: orbit in earth radii and orbital period in years, used to scale generated moon systems
+MOON_ORBIT = 60.3
+MOON_PERIOD = 27.32 / 365.25
+
+
+class OrbitingInstances:
+    """Small bodies on circular, inclined orbits around the sun or around a body of the table.
+
+    Orbit sizes are kept as ratios: of the earth distance for bodies orbiting the sun (parent -1) and of the parent
+    radius for moons, so the distance and radius hotkeys rescale them the same way as the planets. Rates are ratios of
+    the base earth rotation, sizes ratios of the earth radius.
+    """
+
+    def __init__(self, parent, orbit_ratio, rate_ratio, inclination, node, size_ratio, phase, color):
+        self.parent = np.asarray(parent, dtype=int)
+        self.orbit_ratio = np.asarray(orbit_ratio, dtype=np.float64)
+        self.rate_ratio = np.asarray(rate_ratio, dtype=np.float64)
+        self.size_ratio = np.asarray(size_ratio, dtype=np.float64)
+        self.angle = np.degrees(np.asarray(phase, dtype=np.float64))
+        self.last_dt = 0.0
+        self.color = color
+
+        # Orbital plane basis: first axis points to the ascending node, second is 90 degrees ahead in the orbit
+        inclination = np.asarray(inclination, dtype=np.float64)
+        node = np.asarray(node, dtype=np.float64)
+        self.axis_u = np.stack((np.cos(node), np.sin(node), np.zeros_like(node)), axis=-1)
+        self.axis_v = np.stack((-np.sin(node) * np.cos(inclination), np.cos(node) * np.cos(inclination),
+                                np.sin(inclination)), axis=-1)
+
+        # xyz - position, w - radius of every instance in scene units; double precision like the bodies, the renderer
+        # rounds them to float32 only once they are relative to the camera
+        self.instances = np.zeros((len(self), 4), dtype=np.float64)
+
+    def __len__(self):
+        return self.parent.size
+
+    def step(self, bodies, dt):
+        self.angle += self.rate_ratio * (bodies.rotation_main_earth * dt)
+        np.mod(self.angle, 360, out=self.angle)
+        self.last_dt = dt
+
+    def heliocentricState(self):
+        # Positions (AU) and velocities (AU/year) on the circular orbits around the sun, to seed the gravity engine
+        angle = np.radians(self.angle)[:, None]
+        radius = self.orbit_ratio[:, None]
+        speed = 2 * math.pi / np.sqrt(radius)  # circular speed for G * M_sun = 4 pi^2
+        positions = radius * (np.cos(angle) * self.axis_u + np.sin(angle) * self.axis_v)
+        velocities = speed * (np.cos(angle) * self.axis_v - np.sin(angle) * self.axis_u)
+        return positions, velocities
+
+    def update(self, bodies, centers, alpha=1.0):
+        # Recompute every instance transform, alpha of the way into the last step; centers are the positions of the
+        # bodies of the table this frame
+        around_sun = self.parent < 0
+        parent = np.where(around_sun, 0, self.parent)
+        center = np.where(around_sun[:, None], 0.0, centers[parent])
+        unit = np.where(around_sun, bodies.distance_earth, bodies.radius[parent])
+
+        angle = np.radians(self.angle + self.rate_ratio * (bodies.rotation_main_earth * self.last_dt * (alpha - 1.0)))
+        orbit = (self.orbit_ratio * unit)[:, None]
+        self.instances[:, :3] = center + orbit * (np.cos(angle)[:, None] * self.axis_u +
+                                                  np.sin(angle)[:, None] * self.axis_v)
+        self.instances[:, 3] = self.size_ratio * bodies.radius_earth
+
+    def place(self, bodies, positions):
+        # Instance positions computed elsewhere, e.g. by the gravity engine
+        self.instances[:, :3] = positions
+        self.instances[:, 3] = self.size_ratio * bodies.radius_earth
+
+
+def asteroidBelt(count, seed=None):
+    rng = np.random.default_rng(seed)
+    orbit = rng.uniform(BELT_INNER, BELT_OUTER, count)
+    return OrbitingInstances(parent=np.full(count, -1), orbit_ratio=orbit,
+                             rate_ratio=orbit ** -1.5,  # Kepler's third law, relative to the earth
+                             inclination=np.radians(rng.rayleigh(7.0, count)),
+                             node=rng.uniform(0.0, 2.0 * math.pi, count),
+                             size_ratio=rng.uniform(0.02, 0.15, count),
+                             phase=rng.uniform(0.0, 2.0 * math.pi, count),
+                             color=(0.55, 0.5, 0.45))
+
+
+def moonSystems(bodies, seed=None):
+    # Procedural moons for every body with a moon count in the table, scaled on the moon of the earth
+    rng = np.random.default_rng(seed)
+    parent = np.repeat(np.arange(len(bodies)), bodies.moons)
+    count = parent.size
+    orbit = np.exp(rng.uniform(math.log(3.0), math.log(MOON_ORBIT), count))
+    return OrbitingInstances(parent=parent, orbit_ratio=orbit,
+                             rate_ratio=(orbit / MOON_ORBIT) ** -1.5 / MOON_PERIOD,
+                             inclination=np.radians(rng.normal(0.0, 5.0, count)),
+                             node=rng.uniform(0.0, 2.0 * math.pi, count),
+                             size_ratio=rng.uniform(0.01, 0.27, count),
+                             phase=rng.uniform(0.0, 2.0 * math.pi, count),
+                             color=(0.75, 0.75, 0.75))
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Parameter sweeps: grids or random samples over the scale values of the
+# hotkeys, the orbital elements and the time step, every scenario simulated
+# without rendering in a process pool. Conjunctions, closest approaches and
+# the energy drift stream into columnar files (NPZ, or Parquet with pyarrow).
+#
+#   python -m solar_system.sweep --grid distance_earth=100:200:11 \
+#       --random earth.eccentricity=0:0.3 --samples 100 --mode leapfrog \
+#       --duration 10y --output sweep.npz
+# ---------------------------------------------------------------------------
+
+import argparse
+import importlib.util
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .bodies import DEFAULT_BODIES, BodyTable
+from .clock import SECONDS_PER_YEAR
+from .simulation import SolarSystem
+
+MODES = ("orbits", "ephemeris", "leapfrog", "rk4")
+# Scale values of the body table, as changed by the hotkeys
+SCALE_PARAMETERS = ("rotation_main_earth", "distance_earth", "radius_earth")
+# Columns of the body table a "<body>.<column>" parameter may change
+ELEMENT_COLUMNS = ("eccentricity", "inclination", "perihelion", "node", "mean_longitude")
+BODY_COLUMNS = ("orbital_period", "day_length", "radius_ratio", "distance_ratio", "mass") + ELEMENT_COLUMNS
+# Parameters of the run itself: sampling step, simulated time and longest integrator step (seconds)
+RUN_PARAMETERS = ("dt", "duration", "max_step")
+# Parameters (or body columns) a mode never reads, sweeping them would repeat the same scenario: no metric looks at
+# the spins, the circular orbits have no elements, only the gravity engine has masses, and it takes the orbital speeds
+# from them instead of from the periods and the rotation scale
+IGNORED_PARAMETERS = {
+    "orbits": ("day_length", "mass", "max_step") + ELEMENT_COLUMNS,
+    "ephemeris": ("day_length", "mass", "max_step", "rotation_main_earth"),
+    "leapfrog": ("day_length", "orbital_period", "rotation_main_earth"),
+    "rk4": ("day_length", "orbital_period", "rotation_main_earth"),
+}
+# Simulated seconds per step and in total, unless a scenario sets them
+DEFAULT_STEP = 86400.0
+DEFAULT_DURATION = SECONDS_PER_YEAR
+# Finished scenarios a Parquet row group collects before it is written
+ROW_GROUP = 1024
+# Summary columns of a scenario that failed
+FAILED_SUMMARY = {"closest_approach": np.nan, "closest_time": np.nan, "closest_a": "", "closest_b": "",
+                  "conjunctions": 0, "energy_drift": np.nan, "steps": 0, "wall_time": np.nan}
+
+
+def applyParameters(bodies, parameters):
+    # Set the scale values, "radius_sun_ratio" and "<body>.<column>" values of a scenario on a body table; the run
+    # parameters are skipped
+    for name, value in parameters.items():
+        if name in RUN_PARAMETERS + SCALE_PARAMETERS:
+            continue
+        if name == "radius_sun_ratio":
+            bodies.radius_ratio[bodies.star] = value
+            continue
+        body, _, column = name.partition(".")
+        if column not in BODY_COLUMNS or body not in bodies.name:
+            raise ValueError("Unknown sweep parameter: %s" % name)
+        getattr(bodies, column)[bodies.index(body)] = value
+    # The derived columns follow the ratios, like after a hotkey
+    bodies.setRotation(parameters.get("rotation_main_earth", bodies.rotation_main_earth))
+    bodies.setDistance(parameters.get("distance_earth", bodies.distance_earth))
+    bodies.setRadius(parameters.get("radius_earth", bodies.radius_earth))
+    return bodies
+
+
+def ignoredParameters(names, mode):
+    # The parameters among names that have no effect in mode
+    return [name for name in names if (name.partition(".")[2] or name) in IGNORED_PARAMETERS[mode]]
+
+
+def gridScenarios(grid):
+    # Every combination of the values of a {parameter: values} grid
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def randomScenarios(ranges, samples, seed=None, base=({},)):
+    # samples scenarios per base scenario, with every {parameter: (low, high)} drawn uniformly
+    rng = np.random.default_rng(seed)
+    return [{**scenario, **{name: float(rng.uniform(low, high)) for name, (low, high) in ranges.items()}}
+            for scenario in base for _ in range(samples)]
+
+
+def runScenario(parameters, mode="orbits", config=DEFAULT_BODIES, epoch="2000-01-01T12:00"):
+    """Simulate one scenario and measure it.
+
+    Positions are sampled every dt seconds; the gravity engine integrates with steps of at most max_step seconds
+    (default: one day) in between. Returns the summary (closest approach, conjunction count, energy drift, steps,
+    wall time), the conjunctions as (time, body a, body b) and the closest approach of every pair as (body a, body b,
+    gap, time). Times are simulated seconds from the start, distances are in scene units (distance_earth per AU)
+    between the surfaces of the bodies, so negative gaps are collisions. Conjunctions are equal heliocentric
+    longitudes of two planets, the energy drift is the largest relative change of the total energy (gravity modes
+    only, NaN otherwise). The ephemeris and the gravity modes start from the orbital elements at epoch.
+    """
+    start = time.perf_counter()
+    bodies = applyParameters(BodyTable.fromFile(config), parameters)
+    dt = parameters.get("dt", DEFAULT_STEP)
+    steps = max(int(round(parameters.get("duration", DEFAULT_DURATION) / dt)), 1)
+    system = SolarSystem(bodies, physics=mode if mode in ("leapfrog", "rk4") else None, ephemeris=mode == "ephemeris",
+                         epoch=epoch, elements=True)
+    if system.gravity is not None and "max_step" in parameters:
+        system.gravity.max_step = parameters["max_step"] / SECONDS_PER_YEAR
+
+    # Conjunctions between the planets, closest approaches between every pair including the sun
+    sun = int(np.flatnonzero(bodies.star)[0])
+    planets = np.flatnonzero(bodies.orbiting & ~bodies.star)
+    first, second = np.triu_indices(len(planets), 1)
+    first, second = planets[first], planets[second]
+    pair_a, pair_b = np.triu_indices(len(bodies), 1)
+    radii = bodies.radius[pair_a] + bodies.radius[pair_b]
+
+    closest = np.full(pair_a.size, np.inf)
+    closest_time = np.zeros(pair_a.size)
+    conjunctions = []
+    energy = system.energy()
+    drift = 0.0 if system.gravity is not None else np.nan
+    previous = None
+    for step in range(steps + 1):
+        if step:
+            system.step(dt)
+        with np.errstate(invalid="ignore"):
+            positions = system.interpolate()[0]
+        now = step * dt
+        if not np.isfinite(positions).all():
+            # e.g. an eccentricity of 1 or more, or a close encounter the integrator could not follow
+            raise FloatingPointError("Positions are not finite after %g s" % now)
+
+        gap = np.linalg.norm(positions[pair_a] - positions[pair_b], axis=-1) - radii
+        closer = gap < closest
+        closest[closer] = gap[closer]
+        closest_time[closer] = now
+
+        relative = positions - positions[sun]
+        longitude = np.arctan2(relative[:, 1], relative[:, 0])
+        # Longitude difference wrapped to -pi..pi; a conjunction is a sign change that is not a wrap around
+        difference = np.angle(np.exp(1j * (longitude[first] - longitude[second])))
+        if previous is not None:
+            crossed = np.flatnonzero(((previous < 0) != (difference < 0)) & (np.abs(previous - difference) < math.pi))
+            fraction = previous[crossed] / (previous[crossed] - difference[crossed])
+            conjunctions += [(now - dt + f * dt, int(first[k]), int(second[k])) for k, f in zip(crossed, fraction)]
+        previous = difference
+
+        if system.gravity is not None and energy:
+            drift = max(drift, abs((system.energy() - energy) / energy))
+    system.close()
+
+    best = int(np.argmin(closest))
+    summary = {"closest_approach": float(closest[best]), "closest_time": float(closest_time[best]),
+               "closest_a": bodies.name[pair_a[best]], "closest_b": bodies.name[pair_b[best]],
+               "conjunctions": len(conjunctions), "energy_drift": float(drift), "steps": steps,
+               "wall_time": time.perf_counter() - start}
+    conjunctions = [(t, bodies.name[a], bodies.name[b]) for t, a, b in conjunctions]
+    approaches = [(bodies.name[a], bodies.name[b], float(g), float(t))
+                  for a, b, g, t in zip(pair_a, pair_b, closest, closest_time)]
+    return summary, conjunctions, approaches
+
+
+def _runIndexed(index, parameters, mode, config, epoch):
+    try:
+        return index, runScenario(parameters, mode, config, epoch), None
+    except (ArithmeticError, ValueError) as error:
+        return index, None, "%s: %s" % (type(error).__name__, error)
+
+
+class ColumnWriter:
+    """Three tables, filled row by row as scenarios finish: "scenarios" (parameters and summary), "conjunctions"
+    and "approaches" (both keyed by the scenario number).
+
+    A .npz path keeps the columns in memory and writes one archive on close(), with "<table>.<column>" keys. A
+    .parquet path writes the scenarios to that file and the other tables next to it (sweep.conjunctions.parquet,
+    ...), a row group every ROW_GROUP scenarios, so a long sweep keeps what it has finished; this needs pyarrow.
+    """
+
+    TABLES = ("scenarios", "conjunctions", "approaches")
+    EVENT_COLUMNS = {"conjunctions": ("scenario", "time", "body_a", "body_b"),
+                     "approaches": ("scenario", "body_a", "body_b", "gap", "time")}
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if self.parquet:
+            if importlib.util.find_spec("pyarrow") is None:
+                raise RuntimeError("Parquet output needs pyarrow, write a .npz file instead")
+        elif not path.endswith(".npz"):
+            raise ValueError("Unknown sweep output format, use .npz or .parquet: %s" % path)
+        self.columns = {table: {name: [] for name in self.EVENT_COLUMNS.get(table, ())} for table in self.TABLES}
+        self.rows = {table: 0 for table in self.TABLES}
+        self.writers = {}
+        self.pending = 0
+
+    def _append(self, table, row):
+        # Every row of a table has the same columns: scenarios share their parameter names and the summary
+        columns = self.columns[table]
+        for name, value in row.items():
+            columns.setdefault(name, []).append(value)
+        self.rows[table] += 1
+
+    def add(self, index, parameters, result, error=None):
+        summary, conjunctions, approaches = result if result is not None else (FAILED_SUMMARY, (), ())
+        self._append("scenarios", {"scenario": index, **parameters, **summary, "error": error or ""})
+        for t, a, b in conjunctions:
+            self._append("conjunctions", {"scenario": index, "time": t, "body_a": a, "body_b": b})
+        for a, b, gap, t in approaches:
+            self._append("approaches", {"scenario": index, "body_a": a, "body_b": b, "gap": gap, "time": t})
+        self.pending += 1
+        if self.parquet and self.pending >= ROW_GROUP:
+            self._flush()
+
+    def _tablePath(self, table):
+        return self.path if table == "scenarios" else "%s.%s.parquet" % (self.path[:-len(".parquet")], table)
+
+    def _flush(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        for table in self.TABLES:
+            if not self.rows[table]:
+                continue
+            batch = pyarrow.table({name: values for name, values in self.columns[table].items()})
+            if table not in self.writers:
+                self.writers[table] = pyarrow.parquet.ParquetWriter(self._tablePath(table), batch.schema)
+            self.writers[table].write_table(batch.cast(self.writers[table].schema))
+            self.columns[table] = {name: [] for name in self.columns[table]}
+            self.rows[table] = 0
+        self.pending = 0
+
+    def close(self):
+        if self.parquet:
+            self._flush()
+            for writer in self.writers.values():
+                writer.close()
+            return
+        np.savez(self.path, **{"%s.%s" % (table, name): np.asarray(values)
+                               for table in self.TABLES for name, values in self.columns[table].items()})
+
+
+def runSweep(scenarios, output, mode="orbits", workers=None, config=DEFAULT_BODIES, epoch="2000-01-01T12:00",
+             progress=None):
+    # Simulate every scenario on a process pool, writing the results as they come in; progress(done, total) is
+    # called after each one. Scenarios that fail (e.g. an eccentricity >= 1) get their error in the "error" column.
+    if mode not in MODES:
+        raise ValueError("Unknown sweep mode: %s" % mode)
+    ignored = ignoredParameters({name for scenario in scenarios for name in scenario}, mode)
+    if ignored:
+        raise ValueError("The %s mode ignores %s" % (mode, ", ".join(sorted(ignored))))
+    writer = ColumnWriter(output)
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_runIndexed, index, parameters, mode, config, epoch)
+                   for index, parameters in enumerate(scenarios)]
+        for done, future in enumerate(as_completed(futures), 1):
+            index, result, error = future.result()
+            writer.add(index, scenarios[index], result, error)
+            if progress is not None:
+                progress(done, len(futures))
+    writer.close()
+    return output
+
+
+def duration(value):
+    # Seconds, or a number with a d (days) or y (years) suffix
+    units = {"d": 86400.0, "y": SECONDS_PER_YEAR}
+    if value[-1:] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def _gridValues(value):
+    # name=a,b,c or name=start:stop:count (evenly spaced, both ends included)
+    name, _, values = value.partition("=")
+    if ":" in values:
+        low, high, count = values.split(":")
+        return name, list(np.linspace(float(low), float(high), int(count)))
+    return name, [float(v) for v in values.split(",")]
+
+
+def _randomRange(value):
+    # name=low:high
+    name, _, values = value.partition("=")
+    low, high = values.split(":")
+    return name, (float(low), float(high))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="solar_system.sweep", description="Parameter sweeps of the solar system")
+    parser.add_argument("--grid", action="append", type=_gridValues, default=[], metavar="NAME=VALUES",
+                        help="grid axis: a,b,c or start:stop:count (repeatable)")
+    parser.add_argument("--random", action="append", type=_randomRange, default=[], metavar="NAME=LOW:HIGH",
+                        help="parameter drawn uniformly for every sample (repeatable)")
+    parser.add_argument("--samples", type=int, default=1, help="random samples per grid point")
+    parser.add_argument("--seed", type=int, help="seed of the random samples")
+    parser.add_argument("--mode", choices=MODES, default="orbits",
+                        help="circular orbits, Keplerian ephemeris or gravity integrator")
+    parser.add_argument("--dt", type=duration, default=DEFAULT_STEP, help="seconds per step, unless swept")
+    parser.add_argument("--duration", type=duration, default=DEFAULT_DURATION,
+                        help="simulated time per scenario, unless swept (e.g. 86400, 30d, 10y)")
+    parser.add_argument("--epoch", default="2000-01-01T12:00",
+                        help="start date of the orbital elements, in the ephemeris and the gravity modes")
+    parser.add_argument("--config", default=DEFAULT_BODIES, help="body table (default: the packaged bodies.json)")
+    parser.add_argument("--workers", type=int, help="processes (default: every core)")
+    parser.add_argument("--output", default="sweep.npz", help=".npz or .parquet (needs pyarrow)")
+    args = parser.parse_args(argv)
+
+    scenarios = gridScenarios({"dt": [args.dt], "duration": [args.duration], **dict(args.grid)})
+    if args.random:
+        scenarios = randomScenarios(dict(args.random), args.samples, args.seed, scenarios)
+    # Unknown parameter names should fail here and not in every worker
+    try:
+        applyParameters(BodyTable.fromFile(args.config), scenarios[0])
+    except ValueError as error:
+        parser.error(str(error))
+    ignored = ignoredParameters(scenarios[0], args.mode)
+    if ignored:
+        parser.error("--mode %s ignores %s, every scenario would be the same" % (args.mode, ", ".join(ignored)))
+    if not args.output.endswith((".npz", ".parquet")):
+        parser.error("--output must be a .npz or .parquet file")
+    if args.output.endswith(".parquet") and importlib.util.find_spec("pyarrow") is None:
+        parser.error("Parquet output needs pyarrow, install it or write a .npz file")
+
+    def progress(done, total):
+        print("\r%d / %d scenarios" % (done, total), end="" if done < total else "\n", flush=True)
+
+    runSweep(scenarios, args.output, args.mode, args.workers, args.config, args.epoch, progress)
+    print("Results written to %s" % args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
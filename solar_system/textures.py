@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Texture pipeline: planet maps are decoded on worker threads while the scene
+# already renders with placeholders, uploaded with a full mipmap chain and
+# trilinear filtering, and kept in an on-disk cache of ready-to-upload
+# (optionally S3TC compressed) blobs that later launches memory-map.
+# ---------------------------------------------------------------------------
+
+import ctypes
+import hashlib
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, glInitTextureCompressionS3TcEXT
+# The wrapped glGetCompressedTexImage always reads level 0 whatever level it is given
+from OpenGL.raw.GL.VERSION.GL_1_3 import glGetCompressedTexImage as readCompressedLevel
+from PIL import Image
+
+CACHE_VERSION = 1
+DEFAULT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                             "solar_system", "textures")
+# Mid grey, shown until a map is uploaded and kept for maps that cannot be loaded
+PLACEHOLDER_COLOR = (128, 128, 128)
+# Cache blobs start with the length of a JSON header, the level data follows it aligned to a page
+HEADER = struct.Struct("<Q")
+ALIGNMENT = 4096
+
+
+def mipmapChain(image):
+    # Every level down to 1x1, box filtered from the previous one; sizes are halved and rounded down like GL does
+    levels = [image]
+    while image.size != (1, 1):
+        image = image.resize((max(image.width // 2, 1), max(image.height // 2, 1)), Image.BOX)
+        levels.append(image)
+    return levels
+
+
+class TextureData:
+    """Mipmap levels of one texture, ready for upload: (width, height, uint8 array) per level.
+
+    fmt is the compressed internal format of the data, or None for plain RGB bytes.
+    """
+
+    def __init__(self, levels, fmt=None):
+        self.levels = levels
+        self.fmt = fmt
+
+    def save(self, path):
+        header = {"version": CACHE_VERSION, "format": self.fmt,
+                  "levels": [(width, height, data.nbytes) for width, height, data in self.levels]}
+        header = json.dumps(header).encode()
+        start = -(-(HEADER.size + len(header)) // ALIGNMENT) * ALIGNMENT
+        # Write to a temporary name first, so a crash never leaves a truncated blob under the real name
+        temporary = "%s.%d.tmp" % (path, os.getpid())
+        with open(temporary, "wb") as blob:
+            blob.write(HEADER.pack(len(header)) + header)
+            blob.seek(start)
+            for _, _, data in self.levels:
+                blob.write(np.ascontiguousarray(data).data)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        # The level arrays are views of one read-only memory map, the upload reads straight from the page cache
+        with open(path, "rb") as blob:
+            length, = HEADER.unpack(blob.read(HEADER.size))
+            header = json.loads(blob.read(length))
+        if header["version"] != CACHE_VERSION:
+            raise ValueError("Stale texture cache entry: %s" % path)
+        start = -(-(HEADER.size + length) // ALIGNMENT) * ALIGNMENT
+        blob = np.memmap(path, dtype=np.uint8, mode="r", offset=start)
+        levels, offset = [], 0
+        for width, height, size in header["levels"]:
+            levels.append((width, height, blob[offset:offset + size]))
+            offset += size
+        return cls(levels, header["format"])
+
+
+class TextureLoader:
+    """Asynchronous texture loading.
+
+    request() hands out a texture name right away, filled with a one pixel placeholder, and queues the decode on the
+    thread pool. poll() runs on the GL thread once per frame and uploads finished maps into the same names, so the
+    code drawing with them never has to know whether a map has arrived yet. Missing or broken files keep the
+    placeholder and only print a warning.
+    """
+
+    def __init__(self, workers=None, cache=DEFAULT_CACHE, compress=False):
+        self.executor = ThreadPoolExecutor(workers)
+        self.cache = cache
+        if cache:
+            os.makedirs(cache, exist_ok=True)
+        # Compression is left to the driver, it only has to support S3TC
+        self.compress = compress and bool(glInitTextureCompressionS3TcEXT())
+        self.max_size = glGetIntegerv(GL_MAX_TEXTURE_SIZE)
+        self.pending = {}
+
+    def request(self, path):
+        texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB8, 1, 1, 0, GL_RGB, GL_UNSIGNED_BYTE, bytes(PLACEHOLDER_COLOR))
+        # A single level until the real map is there, otherwise the mipmap filter would see an incomplete texture
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, 0)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+        self.pending[texture] = (path, self.executor.submit(self._decode, path))
+        return texture
+
+    def _cachePath(self, path):
+        stat = os.stat(path)
+        # Any change of the file or of the conversion settings gives a new entry
+        key = "%s|%d|%d|%d|%d" % (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, self.max_size,
+                                  self.compress)
+        return os.path.join(self.cache, hashlib.sha1(key.encode()).hexdigest() + ".tex")
+
+    def _decode(self, path):
+        # Worker thread: memory-map the cached blob or decode the image and build the mipmap chain
+        cached = self._cachePath(path) if self.cache else None
+        if cached and os.path.exists(cached):
+            try:
+                return TextureData.load(cached), None
+            except (OSError, ValueError):
+                pass
+        image = Image.open(path).convert("RGB").transpose(Image.FLIP_TOP_BOTTOM)  # OpenGL rows go bottom up
+        if max(image.size) > self.max_size:
+            image.thumbnail((self.max_size, self.max_size), Image.LANCZOS)
+        data = TextureData([(level.width, level.height, np.asarray(level)) for level in mipmapChain(image)])
+        # Plain levels are cached right here, compressed ones only exist after the driver compressed them
+        if cached and not self.compress:
+            self._store(data, cached)
+            cached = None
+        return data, cached
+
+    def _store(self, data, cached):
+        # The cache is best effort: a map that cannot be written (read-only or full directory) is still drawn
+        try:
+            data.save(cached)
+        except OSError as error:
+            print("Texture cache %s could not be written: %s" % (cached, error))
+
+    def poll(self, limit=1):
+        # Upload at most limit finished maps, so a burst of them does not stall a single frame
+        for texture in [texture for texture, (_, future) in self.pending.items() if future.done()][:limit]:
+            path, future = self.pending.pop(texture)
+            try:
+                data, cached = future.result()
+            except (OSError, ValueError) as error:
+                print("Texture %s could not be loaded, using a placeholder: %s" % (path, error))
+                continue
+            self._upload(texture, data, cached)
+
+    def wait(self):
+        # Block until every requested map is uploaded, e.g. before rendering frames offline
+        while self.pending:
+            next(iter(self.pending.values()))[1].exception()
+            self.poll(limit=len(self.pending))
+
+    def _upload(self, texture, data, cached):
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for level, (width, height, pixels) in enumerate(data.levels):
+            if data.fmt is not None:
+                glCompressedTexImage2D(GL_TEXTURE_2D, level, data.fmt, width, height, 0, pixels)
+            else:
+                internal_format = GL_COMPRESSED_RGB_S3TC_DXT1_EXT if self.compress else GL_RGB8
+                glTexImage2D(GL_TEXTURE_2D, level, internal_format, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE,
+                             pixels)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(data.levels) - 1)
+        if cached:
+            # Read the compressed levels back once and let a worker write them to the cache
+            levels = []
+            for level, (width, height, _) in enumerate(data.levels):
+                pixels = np.empty(glGetTexLevelParameteriv(GL_TEXTURE_2D, level, GL_TEXTURE_COMPRESSED_IMAGE_SIZE),
+                                  dtype=np.uint8)
+                readCompressedLevel(GL_TEXTURE_2D, level, pixels.ctypes.data_as(ctypes.c_void_p))
+                levels.append((width, height, pixels))
+            self.executor.submit(self._store, TextureData(levels, int(GL_COMPRESSED_RGB_S3TC_DXT1_EXT)), cached)
+
+    def release(self, textures=()):
+        for _, future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown()
+        if len(textures):
+            glDeleteTextures(len(textures), list(textures))
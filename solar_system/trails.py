@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Orbit trails: every body leaves a fading line along the path it actually
+# took, so eccentric and perturbed orbits show as they are. The samples live
+# in a ring buffer on the GPU; a frame uploads the few bytes that changed and
+# draws each trail as one line strip.
+# ---------------------------------------------------------------------------
+
+import ctypes
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from .shaders import CAMERA_BLOCK, linkProgram, splitPrecision
+
+# Samples kept per body and how much of its orbit they reach back
+TRAIL_SAMPLES = 512
+TRAIL_ORBITS = 1.0
+# Attribute slots of the samples: x, y, z in earth distances and the simulated time the body was there, then the
+# float32 remainders of x, y, z (see splitPrecision)
+SAMPLE_LOCATION = 0
+SAMPLE_LOW_LOCATION = 1
+SAMPLE_FLOATS = 8
+
+VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec4 point;  // xyz - high part of the position, w - time
+layout(location = 1) in vec3 point_low;
+""" + CAMERA_BLOCK + """
+uniform float scale;
+uniform vec3 origin_high;  // camera position in earth distances, split like the positions
+uniform vec3 origin_low;
+uniform float now;
+uniform float duration;
+out float fade;
+
+void main() {
+    fade = 1.0 - (now - point.w) / duration;
+    // Relative to the camera before scaling, so a trail right next to the camera does not jitter
+    vec3 relative = (point.xyz - origin_high) + (point_low - origin_low);
+    gl_Position = projection * view * vec4(relative * scale, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D map;
+in float fade;
+out vec4 color;
+
+void main() {
+    if (fade <= 0.0)
+        discard;
+    // The coarsest mipmap level is the average colour of the planet map
+    color = vec4(texture(map, vec2(0.5), 16.0).rgb, min(fade, 1.0));
+}
+"""
+
+
+class OrbitTrails:
+    """Trails of the bodies of a table.
+
+    Every orbiting body samples its position every TRAIL_ORBITS / TRAIL_SAMPLES of its orbital period into its own
+    ring of the vertex buffer and the shader fades a sample out as it gets older than the trail. Between the newest
+    sample and the body in the current frame runs one more segment, kept in a block of two vertices per body after
+    the rings, so the trail reaches the body however far the frame is from the last sample. A frame uploads that
+    block in one call plus the samples taken; only a reset, e.g. after seeking, uploads the whole buffer.
+    Positions are stored in earth distances, as float32 high and low parts, and scaled when drawn, the distance
+    hotkeys leave the trails intact.
+    """
+
+    def __init__(self, bodies, samples=TRAIL_SAMPLES):
+        count = len(bodies)
+        self.bodies = bodies
+        self.samples = samples
+        # CPU copy of the vertex buffer: the rings of all bodies, then the segments to the current positions
+        self.vertices = np.zeros((count * (samples + 2), SAMPLE_FLOATS), dtype=np.float32)
+        self.rings = self.vertices[:count * samples].reshape(count, samples, SAMPLE_FLOATS)
+        self.live = self.vertices[count * samples:].reshape(count, 2, SAMPLE_FLOATS)
+        self.head = np.zeros(count, dtype=int)  # ring slot of the next sample
+        self.filled = np.zeros(count, dtype=int)
+        self.next_sample = np.zeros(count)
+        # Bounding spheres of the rings (center, radius) in earth distances
+        self.centers = np.zeros((count, 3))
+        self.radii = np.zeros(count)
+        self.duration = np.zeros(count)
+        # Sample times are stored relative to the time of the last reset, float32 would not resolve them otherwise
+        self.origin = None
+        self.now = 0.0
+        self.last_time = None
+        # Vertex indices uploaded on the next draw, None for the whole buffer
+        self.pending = None
+        self.program = None
+        self.vao = None
+        self.buffer = None
+        self.index_buffer = None
+
+    def reset(self):
+        # Forget every trail, e.g. after a seek; the next update() starts them over
+        self.origin = None
+
+    def _fill(self, system, time, interval):
+        # Start over at time, with whatever of the past the system can look up
+        self.origin = time
+        self.head[:] = 0
+        self.filled[:] = 0
+        self.next_sample[:] = time
+        self.pending = None
+        for index in np.flatnonzero(self.duration > 0):
+            times = time - interval[index] * np.arange(self.samples - 1, 0, -1)
+            past = system.positionsAt(times)
+            if past is None:
+                # The gravity engine keeps no history, its trails grow from here
+                return
+            self.rings[index, :-1, :3], self.rings[index, :-1, 4:7] = splitPrecision(
+                past[:, index] / self.bodies.distance_earth)
+            self.rings[index, :-1, 3] = times - time
+            self.head[index] = self.filled[index] = self.samples - 1
+            self._bound(index)
+
+    def _bound(self, index):
+        # The filled part of a ring always starts at slot 0
+        points = self.rings[index, :self.filled[index], :3]
+        self.centers[index] = (points.min(axis=0) + points.max(axis=0)) / 2
+        self.radii[index] = np.linalg.norm(points - self.centers[index], axis=1).max()
+
+    def update(self, system, time, positions):
+        # time - simulated time of the frame, positions - where the bodies are drawn in it (scene units)
+        bodies = self.bodies
+        rates = bodies.rates[0]
+        self.duration = np.where(rates > 0, TRAIL_ORBITS * 360 / np.where(rates > 0, rates, 1), 0.0)
+        interval = self.duration / self.samples
+        # Running backwards (a replay starting over) restarts the trails; rounding jitter of the frame time does not
+        backwards = self.last_time is not None and time < self.last_time - interval[self.duration > 0].min(initial=0)
+        if self.origin is None or backwards:
+            self._fill(system, time, interval)
+        self.last_time = time
+        self.now = time - self.origin
+
+        high, low = splitPrecision(positions / bodies.distance_earth)
+        for index in np.flatnonzero((self.duration > 0) & (time >= self.next_sample)):
+            slot = self.head[index]
+            self.rings[index, slot, :3] = high[index]
+            self.rings[index, slot, 4:7] = low[index]
+            self.rings[index, slot, 3] = self.now
+            self.head[index] = (slot + 1) % self.samples
+            self.filled[index] = min(self.filled[index] + 1, self.samples)
+            self.next_sample[index] = time + interval[index]
+            self._bound(index)
+            if self.pending is not None:
+                self.pending.append(index * self.samples + slot)
+
+        newest = self.rings[np.arange(len(bodies)), (self.head - 1) % self.samples]
+        self.live[:, 1, :3] = high
+        self.live[:, 1, 4:7] = low
+        self.live[:, 1, 3] = self.now
+        self.live[:, 0] = np.where(self.filled[:, None] > 0, newest, self.live[:, 1])
+
+    def visible(self, frustum):
+        # Trails intersecting the view frustum, the segment to the current position included
+        distance_earth = self.bodies.distance_earth
+        reach = np.linalg.norm(self.live[:, 1, :3] - self.centers, axis=1)
+        radii = np.where(self.filled > 0, np.maximum(self.radii, reach), 0.0)
+        centers = np.where(self.filled[:, None] > 0, self.centers, self.live[:, 1, :3])
+        return frustum.spheres(centers * distance_earth, radii * distance_earth) & (self.duration > 0)
+
+    def upload(self):
+        if self.buffer is None:
+            self.program = linkProgram(VERTEX_SHADER, FRAGMENT_SHADER)
+            self.vao = glGenVertexArrays(1)
+            self.buffer, self.index_buffer = glGenBuffers(2)
+            # Every ring is indexed twice in a row, so the strip from its oldest to its newest sample is one range
+            # however the ring has wrapped
+            count = len(self.rings)
+            ring = np.arange(self.samples, dtype=np.uint32)
+            indices = (np.arange(count, dtype=np.uint32)[:, None] * self.samples + np.tile(ring, 2)).ravel()
+            glBindVertexArray(self.vao)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, None, GL_DYNAMIC_DRAW)
+            stride = self.vertices.itemsize * SAMPLE_FLOATS
+            glEnableVertexAttribArray(SAMPLE_LOCATION)
+            glVertexAttribPointer(SAMPLE_LOCATION, 4, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+            glEnableVertexAttribArray(SAMPLE_LOW_LOCATION)
+            glVertexAttribPointer(SAMPLE_LOW_LOCATION, 3, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(4 * self.vertices.itemsize))
+            glBindVertexArray(0)
+            self.pending = None
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        if self.pending is None:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, self.vertices.nbytes, self.vertices)
+        else:
+            vertex = self.vertices.itemsize * SAMPLE_FLOATS
+            for index in self.pending:
+                glBufferSubData(GL_ARRAY_BUFFER, index * vertex, vertex, self.vertices[index])
+            glBufferSubData(GL_ARRAY_BUFFER, self.rings.nbytes, self.live.nbytes, self.live)
+        self.pending = []
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, visible, textures, origin=(0.0, 0.0, 0.0)):
+        # visible - mask of the trails to draw, textures - map of every body, its average colour tints the trail;
+        # origin - camera position, the view matrix is relative to it
+        self.upload()
+        glUseProgram(self.program)
+        glUniform1f(glGetUniformLocation(self.program, "now"), self.now)
+        glUniform1f(glGetUniformLocation(self.program, "scale"), self.bodies.distance_earth)
+        high, low = splitPrecision(np.asarray(origin) / self.bodies.distance_earth)
+        glUniform3f(glGetUniformLocation(self.program, "origin_high"), *high)
+        glUniform3f(glGetUniformLocation(self.program, "origin_low"), *low)
+        duration = glGetUniformLocation(self.program, "duration")
+
+        # Trails are transparent and must not hide what is drawn after them; the alpha of the frame stays opaque
+        glEnable(GL_BLEND)
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ZERO, GL_ONE)
+        glDepthMask(GL_FALSE)
+        glBindVertexArray(self.vao)
+
+        for index in np.flatnonzero(visible):
+            glUniform1f(duration, self.duration[index])
+            glBindTexture(GL_TEXTURE_2D, textures[index])
+            filled = int(self.filled[index])
+            if filled:
+                oldest = (self.head[index] - filled) % self.samples
+                glDrawElements(GL_LINE_STRIP, filled, GL_UNSIGNED_INT,
+                               ctypes.c_void_p(int(index * 2 * self.samples + oldest) * 4))
+            glDrawArrays(GL_LINES, len(self.rings) * self.samples + 2 * int(index), 2)
+
+        glBindVertexArray(0)
+        glDepthMask(GL_TRUE)
+        glDisable(GL_BLEND)
+        glUseProgram(0)
+
+    def release(self):
+        if self.buffer is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            glDeleteBuffers(2, [self.buffer, self.index_buffer])
+            glDeleteProgram(self.program)
+            self.vao = self.buffer = self.index_buffer = None
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Body table: the config file, the rescaling of the derived columns and the
+# angles the batched steps leave, wrapped into 0..360.
+# ---------------------------------------------------------------------------
+
+import os
+
+import numpy as np
+import pytest
+
+from solar_system.bodies import DAYS_PER_YEAR, DEFAULT_BODIES, BodyTable
+from solar_system.clock import SECONDS_PER_YEAR
+
+DAY = 86400.0
+PLANETS = ["mercury", "venus", "earth", "mars", "jupiter", "saturn", "uranus", "neptune"]
+
+
+@pytest.fixture
+def bodies():
+    return BodyTable.fromFile(DEFAULT_BODIES)
+
+
+def test_load_the_config(bodies):
+    assert bodies.name == ["sun"] + PLANETS
+    assert bodies.config == os.path.abspath(DEFAULT_BODIES)
+    # Textures next to the config, scale values from it
+    assert all(os.path.dirname(texture) == os.path.dirname(bodies.config) for texture in bodies.texture)
+    assert (bodies.distance_earth, bodies.radius_earth) == (149, 0.01276)
+    np.testing.assert_array_equal(bodies.distance, bodies.distance_ratio * 149)
+    np.testing.assert_array_equal(bodies.radius, bodies.radius_ratio * 0.01276)
+    assert list(bodies.star) == [True] + [False] * 8
+    assert bodies.name[int(np.flatnonzero(bodies.ring)[0])] == "saturn"
+    assert bodies.mass[bodies.index("earth")] == 1
+    assert not bodies.orbiting[bodies.index("sun")] and bodies.orbiting[1:].all()
+
+
+def test_set_rotation(bodies):
+    bodies.setRotation(2.0)
+    earth = bodies.index("earth")
+    assert bodies.rates[0, earth] == 2.0
+    assert bodies.rates[1, earth] == 2.0 * DAYS_PER_YEAR
+    np.testing.assert_allclose(bodies.rates[0, 1:], 2.0 / bodies.orbital_period[1:])
+    # The sun only spins
+    assert bodies.rates[0, 0] == 0 and bodies.rates[1, 0] > 0
+
+
+def test_scales_change_only_their_column(bodies):
+    rates, radius = bodies.rates.copy(), bodies.radius.copy()
+    bodies.setDistance(300.0)
+    np.testing.assert_array_equal(bodies.distance, bodies.distance_ratio * 300.0)
+    bodies.setRadius(0.5)
+    np.testing.assert_array_equal(bodies.radius, bodies.radius_ratio * 0.5)
+    np.testing.assert_array_equal(bodies.rates, rates)
+    assert (bodies.radius != radius).all()
+
+
+def test_set_radius_ratio(bodies):
+    bodies.setRadius(0.5)
+    mars = bodies.index("mars")
+    radius = bodies.radius.copy()
+    bodies.setRadiusRatio(mars, 20.0)
+    assert bodies.radius[mars] == 10.0
+    radius[mars] = 10.0
+    np.testing.assert_array_equal(bodies.radius, radius)
+    # The new ratio stays when the scale changes
+    bodies.setRadius(0.25)
+    assert bodies.radius[mars] == 5.0
+
+
+def test_a_year_brings_the_earth_back(bodies):
+    bodies.step(SECONDS_PER_YEAR)
+    earth = bodies.index("earth")
+    assert min(bodies.angle[earth], 360 - bodies.angle[earth]) == pytest.approx(0, abs=1e-9)
+    assert bodies.last_dt == SECONDS_PER_YEAR
+
+
+@pytest.mark.parametrize("steps", [10, 1000])
+def test_batched_step_wraps_around(bodies, steps):
+    # Decades in one step go round every orbit many times over, and end where the single steps do
+    single = BodyTable.fromFile(DEFAULT_BODIES)
+    dt = 20 * SECONDS_PER_YEAR / steps
+    for _ in range(steps):
+        single.step(dt)
+    bodies.step(dt * steps)
+    assert ((bodies.angles >= 0) & (bodies.angles < 360)).all()
+    # Compared on the circle, 359.99 and 0.01 are close
+    difference = np.mod(bodies.angles - single.angles + 180, 360) - 180
+    np.testing.assert_allclose(difference, 0, atol=1e-6)
+
+
+def test_interpolation_across_the_wrap(bodies):
+    # A step that carries the earth past 0 degrees interpolates back over the wrap, not the long way round
+    earth = bodies.index("earth")
+    bodies.step(SECONDS_PER_YEAR - 5 * DAY)
+    before = bodies.angle[earth]
+    bodies.step(10 * DAY)
+    assert bodies.angle[earth] < before
+    assert bodies.interpolate(0.0)[0, earth] == pytest.approx(before)
+    middle = bodies.interpolate(0.5)[0, earth]
+    assert min(middle, 360 - middle) == pytest.approx(0, abs=1e-9)
+
+
+def test_venus_spins_backwards(bodies):
+    venus = bodies.index("venus")
+    assert bodies.day_length[venus] < 0
+    assert bodies.rates[1, venus] < 0 < bodies.rates[0, venus]
+    # An earth day of the table later the spin angle has gone back by 1/243 of a turn, wrapped below 360
+    bodies.step(SECONDS_PER_YEAR / DAYS_PER_YEAR)
+    assert bodies.angle_self[venus] == pytest.approx(360 - 360 / 243)
+    # Half way back through the step
+    assert bodies.interpolate(0.5)[1, venus] == pytest.approx(360 - 180 / 243)
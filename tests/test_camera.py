@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Camera: the view matrix is the gluLookAt one, and the orientation stays a
+# unit quaternion without roll however long it is turned.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system.camera import Camera, matrixQuaternion, quaternion, rotationMatrix
+
+
+def lookAtMatrix(eye, target, up):
+    # The matrix gluLookAt documents, for column vectors, transposed into the layout OpenGL reads back
+    eye, target, up = (np.asarray(vector, dtype=np.float64) for vector in (eye, target, up))
+    forward = (target - eye) / np.linalg.norm(target - eye)
+    side = np.cross(forward, up)
+    side /= np.linalg.norm(side)
+    matrix = np.identity(4)
+    matrix[:3, :3] = np.stack((side, np.cross(side, forward), -forward))
+    matrix[:3, 3] = -matrix[:3, :3] @ eye
+    return matrix.T
+
+
+@pytest.mark.parametrize("eye, target, up", [
+    ((0.0, -100.0, 0.0), (0.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    ((30.0, -40.0, 20.0), (5.0, 2.0, -3.0), (0.0, 0.0, 1.0)),
+    ((-7.0, 3.0, 1.0), (2.0, 2.0, 2.0), (0.0, 1.0, 0.0)),
+    # Looking down the diagonals puts the largest term of the rotation on every place of the diagonal
+    ((1.0, 1.0, 1.0), (0.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    ((-1.0, 2.0, -1.0), (0.0, 0.0, 0.0), (1.0, 0.0, 0.0)),
+])
+def test_view_is_the_look_at_matrix(eye, target, up):
+    np.testing.assert_allclose(Camera(eye, target, up).view(), lookAtMatrix(eye, target, up), atol=1e-12)
+
+
+def test_view_relative_to_an_origin():
+    # Only the translation changes, by the origin in eye coordinates
+    camera = Camera((1e9, -2e9, 3e5), (1e9, 0.0, 0.0))
+    origin = np.array([1e9, -2e9 + 10.0, 3e5])
+    reference = lookAtMatrix(camera.position - origin, (0.0, 2e9, -3e5), (0.0, 0.0, 1.0))
+    np.testing.assert_allclose(camera.view(origin), reference, atol=1e-9)
+
+
+def test_quaternion_round_trip():
+    rng = np.random.default_rng(8)
+    for axis, angle in zip(rng.normal(size=(100, 3)), rng.uniform(-180, 180, 100)):
+        q = quaternion(axis, angle)
+        back = matrixQuaternion(rotationMatrix(q))
+        # q and -q are the same rotation
+        np.testing.assert_allclose(back * np.sign(back @ q), q, atol=1e-12)
+
+
+def test_many_turns_keep_a_unit_quaternion_without_roll():
+    camera = Camera()
+    rng = np.random.default_rng(9)
+    for yaw, pitch in rng.uniform(-5, 5, (20000, 2)):
+        camera.turn(yaw, pitch)
+    assert np.linalg.norm(camera.orientation) == pytest.approx(1.0, abs=1e-14)
+    rotation = camera.rotation()
+    np.testing.assert_allclose(rotation.T @ rotation, np.identity(3), atol=1e-13)
+    # The right axis stays level
+    assert abs(rotation[:, 0] @ camera.up) < 1e-12
+
+
+def test_turns_undo_each_other():
+    camera = Camera((30.0, -40.0, 20.0), (0.0, 0.0, 0.0))
+    view = camera.view()
+    camera.turn(0.0, 10.0)
+    camera.turn(25.0, 0.0)
+    camera.turn(-25.0, 0.0)
+    camera.turn(0.0, -10.0)
+    np.testing.assert_allclose(camera.view(), view, atol=1e-12)
+
+
+def test_move_along_the_level_axes():
+    # Looking down at 45 degrees, forward keeps the height and right is perpendicular to it
+    camera = Camera((0.0, -10.0, 10.0), (0.0, 0.0, 0.0))
+    camera.move(0.0, 0.0, 2.0)
+    np.testing.assert_allclose(camera.position, (0.0, -8.0, 10.0), atol=1e-12)
+    camera.move(3.0, 1.0, 0.0)
+    np.testing.assert_allclose(camera.position, (3.0, -8.0, 11.0), atol=1e-12)
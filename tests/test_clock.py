@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Simulation clock on a fake timer: every nanosecond of real time turns into
+# fixed steps sooner or later, stalls included, and the warp stays in range.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system import clock
+from solar_system.clock import MAX_WARP, MIN_WARP, SimulationClock
+
+STEP_NS = 8333333  # the default step of 1/120 s
+
+
+class FakeTime:
+    # Stands in for the time module: the clock only moves when the test moves it, sleeping moves it too
+    def __init__(self):
+        self.now = 10 ** 12
+        self.slept = []
+
+    def perf_counter_ns(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += int(seconds * 1e9)
+
+
+@pytest.fixture
+def timer(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(clock, "time", fake)
+    return fake
+
+
+def run(simulation, timer, frame_times):
+    # Steps of every update for frames of the given lengths (nanoseconds)
+    steps = []
+    for frame_ns in frame_times:
+        timer.now += int(frame_ns)
+        steps.append(simulation.update())
+        assert 0 <= simulation.alpha < 1
+        assert simulation.alpha == simulation.accumulator / simulation.step_ns
+    return steps
+
+
+def test_step_is_whole_nanoseconds(timer):
+    simulation = SimulationClock()
+    assert simulation.step_ns == STEP_NS
+    assert simulation.dt == STEP_NS / 1e9 * simulation.warp
+
+
+def test_every_nanosecond_is_kept(timer):
+    # Uneven frames, none of them a multiple of the step: the remainders add up instead of getting lost
+    simulation = SimulationClock()
+    frames = np.random.default_rng(6).integers(1000000, 40000000, 10000)
+    steps = run(simulation, timer, frames)
+    assert sum(steps) == frames.sum() // STEP_NS
+    assert simulation.accumulator == frames.sum() % STEP_NS
+    assert isinstance(simulation.accumulator, int)
+    assert simulation.time == pytest.approx(sum(steps) * simulation.dt, rel=1e-12)
+
+
+def test_frames_at_the_display_rate(timer):
+    # 60 frames a second at 120 steps a second: two steps every frame, alpha stays at 0
+    simulation = SimulationClock()
+    assert run(simulation, timer, [2 * STEP_NS] * 600) == [2] * 600
+    assert simulation.alpha == 0
+    # Half a step in at the start, every frame after stays half way into the next step
+    simulation = SimulationClock()
+    assert run(simulation, timer, [STEP_NS // 2] + [2 * STEP_NS] * 600) == [0] + [2] * 600
+    assert simulation.alpha == pytest.approx(0.5, abs=1e-6)
+
+
+def test_stall_is_caught_up_in_one_batch(timer):
+    # Five seconds without a frame come back as one update with all their steps, none dropped
+    simulation = SimulationClock()
+    frames = [16000000] * 10 + [5000000000] + [16000000] * 10
+    steps = run(simulation, timer, frames)
+    assert steps[10] >= 5000000000 // STEP_NS
+    assert sum(steps) == sum(frames) // STEP_NS
+    assert simulation.elapsed == pytest.approx(0.016)
+
+
+def test_pause_keeps_the_accumulator(timer):
+    simulation = SimulationClock()
+    run(simulation, timer, [12000000])
+    accumulator, simulated = simulation.accumulator, simulation.time
+    simulation.paused = True
+    assert run(simulation, timer, [1e9] * 5) == [0] * 5
+    assert (simulation.accumulator, simulation.time) == (accumulator, simulated)
+    simulation.paused = False
+    assert run(simulation, timer, [STEP_NS]) == [1]
+
+
+@pytest.mark.parametrize("warp, clamped", [(0.0, MIN_WARP), (-5.0, MIN_WARP), (3600.0, 3600.0),
+                                           (MAX_WARP * 10, MAX_WARP)])
+def test_warp_is_clamped(timer, warp, clamped):
+    simulation = SimulationClock()
+    simulation.setWarp(warp)
+    assert simulation.warp == clamped
+    # The warp scales the simulated seconds of a step, not the number of steps
+    assert run(simulation, timer, [10 * STEP_NS]) == [10]
+    assert simulation.time == pytest.approx(10 * STEP_NS / 1e9 * clamped)
+
+
+def test_wait_keeps_the_frame_grid(timer):
+    simulation = SimulationClock(fps=50)
+    start = timer.now
+    # 5 ms of rendering leaves 15 ms of the frame to sleep
+    timer.now += 5000000
+    simulation.wait()
+    assert timer.slept == [pytest.approx(0.015)]
+    assert simulation.frame_start == start + 20000000
+    # A frame that ran 50 ms over starts a new grid instead of rushing to catch up
+    timer.now += 70000000
+    simulation.wait()
+    assert len(timer.slept) == 1
+    assert simulation.frame_start == timer.now - 20000000
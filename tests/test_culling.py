@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# View-frustum culling: the planes of known matrices, the sphere and box
+# tests, the hierarchy against testing every sphere, and the merged ranges
+# of the orbit arcs.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system.camera import Camera
+from solar_system.culling import LEAF_SIZE, BoundingVolumeHierarchy, Frustum, visibleRanges
+from solar_system.shaders import perspective
+
+# A square 90 degree view from 1 to 100 units: every side plane is at 45 degrees to the line of sight
+NEAR, FAR = 1.0, 100.0
+ROOT_HALF = np.sqrt(0.5)
+# Left, bottom, near, right, top, far in eye coordinates, the camera looking down -z
+EYE_PLANES = np.array([[ROOT_HALF, 0, -ROOT_HALF, 0],
+                       [0, ROOT_HALF, -ROOT_HALF, 0],
+                       [0, 0, -1, -NEAR],
+                       [-ROOT_HALF, 0, -ROOT_HALF, 0],
+                       [0, -ROOT_HALF, -ROOT_HALF, 0],
+                       [0, 0, 1, FAR]])
+
+
+@pytest.fixture
+def frustum():
+    return Frustum.fromMatrices(perspective(90.0, 1.0, NEAR, FAR), np.identity(4))
+
+
+def cameraFrustum(eye, target):
+    return Frustum.fromMatrices(perspective(60.0, 16 / 9, 0.1, 500.0), Camera(eye, target).view())
+
+
+def test_planes_of_the_eye(frustum):
+    # The projection is float32, the planes are as close as that
+    np.testing.assert_allclose(frustum.planes, EYE_PLANES, rtol=1e-5, atol=1e-6)
+
+
+def test_planes_follow_the_view():
+    # A plane n . eye + d = 0 is (view n, d) in world coordinates, for the row vectors of eye = point . view
+    view = Camera((30.0, -40.0, 20.0), (5.0, 2.0, -3.0)).view()
+    frustum = Frustum.fromMatrices(perspective(90.0, 1.0, NEAR, FAR), view)
+    world = EYE_PLANES @ view.T
+    np.testing.assert_allclose(frustum.planes, world / np.linalg.norm(world[:, :3], axis=1)[:, None], rtol=1e-5,
+                               atol=1e-6)
+
+
+@pytest.mark.parametrize("center, radius, visible", [
+    ((0, 0, -50), 1.0, True),
+    ((0, 0, 50), 1.0, False),
+    ((60, 0, -50), 1.0, False),
+    # Crossing the near, a side and the far plane
+    ((0, 0, -0.5), 1.0, True),
+    ((51, 0, -50), 1.0, True),
+    ((0, 0, -100.5), 1.0, True),
+    # Just short of the near and the far plane
+    ((0, 0, 0.5), 0.4, False),
+    ((0, 0, -101.5), 1.0, False),
+])
+def test_sphere(frustum, center, radius, visible):
+    assert frustum.spheres(np.array([center], dtype=np.float64), [radius])[0] == visible
+
+
+@pytest.mark.parametrize("low, high, state", [
+    ((-1, -1, -51), (1, 1, -49), 1),
+    ((-1, -1, 49), (1, 1, 51), -1),
+    ((-1, -1, -2), (1, 1, 0), 0),
+    ((40, -1, -51), (60, 1, -49), 0),
+])
+def test_box(frustum, low, high, state):
+    assert frustum.boxes(np.array([low], dtype=np.float64), np.array([high], dtype=np.float64))[0] == state
+
+
+@pytest.mark.parametrize("count", [1, LEAF_SIZE, 3000])
+@pytest.mark.parametrize("eye, target", [((0, -200, 0), (0, 0, 0)), ((50, 50, 30), (0, 0, 0)),
+                                         ((0, 0, 0), (1, 0, 0.2))])
+def test_hierarchy_finds_every_visible_sphere(count, eye, target):
+    # A belt of small spheres seen from outside and from inside, after the build, a refit and a rebuild
+    rng = np.random.default_rng(count)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    distance = rng.uniform(80, 120, count)
+    centers = np.column_stack((distance * np.cos(angle), distance * np.sin(angle), rng.normal(scale=5, size=count)))
+    radii = rng.uniform(0.01, 2.0, count)
+    frustum = cameraFrustum(eye, target)
+    index = BoundingVolumeHierarchy()
+
+    index.update(centers, radii)
+    built = index.order
+    assert np.array_equal(np.sort(index.query(frustum)), np.flatnonzero(frustum.spheres(centers, radii)))
+
+    # A little motion is refitted
+    centers = centers + rng.normal(scale=0.5, size=centers.shape)
+    index.update(centers, radii)
+    assert index.order is built
+    assert np.array_equal(np.sort(index.query(frustum)), np.flatnonzero(frustum.spheres(centers, radii)))
+
+    # Shuffled, the leaves grow past the limit and the items are sorted again (a single leaf cannot grow)
+    centers = rng.permutation(centers)
+    index.update(centers, radii)
+    assert count <= LEAF_SIZE or index.order is not built
+    assert np.array_equal(np.sort(index.query(frustum)), np.flatnonzero(frustum.spheres(centers, radii)))
+
+
+def arcs(visible, count=10):
+    # Consecutive arcs of count vertices, on the line of sight where visible, behind the camera elsewhere
+    visible = np.asarray(visible)
+    centers = np.zeros((visible.size, 3))
+    centers[:, 2] = np.where(visible, -50.0, 50.0)
+    first = np.arange(visible.size) * count
+    return centers, np.ones(visible.size), first, np.full(visible.size, count)
+
+
+@pytest.mark.parametrize("visible, first, count", [
+    ([True] * 5, [0], [50]),
+    ([True, True, False, True, True, True], [0, 30], [20, 30]),
+    ([False, True, False, True, False], [10, 30], [10, 10]),
+    ([False] * 4, [], []),
+])
+def test_visible_ranges_are_merged(frustum, visible, first, count):
+    ranges = visibleRanges(frustum, arcs(visible))
+    np.testing.assert_array_equal(ranges[0], first)
+    np.testing.assert_array_equal(ranges[1], count)
+
+
+def test_visible_ranges_are_scaled(frustum):
+    # Arcs in units of the distance scale: twice as far puts the first one past the far plane
+    centers, radii, first, count = arcs([True, True])
+    centers[0, 2] = -60.0
+    ranges = visibleRanges(frustum, (centers, radii, first, count), scale=2.0)
+    np.testing.assert_array_equal(ranges, ([10], [10]))
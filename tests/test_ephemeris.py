@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Keplerian ephemeris against known positions of the earth, and the cached
+# lookup against the direct solve.
+# ---------------------------------------------------------------------------
+
+import math
+
+import numpy as np
+import pytest
+
+from solar_system.bodies import DEFAULT_BODIES, BodyTable
+from solar_system.ephemeris import Ephemeris, EphemerisCache, secondsSinceJ2000, solveKepler
+
+# Heliocentric ecliptic position of the earth-moon barycenter at J2000 (JPL Horizons), AU
+EARTH_J2000 = (-0.17713, 0.96724, 0.0)
+# March equinox 2024: the sun at ecliptic longitude 0 of date puts the earth at 180 degrees, which is 180 degrees less
+# 24.2 years of precession (50.3" a year) on the J2000 ecliptic; the earth is 0.99594 AU from the sun then
+EQUINOX_2024 = "2024-03-20T03:06"
+EQUINOX_LONGITUDE = 180.0 - 24.2 * 50.3 / 3600
+EQUINOX_DISTANCE = 0.99594
+
+
+@pytest.fixture(scope="module")
+def bodies():
+    return BodyTable.fromFile(DEFAULT_BODIES)
+
+
+def test_earth_at_j2000(bodies):
+    # The elements are the J2000 ones, only the barycenter offset of the moon remains
+    position = Ephemeris(bodies).positions(secondsSinceJ2000("2000-01-01T12:00"))[bodies.index("earth")]
+    np.testing.assert_allclose(position, EARTH_J2000, atol=1e-4)
+
+
+def test_earth_at_the_2024_equinox(bodies):
+    # The mean motion comes from the periods of the table, a Julian year for the earth instead of the sidereal one,
+    # which leaves the earth about 0.15 degrees ahead after 24 years
+    x, y, z = Ephemeris(bodies).positions(secondsSinceJ2000(EQUINOX_2024))[bodies.index("earth")]
+    assert math.degrees(math.atan2(y, x)) == pytest.approx(EQUINOX_LONGITUDE, abs=0.25)
+    assert math.sqrt(x * x + y * y + z * z) == pytest.approx(EQUINOX_DISTANCE, abs=5e-4)
+    assert abs(z) < 1e-6
+
+
+def test_kepler_solution():
+    # Mean anomalies are reduced to -pi..pi, which is where the solution lies
+    mean = np.linspace(-math.pi, math.pi, 100, endpoint=False)
+    for eccentricity in (0.0, 0.2, 0.9, 0.99):
+        anomaly = solveKepler(mean, eccentricity)
+        np.testing.assert_allclose(anomaly - eccentricity * np.sin(anomaly), mean, atol=1e-10)
+
+
+def test_cache_follows_the_solve(bodies):
+    ephemeris = Ephemeris(bodies)
+    cache = EphemerisCache(ephemeris)
+    rng = np.random.default_rng(3)
+    for seconds in rng.uniform(-3e9, 3e9, 100):
+        np.testing.assert_allclose(cache.positions(seconds), ephemeris.positions(seconds), atol=1e-6)
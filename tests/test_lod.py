@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Level of detail: levels follow the projected size with a hysteresis band
+# around every threshold, bodies below a pixel turn into point sprites.
+# ---------------------------------------------------------------------------
+
+import math
+
+import numpy as np
+import pytest
+
+from solar_system.camera import Camera
+from solar_system.lod import (HYSTERESIS, ORBIT_LEVELS, POINT_RADIUS, SPHERE_LEVELS, DetailLevels, LevelOfDetail,
+                              segmentsRadius)
+
+HEIGHT = 1080
+FOV = 45.0
+PIXELS_PER_UNIT = HEIGHT / (2 * math.tan(math.radians(FOV) / 2))
+
+
+def levels(detail, sizes):
+    return [int(detail.select(np.array([size]))[0]) for size in sizes]
+
+
+def test_first_selection_has_no_hysteresis():
+    detail = DetailLevels(5, [10.0, 100.0])
+    np.testing.assert_array_equal(detail.select(np.array([1.0, 9.99, 10.0, 99.0, 1e6])), [0, 0, 1, 1, 2])
+
+
+def test_threshold_crossed_both_ways():
+    # Up to 20% past 10 before the coarse level goes, down to 20% under it before the fine one goes
+    detail = DetailLevels(1, [10.0])
+    up = [5.0, 10.0, 11.0, 11.99, 12.0]
+    down = [11.0, 9.0, 8.0, 7.99]
+    assert levels(detail, up + down) == [0, 0, 0, 0, 1] + [1, 1, 1, 0]
+
+
+@pytest.mark.parametrize("start", [5.0, 15.0])
+def test_no_flip_inside_the_band(start):
+    # Hovering around the threshold keeps whatever level the item came in with
+    detail = DetailLevels(1, [10.0])
+    first = levels(detail, [start])[0]
+    sizes = 10.0 + 1.99 * np.sin(np.linspace(0, 40 * np.pi, 1000))
+    assert set(levels(detail, sizes)) == {first}
+
+
+def test_large_change_skips_levels():
+    detail = DetailLevels(1, [1.0, 10.0, 100.0])
+    assert levels(detail, [0.5, 500.0, 0.5, 50.0]) == [0, 3, 0, 2]
+
+
+def test_items_are_independent():
+    detail = DetailLevels(2, [10.0])
+    detail.select(np.array([5.0, 15.0]))
+    np.testing.assert_array_equal(detail.select(np.array([11.0, 9.0])), [0, 1])
+    np.testing.assert_array_equal(detail.select(np.array([12.5, 7.5])), [1, 0])
+
+
+def bodyAt(lod, distance, radius=1.0):
+    # One body of the given radius on the line of sight of a camera looking down the y axis
+    view = Camera((0.0, -distance, 0.0), (0.0, 0.0, 0.0)).view()
+    lod.update(view, np.zeros((1, 3)), np.array([radius]), np.array([2 * radius]), np.array([0.0]))
+    return lod.sphere(0)
+
+
+def distanceFor(pixels, radius=1.0):
+    # Distance at which a body covers that projected radius
+    return radius * PIXELS_PER_UNIT / pixels
+
+
+def test_sub_pixel_body_is_a_point_sprite():
+    lod = LevelOfDetail(1, HEIGHT, fov=FOV)
+    assert bodyAt(lod, distanceFor(POINT_RADIUS / 2)) is None
+    # The ring and the orbit still have a tessellation
+    assert lod.ring(0) is not None and lod.orbit(0) in ORBIT_LEVELS
+    assert bodyAt(lod, distanceFor(POINT_RADIUS * 2)) == SPHERE_LEVELS[0]
+
+
+def test_point_sprite_hysteresis():
+    # Coming closer the sprite stays until 20% past half a pixel, going away the sphere stays until 20% under it
+    lod = LevelOfDetail(1, HEIGHT, fov=FOV)
+    band = POINT_RADIUS * (1 - HYSTERESIS), POINT_RADIUS * (1 + HYSTERESIS)
+    pixels = [0.2, 0.55, band[1] - 0.01, band[1] + 0.01, 0.45, band[0] + 0.01, band[0] - 0.01]
+    shown = [bodyAt(lod, distanceFor(size)) for size in pixels]
+    assert shown == [None, None, None, SPHERE_LEVELS[0], SPHERE_LEVELS[0], SPHERE_LEVELS[0], None]
+
+
+def test_sphere_levels_follow_the_distance():
+    # Finer going closer, the finest one for a body that fills the screen
+    lod = LevelOfDetail(1, HEIGHT, fov=FOV)
+    shown = [bodyAt(lod, distanceFor(size)) for size in (1.0, segmentsRadius(8) * 1.3, segmentsRadius(16) * 1.3,
+                                                             segmentsRadius(32) * 1.3, segmentsRadius(64) * 1.3)]
+    assert shown == list(SPHERE_LEVELS)
+
+
+def test_orbit_level_from_the_nearest_point():
+    # An eye right above a point of the orbit sees it at the height of the eye, not at the distance to its center
+    lod = LevelOfDetail(1, HEIGHT, fov=FOV)
+    radius = 100.0
+    gap = radius * PIXELS_PER_UNIT / (segmentsRadius(ORBIT_LEVELS[-2]) * 1.3)
+    view = Camera((radius, 0.0, gap), (0.0, 0.0, 0.0), up=(0.0, 1.0, 0.0)).view()
+    lod.update(view, np.zeros((1, 3)), np.array([1.0]), np.array([0.0]), np.array([radius]))
+    assert lod.orbit(0) == ORBIT_LEVELS[-1]
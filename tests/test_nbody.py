@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Barnes-Hut forces against the direct sum, and the integrators on the
+# planets of the default table.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system.bodies import DEFAULT_BODIES, BodyTable
+from solar_system.nbody import GravitySystem, buildOctree, directAccelerations, treeAccelerations
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    # A few thousand particles of a Gaussian cluster, more than the tree ever puts in one leaf
+    rng = np.random.default_rng(7)
+    count = 3000
+    return rng.normal(size=(count, 3)), rng.uniform(0.5, 1.5, count) / count
+
+
+def relativeErrors(positions, masses, theta):
+    direct = directAccelerations(positions, masses)
+    tree = treeAccelerations(buildOctree(positions, masses), theta)
+    return np.linalg.norm(tree - direct, axis=1) / np.linalg.norm(direct, axis=1)
+
+
+def test_tree_without_approximation_is_the_direct_sum(cluster):
+    # theta 0 opens every node, the walk ends at the particles of the leaves
+    assert relativeErrors(*cluster, theta=0.0).max() < 1e-12
+
+
+@pytest.mark.parametrize("theta, median, percentile", [(0.3, 0.004, 0.06), (0.5, 0.008, 0.07), (0.7, 0.014, 0.09)])
+def test_tree_error_at_theta(cluster, theta, median, percentile):
+    # Bounds about twice the measured error of the monopole tree; the largest errors are on particles whose pulls
+    # almost cancel
+    errors = relativeErrors(*cluster, theta)
+    assert np.median(errors) < median
+    assert np.percentile(errors, 99) < percentile
+
+
+def test_tree_error_grows_with_theta(cluster):
+    medians = [np.median(relativeErrors(*cluster, theta)) for theta in (0.2, 0.4, 0.6, 0.8, 1.0)]
+    assert medians == sorted(medians)
+
+
+@pytest.mark.parametrize("theta", [0.7, 1.0])
+def test_leaf_does_not_pull_itself(theta):
+    # A light particle in the corner of the root, the mass in the opposite one: past theta = 1 / sqrt(3) the center of
+    # mass of the root is far enough to pass for the particle, which would feel its own mass
+    rng = np.random.default_rng(8)
+    positions = np.concatenate((rng.normal(scale=1e-3, size=(20, 3)), [[1.0, 1.0, 1.0]]))
+    masses = np.concatenate((np.full(20, 1 / 20), [0.05]))
+    assert relativeErrors(positions, masses, theta)[-1] < 1e-5
+
+
+def test_workers_split_the_same_walk(cluster):
+    positions, masses = cluster
+    single = GravitySystem(positions, np.zeros_like(positions), masses, method="barnes-hut")
+    split = GravitySystem(positions, np.zeros_like(positions), masses, method="barnes-hut", workers=2)
+    try:
+        np.testing.assert_array_equal(split.accelerations(positions), single.accelerations(positions))
+        # The next tree of about the same size goes into the same shared block
+        name = split.shared.name
+        moved = positions + np.random.default_rng(9).normal(scale=0.01, size=positions.shape)
+        np.testing.assert_array_equal(split.accelerations(moved), single.accelerations(moved))
+        assert split.shared.name == name
+        # A larger one into a new block
+        more = np.concatenate((positions, positions[:2000] + 0.001))
+        for system in (single, split):
+            system.addParticles(more[len(positions):], np.zeros((2000, 3)), masses[:2000])
+        np.testing.assert_array_equal(split.accelerations(more), single.accelerations(more))
+        assert split.shared.name != name
+    finally:
+        split.close()
+    assert split.shared is None
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "rk4"])
+def test_energy_is_kept_over_a_year(integrator):
+    system = GravitySystem.fromBodies(BodyTable.fromFile(DEFAULT_BODIES), integrator=integrator)
+    energy = system.energy()
+    system.advance(365.25 * 86400)
+    assert abs((system.energy() - energy) / energy) < 1e-7
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Network snapshots over the loopback interface: every client rebuilds the
+# frames the server sent bit for bit, however many clients come and go.
+# ---------------------------------------------------------------------------
+
+import asyncio
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from solar_system import SolarSystem
+from solar_system.network import (DELTA, PREDICTED, RemoteSystem, SnapshotClient, SnapshotServer, _pack, _reference,
+                                  _unpack)
+
+RATE = 60
+TIMEOUT = 10.0
+
+
+class RecordingServer(SnapshotServer):
+    # Keeps every frame it sends, by its server clock
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.sent = {}
+
+    def _broadcast(self, clock_time, sim_time):
+        self.sent[clock_time] = self.frame.copy()
+        super()._broadcast(clock_time, sim_time)
+
+
+def freePort():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    # A server with a belt and the moons, so the frames carry instances too, running on its own thread until the
+    # test is done
+    system = SolarSystem(asteroids=200, moons=True, seed=2)
+    server = RecordingServer(system, port=freePort(), rate=RATE)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.run())
+
+    def serve():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.run_until_complete(loop.shutdown_default_executor())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(TIMEOUT)
+    loop.close()
+    system.close()
+
+
+def connect(server):
+    # The server may still be starting up
+    deadline = time.perf_counter() + TIMEOUT
+    while True:
+        try:
+            return SnapshotClient(server.host, server.port, TIMEOUT)
+        except ConnectionError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+def waitFor(condition):
+    deadline = time.perf_counter() + TIMEOUT
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def assertExact(server, client):
+    # Every frame the client rebuilt has the bits of the one the server sent at that clock
+    assert len(client.snapshots) >= 3
+    for _, clock_time, _, frame in list(client.snapshots):
+        assert frame.tobytes() == server.sent[clock_time].tobytes()
+
+
+def test_pack_round_trip():
+    bits = np.random.default_rng(4).integers(0, 1 << 32, 1000, dtype=np.uint32)
+    np.testing.assert_array_equal(_unpack(_pack(bits), bits.size), bits)
+
+
+@pytest.mark.parametrize("kind", [DELTA, PREDICTED])
+def test_reference_undoes_itself(kind):
+    # Server and client XOR with the same reference, any bit pattern comes back, NaNs and infinities included
+    rng = np.random.default_rng(5)
+    before, previous = rng.normal(size=(2, 100)).astype(np.float32)
+    frame = rng.integers(0, 1 << 32, 100, dtype=np.uint32)
+    times = [0.0, 1.0, 2.5]
+    delta = frame ^ _reference(kind, previous, before, times)
+    np.testing.assert_array_equal(delta ^ _reference(kind, previous, before, times), frame)
+
+
+def test_clients_coming_and_going_get_exact_frames(server):
+    first = connect(server)
+    waitFor(lambda: len(first.snapshots) >= 10)
+    second = connect(server)
+    waitFor(lambda: len(second.snapshots) >= 10)
+    first.close()
+    waitFor(lambda: len(server.clients) == 1)
+    third = connect(server)
+    waitFor(lambda: len(third.snapshots) >= 10)
+    # The ones still connected go on from where they were
+    count = len(second.snapshots)
+    waitFor(lambda: len(second.snapshots) >= count + 10)
+    second.close()
+    third.close()
+    waitFor(lambda: not server.clients)
+
+    for client in (first, second, third):
+        assertExact(server, client)
+    # The motion between snapshots is what the predicted frames have to get right
+    frames = [frame for _, _, _, frame in third.snapshots]
+    assert any((a != b).any() for a, b in zip(frames, frames[1:]))
+
+
+def test_remote_system_shows_the_server_state(server):
+    connect(server).close()
+    remote = RemoteSystem(server.host, server.port, timeout=TIMEOUT)
+    try:
+        assert list(remote.bodies.name) == list(server.system.bodies.name)
+        assert [len(group) for group in remote.small_bodies] == [len(group) for group in server.system.small_bodies]
+        waitFor(lambda: len(remote.client.snapshots) >= 10)
+        positions, spin = remote.interpolate()
+        assert np.isfinite(positions).all() and np.isfinite(spin).all()
+        times = [sim_time for _, sim_time, _ in remote.snapshots]
+        assert min(times) <= remote.time <= max(times)
+    finally:
+        remote.close()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Recording and replay: the frames on disk are the states of the run, and a
+# Playback shows them again at the times they were taken.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system import SolarSystem
+from solar_system.recording import Playback, Recorder, Trajectory, captureFrame
+
+DAY = 86400.0
+
+
+def recordRun(path, interval, steps, dt=DAY, **options):
+    # A run recorded step by step, and the frames a second run of the same system gives at the recording times
+    system = SolarSystem(asteroids=50, moons=True, seed=1, **options)
+    twin = SolarSystem(asteroids=50, moons=True, seed=1, **options)
+    recorder = Recorder(str(path), system, interval)
+    expected = [np.zeros_like(recorder.chunk[0])]
+    captureFrame(twin, 1.0, expected[0], recorder.offsets)
+    for _ in range(steps):
+        recorder.step(dt)
+        twin.step(dt)
+        # Recording times inside the step just taken
+        while recorder.start + len(expected) * interval <= twin.time:
+            alpha = 1.0 - (twin.time - (recorder.start + len(expected) * interval)) / dt
+            expected.append(np.zeros_like(expected[0]))
+            captureFrame(twin, alpha, expected[-1], recorder.offsets)
+    recorder.close()
+    system.close()
+    twin.close()
+    return np.array(expected)
+
+
+@pytest.mark.parametrize("options", [{}, {"ephemeris": True}, {"physics": "leapfrog"}],
+                         ids=["orbits", "ephemeris", "gravity"])
+def test_frames_are_the_states_of_the_run(tmp_path, options):
+    path = tmp_path / "run.traj"
+    expected = recordRun(path, DAY / 4, 20, **options)
+    trajectory = Trajectory(str(path))
+    assert len(trajectory) == len(expected) == 81
+    np.testing.assert_array_equal(trajectory.frames, expected)
+
+
+def test_batched_step_is_refused(tmp_path):
+    # Frames that fall before the last step of a batch have no state to take, the gravity engine only knows the
+    # motion inside that step; nothing is written for them
+    system = SolarSystem(physics="leapfrog")
+    recorder = Recorder(str(tmp_path / "run.traj"), system, DAY)
+    system.step(DAY, steps=4)
+    with pytest.raises(RuntimeError):
+        recorder.capture()
+    recorder.close()
+    system.close()
+    assert len(Trajectory(str(tmp_path / "run.traj"))) == 1
+
+
+def test_frames_of_the_last_step_of_a_batch(tmp_path):
+    # A batch inside one interval leaves only frames of its last step
+    system = SolarSystem(physics="leapfrog")
+    recorder = Recorder(str(tmp_path / "run.traj"), system, DAY)
+    system.step(DAY / 4, steps=4)
+    recorder.capture()
+    recorder.close()
+    end = np.zeros_like(recorder.chunk[0])
+    captureFrame(system, 1.0, end, recorder.offsets)
+    system.close()
+    frames = Trajectory(str(tmp_path / "run.traj")).frames
+    assert len(frames) == 2
+    np.testing.assert_array_equal(frames[1], end)
+
+
+def test_playback_shows_the_frames(tmp_path):
+    path = tmp_path / "run.traj"
+    expected = recordRun(path, DAY / 2, 10)
+    playback = Playback(str(path))
+    trajectory = playback.trajectory
+    system = SolarSystem(asteroids=50, moons=True)
+    assert list(playback.bodies.name) == list(system.bodies.name)
+    assert [len(group) for group in playback.small_bodies] == [len(group) for group in system.small_bodies]
+    for index in range(len(expected)):
+        playback.seek(trajectory.start + index * trajectory.interval - playback.time)
+        positions, spin = playback.interpolate()
+        frame_positions, frame_spin, frame_groups = trajectory.frame(index)
+        np.testing.assert_array_equal(positions, frame_positions)
+        np.testing.assert_array_equal(spin, frame_spin)
+        for group, instances in zip(playback.small_bodies, frame_groups):
+            np.testing.assert_array_equal(group.instances, instances)
+    playback.close()
+
+
+def test_playback_between_frames_and_at_the_ends(tmp_path):
+    path = tmp_path / "run.traj"
+    recordRun(path, DAY, 4)
+    playback = Playback(str(path))
+    first, second = playback.trajectory.frame(0)[0], playback.trajectory.frame(1)[0]
+    playback.step(DAY / 4)
+    np.testing.assert_allclose(playback.interpolate()[0], first + (second - first) * 0.25, rtol=1e-6)
+    # Held at the ends, wrapped around with loop
+    playback.step(DAY * 100)
+    assert playback.time == playback.trajectory.end
+    playback.seek(-DAY * 100)
+    assert playback.time == playback.trajectory.start
+    playback.close()
+    looping = Playback(str(path), loop=True)
+    looping.step(DAY * 5)
+    assert looping.time == pytest.approx(looping.trajectory.start + DAY)
+    looping.close()
+
+
+def test_partial_frame_is_ignored(tmp_path):
+    path = tmp_path / "run.traj"
+    recordRun(path, DAY, 3)
+    frames = len(Trajectory(str(path)))
+    with open(path, "ab") as recording:
+        recording.write(b"\0" * 12)
+    assert len(Trajectory(str(path))) == frames
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other.traj"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        Trajectory(str(path))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Shader helpers on the CPU side: double precision split into two floats,
+# and the depth the projections give the near plane and what lies beyond.
+# ---------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+
+from solar_system.shaders import perspective, reversedPerspective, splitPrecision
+
+NEAR = 0.01
+
+
+def depth(projection, distance):
+    # Normalized depth of a point that far in front of the eye, for the row vectors OpenGL reads back
+    clip = np.array([0.0, 0.0, -distance, 1.0]) @ projection.astype(np.float64)
+    return clip[2] / clip[3]
+
+
+def test_split_precision_keeps_the_double():
+    # What is left over is below the rounding of the float32 low part
+    rng = np.random.default_rng(10)
+    values = rng.uniform(-1, 1, 10000) * 10.0 ** rng.uniform(-3, 9, 10000)
+    high, low = splitPrecision(values)
+    assert high.dtype == low.dtype == np.float32
+    np.testing.assert_array_equal(high, values.astype(np.float32))
+    error = np.abs(high.astype(np.float64) + low - values)
+    assert (error <= np.spacing(np.abs(low)) / 2).all()
+
+
+def test_split_precision_difference():
+    # Two positions a billion units out and a thousandth of a unit apart keep their difference to the rounding of the
+    # low parts, float32 alone rounds it away
+    values = np.array([1.23456789e9, 1.23456789e9 + 1e-3])
+    high, low = splitPrecision(values)
+    difference = (high[1] - high[0]) + (low[1] - low[0])
+    assert difference == pytest.approx(values[1] - values[0], abs=1e-5)
+    assert values.astype(np.float32)[1] - values.astype(np.float32)[0] == 0
+
+
+def test_reversed_depth_of_the_near_plane_and_infinity():
+    projection = reversedPerspective(45.0, 16 / 9, NEAR)
+    assert depth(projection, NEAR) == pytest.approx(1.0)
+    assert depth(projection, 1e30) == pytest.approx(0.0, abs=1e-30)
+    # In between the depth is near / distance, it only ever falls
+    distances = np.geomspace(NEAR, 1e12, 100)
+    depths = np.array([depth(projection, distance) for distance in distances])
+    np.testing.assert_allclose(depths, NEAR / distances, rtol=1e-6)
+    assert (np.diff(depths) < 0).all()
+
+
+def test_reversed_projection_keeps_the_picture():
+    # Only the depth is different from the perspective projection
+    reversed_projection = reversedPerspective(45.0, 16 / 9, NEAR)
+    projection = perspective(45.0, 16 / 9, NEAR, 1e6)
+    np.testing.assert_array_equal(reversed_projection[:, [0, 1, 3]], projection[:, [0, 1, 3]])
+
+
+def test_perspective_depth_of_the_planes():
+    projection = perspective(45.0, 16 / 9, NEAR, 100.0)
+    assert depth(projection, NEAR) == pytest.approx(-1.0, abs=1e-6)
+    assert depth(projection, 100.0) == pytest.approx(1.0, abs=1e-6)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# Parameter sweeps: every parameter a mode reads changes its results, every
+# parameter it is said to ignore leaves them as they were.
+# ---------------------------------------------------------------------------
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from solar_system import sweep
+from solar_system.sweep import IGNORED_PARAMETERS, runScenario, runSweep
+
+# Four months in daily samples, long enough for a few conjunctions of the inner planets
+RUN = {"duration": 120 * 86400.0, "dt": 86400.0}
+# Two values of every kind of parameter, both valid for any mode
+VALUES = {
+    "orbital_period": (1.8808, 2.5),
+    "day_length": (1.0208, 3.0),
+    "radius_ratio": (0.5335, 20.0),
+    "distance_ratio": (1.5237, 1.1),
+    "mass": (0.107, 3000.0),
+    "eccentricity": (0.0933941, 0.4),
+    "inclination": (1.84969142, 20.0),
+    "perihelion": (-23.94362959, 60.0),
+    "node": (49.55953891, 120.0),
+    "mean_longitude": (-4.55343205, 90.0),
+    "rotation_main_earth": (0.01, 0.05),
+    "distance_earth": (149.0, 300.0),
+    "radius_earth": (0.01276, 0.5),
+    "dt": (86400.0, 43200.0),
+    "max_step": (86400.0, 3600.0),
+}
+SCALE_AND_RUN = ("rotation_main_earth", "distance_earth", "radius_earth", "dt", "max_step")
+
+
+def parameterName(kind):
+    # Body columns are swept on mars
+    return kind if kind in SCALE_AND_RUN else "mars." + kind
+
+
+def results(mode, parameters):
+    # Everything a scenario measures, except how long it took
+    summary, conjunctions, approaches = runScenario(dict(RUN, **parameters), mode)
+    summary = {name: value for name, value in summary.items() if name != "wall_time"}
+    return summary, conjunctions, approaches
+
+
+def cases(ignored):
+    return [(mode, kind) for mode in sweep.MODES for kind in VALUES if (kind in IGNORED_PARAMETERS[mode]) == ignored]
+
+
+@pytest.mark.parametrize("mode, kind", cases(ignored=False))
+def test_parameter_changes_the_results(mode, kind):
+    low, high = VALUES[kind]
+    assert results(mode, {parameterName(kind): low}) != results(mode, {parameterName(kind): high})
+
+
+@pytest.mark.parametrize("mode, kind", cases(ignored=True))
+def test_ignored_parameter_changes_nothing(mode, kind):
+    low, high = VALUES[kind]
+    assert results(mode, {parameterName(kind): low}) == results(mode, {parameterName(kind): high})
+
+
+def test_sweep_rejects_ignored_parameters(tmp_path):
+    with pytest.raises(ValueError, match="mars.eccentricity"):
+        runSweep([{"mars.eccentricity": 0.1}], str(tmp_path / "sweep.npz"), mode="orbits")
+
+
+def test_sweep_writes_every_scenario(tmp_path):
+    output = str(tmp_path / "sweep.npz")
+    scenarios = sweep.gridScenarios({"earth.eccentricity": [0.0, 0.3], "duration": [RUN["duration"]]})
+    runSweep(scenarios, output, mode="leapfrog", workers=1)
+    with np.load(output) as tables:
+        order = np.argsort(tables["scenarios.scenario"])
+        np.testing.assert_array_equal(tables["scenarios.earth.eccentricity"][order], [0.0, 0.3])
+        assert not tables["scenarios.error"].any()
+        drift = tables["scenarios.energy_drift"][order]
+        gaps = tables["approaches.gap"][np.argsort(tables["approaches.scenario"], kind="stable")].reshape(2, -1)
+    assert drift[0] != drift[1]
+    assert (gaps[0] != gaps[1]).any()
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed")
+def test_parquet_without_pyarrow_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit:
+        sweep.main(["--mode", "orbits", "--grid", "earth.distance_ratio=1,1.1", "--output",
+                    str(tmp_path / "sweep.parquet")])
+    assert exit.value.code == 2
+    assert "pyarrow" in capsys.readouterr().err